@@ -0,0 +1,212 @@
+# benchmarks/run_benchmarks.py
+"""
+Throughput benchmarks for the cleaner and the thread builder.
+
+    python -m benchmarks.run_benchmarks --messages 20000 --output bench.json
+    python -m benchmarks.run_benchmarks --messages 20000 --compare bench.json
+
+Every stage runs in a fresh child process so its peak RSS is not inflated by
+the stages before it. Results are written as JSON so two commits can be compared.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_corpus import generate_corpus
+from src.async_reader import iter_prefetched
+from src.search_index import EmailIndex, build_index
+from src.cleaner import clean_body, parse_enron_email_string, parse_enron_email_bytes
+from src.thread_builder import build_thread_map, deduplicate_threads
+
+STAGES = ("clean_body", "parse_enron_email_string", "parse_enron_email_bytes", "build_thread_map",
+          "deduplicate_threads", "iter_prefetched", "search_index_find")
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _prepare(stage: str, corpus_args: dict, work_dir: str):
+    corpus = generate_corpus(**corpus_args)
+    raws = [raw for _, raw in corpus]
+    if stage == "iter_prefetched":
+        paths = []
+        for i, raw in enumerate(raws):
+            paths.append(os.path.join(work_dir, f"{i}."))
+            with open(paths[-1], "w", encoding="utf-8") as f:
+                f.write(raw)
+        return paths
+    if stage == "parse_enron_email_string":
+        return raws
+    if stage == "parse_enron_email_bytes":
+        return [raw.encode("utf-8") for raw in raws]
+    if stage == "clean_body":
+        return [raw.replace("\r\n", "\n").split("\n\n", 1)[-1] for raw in raws]
+    emails = [parse_enron_email_string(raw, path) for path, raw in corpus]
+    if stage == "build_thread_map":
+        return emails
+    if stage == "search_index_find":
+        # One query per email, cycling through the sender, recipient, date and text filters
+        build_index(emails, os.path.join(work_dir, "index.sqlite"))
+        queries = []
+        for i, email in enumerate(emails):
+            kind = i % 4
+            if kind == 0:
+                queries.append({"sender": email["From"]})
+            elif kind == 1:
+                queries.append({"recipient": email["To"].split(",")[0].strip()})
+            elif kind == 2:
+                queries.append({"start": email["Timestamp"] or 0, "end": (email["Timestamp"] or 0) + 86400})
+            else:
+                words = re.findall(r"\w+", email["Subject"])
+                queries.append({"text": f'"{words[-1]}"' if words else '"enron"'})
+        return queries
+    # build_thread_map already deduplicates, so time the pass on groups with the copies kept
+    thread_map = {}
+    for email in emails:
+        thread_map.setdefault(email.get("Subject", ""), []).append(email)
+    return thread_map
+
+
+def _run(stage: str, data, work_dir: str):
+    if stage == "clean_body":
+        for body in data:
+            clean_body(body)
+    elif stage == "parse_enron_email_string":
+        for raw in data:
+            parse_enron_email_string(raw)
+    elif stage == "parse_enron_email_bytes":
+        for raw in data:
+            parse_enron_email_bytes(raw)
+    elif stage == "build_thread_map":
+        build_thread_map(data)
+    elif stage == "deduplicate_threads":
+        deduplicate_threads(data)
+    elif stage == "iter_prefetched":
+        for _ in iter_prefetched(data):
+            pass
+    elif stage == "search_index_find":
+        with EmailIndex(os.path.join(work_dir, "index.sqlite")) as index:
+            for filters in data:
+                index.find(**filters)
+
+
+def _stage_worker(stage: str, corpus_args: dict, repeat: int, queue) -> None:
+    with tempfile.TemporaryDirectory(prefix="bench-") as work_dir:
+        data = _prepare(stage, corpus_args, work_dir)
+        count = sum(len(v) for v in data.values()) if isinstance(data, dict) else len(data)
+        baseline = _peak_rss_mb()
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _run(stage, data, work_dir)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    queue.put({
+        "messages": count,
+        "seconds": round(best, 6),
+        "messages_per_sec": round(count / best, 1) if best else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "stage_rss_mb": round(_peak_rss_mb() - baseline, 1),
+    })
+
+
+def run_stage(stage: str, corpus_args: dict, repeat: int = 3) -> dict:
+    """
+    Benchmark one stage in a child process. The best of `repeat` runs is kept.
+    stage_rss_mb is how much the stage raised the peak RSS above its input data.
+    """
+    ctx = multiprocessing.get_context()
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_stage_worker, args=(stage, corpus_args, repeat, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(corpus_args: dict, stages=STAGES, repeat: int = 3) -> dict:
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": corpus_args,
+        "stages": {},
+    }
+    for stage in stages:
+        results["stages"][stage] = run_stage(stage, corpus_args, repeat)
+        stats = results["stages"][stage]
+        print(f"{stage:<26} {stats['messages_per_sec']:>12,.0f} msg/s  "
+              f"peak {stats['peak_rss_mb']:>7.1f} MB  (+{stats['stage_rss_mb']:.1f} MB)")
+    return results
+
+
+def compare(baseline: dict, current: dict) -> None:
+    """
+    Print the throughput and memory change of each stage against a previous results file.
+    """
+    if baseline.get("corpus") != current.get("corpus"):
+        print("Warning: the two runs used different corpus settings")
+    print(f"Compared with {baseline.get('commit') or 'baseline'}:")
+    for stage, stats in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old or not old.get("messages_per_sec"):
+            continue
+        speedup = stats["messages_per_sec"] / old["messages_per_sec"]
+        print(f"{stage:<26} {speedup:>6.2f}x throughput  "
+              f"{stats['peak_rss_mb'] - old['peak_rss_mb']:>+7.1f} MB peak RSS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cleaner and thread builder on a synthetic corpus.")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--reply-depth", type=int, default=5)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--html-ratio", type=float, default=0.05)
+    parser.add_argument("--pathology-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    corpus_args = {
+        "n_messages": args.messages,
+        "reply_depth": args.reply_depth,
+        "duplicate_rate": args.duplicate_rate,
+        "html_ratio": args.html_ratio,
+        "pathology_rate": args.pathology_rate,
+        "seed": args.seed,
+    }
+    results = run_benchmarks(corpus_args, args.stages, args.repeat)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# benchmarks/synthetic_corpus.py
+
+import os
+import random
+from email.header import Header
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Tuple
+
+_FIRST = ["phillip", "john", "kay", "jeff", "sara", "mike", "louise", "vince", "tana", "chris"]
+_LAST = ["allen", "arnold", "mann", "dasovich", "shackleton", "grigsby", "kitchen", "kaminski", "jones", "germany"]
+_FOLDERS = ["inbox", "sent", "sent_items", "all_documents", "discussion_threads"]
+_TOPICS = ["gas forecast", "turbine contract", "california demand", "storage report", "trading limits",
+           "west desk positions", "ferc filing", "deal ticket", "power curve", "credit review"]
+_WORDS = ("the a to of and for on with we will please review attached schedule volume price deal desk "
+          "gas power contract storage demand forecast meeting call today tomorrow week numbers update "
+          "california west east capacity pipeline transport margin position risk credit legal").split()
+
+_PATHOLOGIES = ["folded_to", "encoded_subject", "missing_date", "bad_date", "cyclic_reply",
+                "self_reply", "missing_message_id", "crlf", "long_line", "non_header_first_line"]
+
+
+def _person(rng: random.Random) -> str:
+    return f"{rng.choice(_FIRST)}.{rng.choice(_LAST)}@enron.com"
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _body(rng: random.Random, html: bool) -> str:
+    paragraphs = [" ".join(_sentence(rng, rng.randint(6, 18)) for _ in range(rng.randint(1, 4)))
+                  for _ in range(rng.randint(1, 4))]
+    if html:
+        return "<html><body>" + "".join(f"<p>{p}</p>\n" for p in paragraphs) + "</body></html>\n"
+    body = "\n\n".join(paragraphs) + "\n"
+    if rng.random() < 0.3:
+        body += "\n-- \n" + rng.choice(_FIRST).title() + "\n"
+    return body
+
+
+def generate_corpus(n_messages: int = 1000, reply_depth: int = 5, duplicate_rate: float = 0.1,
+                    html_ratio: float = 0.05, pathology_rate: float = 0.02,
+                    seed: int = 0) -> List[Tuple[str, str]]:
+    """
+    Build a deterministic Enron-style corpus as (relative path, raw email) pairs.
+
+    Messages come in reply chains of up to `reply_depth` messages that share a
+    subject and link through In-Reply-To. `duplicate_rate` of the messages are
+    copied into another folder of the same mailbox (like inbox vs all_documents),
+    `html_ratio` of the bodies are HTML, and `pathology_rate` of the messages get
+    one header pathology (folded or encoded headers, bad or missing dates,
+    cyclic or self In-Reply-To, CRLF line endings, ...). The same arguments
+    always produce the same corpus.
+    """
+    rng = random.Random(seed)
+    start = datetime(2000, 1, 1, tzinfo=timezone(timedelta(hours=-8)))
+    messages = []
+    counter = 0
+
+    while len(messages) < n_messages:
+        topic = rng.choice(_TOPICS)
+        sender, recipient = _person(rng), _person(rng)
+        when = start + timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+        parent_id = ""
+        chain_start = len(messages)
+        for depth in range(rng.randint(1, max(1, reply_depth))):
+            if len(messages) >= n_messages:
+                break
+            counter += 1
+            message_id = f"<{counter}.{rng.randint(10 ** 12, 10 ** 13)}.JavaMail.evans@thyme>"
+            headers = {
+                "Message-ID": message_id,
+                "Date": format_datetime(when) + " (PST)",
+                "From": sender,
+                "To": recipient,
+                "Subject": ("Re: " * min(depth, 2)) + topic.title(),
+                "In-Reply-To": parent_id,
+            }
+            body = _body(rng, html=rng.random() < html_ratio)
+            pathology = rng.choice(_PATHOLOGIES) if rng.random() < pathology_rate else None
+            messages.append((sender, headers, body, pathology))
+            parent_id = message_id
+            sender, recipient = recipient, sender
+            when += timedelta(minutes=rng.randint(5, 600))
+        _close_cycle(messages[chain_start:])
+
+    corpus = []
+    for i, (owner, headers, body, pathology) in enumerate(messages):
+        raw = _render(headers, body, pathology, rng)
+        mailbox = owner.split("@")[0].replace(".", "-")
+        corpus.append((f"{mailbox}/{rng.choice(_FOLDERS)}/{i + 1}.", raw))
+        if rng.random() < duplicate_rate:
+            corpus.append((f"{mailbox}/all_documents/{i + 1}_copy.", raw))
+    return corpus
+
+
+def _close_cycle(chain: list) -> None:
+    """
+    If a message of this reply chain drew the cyclic_reply pathology, point the
+    chain root's In-Reply-To at the last reply that still has a Message-ID, so
+    root -> ... -> reply -> root forms a loop.
+    """
+    if not any(pathology == "cyclic_reply" for _, _, _, pathology in chain):
+        return
+    replies = [headers for _, headers, _, pathology in chain[1:] if pathology != "missing_message_id"]
+    if replies:
+        chain[0][1]["In-Reply-To"] = replies[-1]["Message-ID"]
+
+
+def _render(headers: dict, body: str, pathology: str, rng: random.Random) -> str:
+    headers = dict(headers)
+    if pathology == "folded_to":
+        headers["To"] = ", \n\t".join([headers["To"]] + [_person(rng) for _ in range(rng.randint(2, 6))])
+    elif pathology == "encoded_subject":
+        headers["Subject"] = Header(headers["Subject"] + " café", "utf-8").encode()
+    elif pathology == "missing_date":
+        del headers["Date"]
+    elif pathology == "bad_date":
+        headers["Date"] = "sometime last week"
+    elif pathology == "self_reply":
+        headers["In-Reply-To"] = headers["Message-ID"]
+    elif pathology == "missing_message_id":
+        del headers["Message-ID"]
+
+    lines = [f"{name}: {value}" for name, value in headers.items() if value]
+    lines += ["Mime-Version: 1.0", "Content-Type: text/plain; charset=us-ascii",
+              "X-From: " + headers["From"].split("@")[0], "X-FileName: synthetic.pst"]
+    if pathology == "long_line":
+        body = _sentence(rng, 4000) + "\n" + body
+    raw = "\n".join(lines) + "\n\n" + body
+    if pathology == "non_header_first_line":
+        raw = "Received via gateway\n" + raw
+    if pathology == "crlf":
+        raw = raw.replace("\n", "\r\n")
+    return raw
+
+
+def write_corpus(out_dir: str, corpus: List[Tuple[str, str]]) -> int:
+    """
+    Write a generated corpus as a maildir tree. Returns the number of files written.
+    """
+    for relative_path, raw in corpus:
+        path = os.path.join(out_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(raw)
+    return len(corpus)
+
+
+def iter_raw_emails(corpus: List[Tuple[str, str]]) -> Iterator[str]:
+    for _, raw in corpus:
+        yield raw
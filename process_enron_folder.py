@@ -1,36 +1,346 @@
 import os
 import json
+import argparse
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
 from tqdm import tqdm
-from src.cleaner import parse_enron_email_string
+from src import metrics
+from src.cleaner import parse_enron_email_bytes
+from src.writers import write_jsonl, iter_jsonl, write_columnar
+from src.checkpoint import Manifest, ShardWriter, iter_checkpoint_records
+from src.tar_source import is_tar_source, iter_tar_chunks, tar_mailbox_of
+from src.parse_cache import ParseCache, open_reader, content_digest, cache_key
+from src.async_reader import iter_prefetched_chunks
 
-def process_enron_folder(folder_path: str) -> list:
+
+def iter_file_chunks(folder_path: str, chunk_size: int = 500) -> Iterator[List[str]]:
     """
-    Walk through a folder of raw Enron email files and parse them into a list of cleaned emails.
+    Walk the maildir and split it into chunks of file paths.
+    Each chunk holds files from a single directory (e.g. one mailbox folder),
+    and directories and files are visited in sorted order so runs are repeatable.
+    """
+    for root, dirs, files in os.walk(folder_path):
+        dirs.sort()
+        paths = [os.path.join(root, fname) for fname in sorted(files)]
+        for start in range(0, len(paths), chunk_size):
+            yield paths[start:start + chunk_size]
+
+
+def mailbox_of(path: str, root: str) -> str:
+    """
+    Name of the mailbox (top-level folder under the maildir root, e.g. "allen-p") holding a file.
     """
-    cleaned_emails = []
+    parts = os.path.relpath(path, root).split(os.sep)
+    return parts[0] if len(parts) > 1 else ""
+
+
+# A chunk of work for _parse_items is a list of (name, raw bytes, mailbox) triples.
+# Every source (folder walk, prefetching reader, tar archive) is turned into these.
+Item = Tuple[str, Optional[bytes], Optional[str]]
 
-    for root, _, files in os.walk(folder_path):
-        for fname in tqdm(files, desc="Processing emails"):
-            # if not fname.endswith(".txt"):
-            #     continue
 
-            full_path = os.path.join(root, fname)
+def _read_file(path: str) -> Tuple[bytes, os.stat_result]:
+    with metrics.timer("read"), open(path, "rb") as f:
+        return f.read(), os.fstat(f.fileno())
 
+
+def _parse_items(items: List[Item], cache_path: str = None, digests: bool = False,
+                 keep_history: bool = False) -> Tuple[List[Tuple[dict, dict]], List[Tuple[str, str]]]:
+    """
+    Parse one chunk of (name, raw bytes, mailbox) triples. Raw bytes of None mean
+    the file at `name` is read here, so a plain folder walk is read by the pool
+    workers too. Records get a Mailbox field unless the mailbox is None.
+
+    Returns (results, errors): (record, file entry) pairs and (name, error message)
+    pairs for items that could not be read or parsed. A file entry holds the
+    item's "path"; with `digests` it also holds the "sha256" of the content and,
+    for files read here, their "size" and "mtime", i.e. a src.checkpoint manifest
+    entry. With `cache_path`, content already in the parse cache is not parsed
+    again and its entry is marked "cached". `keep_history` is passed on to
+    parse_enron_email_bytes.
+    Runs inside pool workers, so it must stay a top-level function.
+    """
+    digests = digests or bool(cache_path)
+    loaded = []
+    errors = []
+    for name, data, mailbox in items:
+        entry = {"path": name}
+        if data is None:
             try:
-                with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                    raw_email = f.read()
-                    parsed = parse_enron_email_string(raw_email, filename=fname)
-                    cleaned_emails.append(parsed)
-            except Exception as e:
-                print(f"Error processing {fname}: {e}")
+                data, stat = _read_file(name)
+            except OSError as e:
+                errors.append((name, str(e)))
+                continue
+            if digests:
+                entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime_ns
+        if digests:
+            entry["sha256"] = content_digest(data)
+        loaded.append((name, data, mailbox, entry))
+
+    cached = {}
+    if cache_path:
+        keys = [cache_key(e["sha256"], keep_history) for *_, e in loaded]
+        found = open_reader(cache_path).get_many(keys)
+        cached = {e["sha256"]: found[key] for (*_, e), key in zip(loaded, keys) if key in found}
+    results = []
+    for name, data, mailbox, entry in loaded:
+        try:
+            hit = cached.get(entry.get("sha256"))
+            if hit is not None:
+                record = dict(hit, Filename=os.path.basename(name))
+                entry["cached"] = True
+            else:
+                record = parse_enron_email_bytes(data, filename=os.path.basename(name), keep_history=keep_history)
+            if mailbox is not None:
+                record["Mailbox"] = mailbox
+            results.append((record, entry))
+        except Exception as e:
+            errors.append((name, str(e)))
+    if cache_path:
+        hits = sum(1 for _, entry in results if "cached" in entry)
+        metrics.incr("parse_cache_hits", hits)
+        metrics.incr("parse_cache_misses", len(results) - hits)
+    return results, errors
+
+
+def _iter_item_chunks(folder_path: str, chunk_size: int = 500, prefetch: int = 0,
+                      tar_root: Optional[str] = None) -> Iterator[List[Item]]:
+    """
+    Chunks of _parse_items triples for a maildir folder or a tar archive of one.
+    Folder files are left for the workers to read, unless `prefetch` reads them
+    ahead here; a prefetched read that failed is retried by the worker, which
+    reports the error.
+    """
+    if is_tar_source(folder_path):
+        for root, members in iter_tar_chunks(folder_path, chunk_size, tar_root):
+            yield [(name, data, tar_mailbox_of(name, root)) for name, data in members]
+    elif prefetch:
+        chunks = iter_prefetched_chunks(iter_file_chunks(folder_path, chunk_size), concurrency=prefetch)
+        for reads in chunks:
+            yield [(path, data, mailbox_of(path, folder_path)) for path, data, _ in reads]
+    else:
+        for paths in iter_file_chunks(folder_path, chunk_size):
+            yield [(path, None, mailbox_of(path, folder_path)) for path in paths]
+
+
+def _map_bounded(executor, fn, items, window: int):
+    """
+    Like executor.map, but keeps at most `window` tasks in flight and yields
+    results in submission order, so memory does not grow with the input.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _with_metrics(worker, chunk):
+    """
+    Run `worker` in a pool process and return its result together with the
+    metrics it recorded, so the parent can merge them.
+    """
+    metrics.reset()
+    result = worker(chunk)
+    return result, metrics.snapshot()
+
+
+def _run_chunks(worker, chunks, workers: int, errors: list = None):
+    """
+    Run `worker` over every chunk, in a process pool when workers > 1, and yield
+    each chunk's results in order. Per-file errors go to `errors` or are printed.
+    """
+    def merged(results):
+        for result, worker_metrics in results:
+            metrics.merge(worker_metrics)
+            yield result
+
+    def drain(results):
+        with tqdm(desc="Processing emails", unit="email") as progress:
+            for records, chunk_errors in results:
+                metrics.incr("emails_parsed", len(records))
+                metrics.incr("parse_errors", len(chunk_errors))
+                if errors is not None:
+                    errors.extend(chunk_errors)
+                else:
+                    for path, message in chunk_errors:
+                        print(f"Error processing {os.path.basename(path)}: {message}")
+                progress.update(len(records) + len(chunk_errors))
+                yield records
+
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = _map_bounded(executor, partial(_with_metrics, worker), chunks, window=workers * 2)
+            yield from drain(merged(results))
+    else:
+        yield from drain(map(worker, chunks))
+
+
+def iter_enron_folder(folder_path: str, workers: int = 1, chunk_size: int = 500,
+                      errors: list = None, cache_path: str = None, prefetch: int = 0,
+                      keep_history: bool = False, tar_root: Optional[str] = None) -> Iterator[dict]:
+    """
+    Walk through a folder of raw Enron email files and yield cleaned emails one by one.
+    `folder_path` may also be a .tar or .tar.gz archive of the maildir, which is
+    streamed member by member instead of being extracted. Archive records come
+    in archive order, which matches the sorted folder walk only if the archive
+    was written in sorted order (as tarfile's add() and `tar --sort=name` do).
+    The mailboxes of an archive sit under `tar_root`, or under the top-level
+    folder of its first file when it is not given (see iter_tar_chunks).
+
+    With workers > 1 the chunks are parsed in a process pool. Output order is the
+    same as a single-process run. Per-file failures are appended to `errors` as
+    (path, message) tuples when a list is given, otherwise they are printed.
+
+    With `cache_path`, parsed records are kept in a ParseCache at that path and
+    files whose content was already parsed by the current cleaner are not parsed again.
+
+    With prefetch > 0, files are read ahead by up to `prefetch` concurrent reads
+    (see src.async_reader) while earlier chunks are parsed, which hides the
+    latency of network filesystems. Archives are always read sequentially.
+
+    With `keep_history`, the quoted history cut from each body is kept in a
+    QuotedHistory field (see parse_enron_email_bytes).
+    """
+    chunks = _iter_item_chunks(folder_path, chunk_size, prefetch, tar_root)
+    if not cache_path:
+        worker = partial(_parse_items, keep_history=keep_history)
+        for results in _run_chunks(worker, chunks, workers, errors):
+            for record, _ in results:
+                yield record
+        return
+
+    # Workers only read the cache; new entries are written here, by a single process
+    with ParseCache(cache_path) as cache:
+        worker = partial(_parse_items, cache_path=cache_path, keep_history=keep_history)
+        for results in _run_chunks(worker, chunks, workers, errors):
+            cache.put_many((cache_key(entry["sha256"], keep_history), record)
+                           for record, entry in results if "cached" not in entry)
+            cache.touch(cache_key(entry["sha256"], keep_history) for _, entry in results if "cached" in entry)
+            for record, _ in results:
+                yield record
+
+
+def process_enron_folder_checkpointed(folder_path: str, checkpoint_dir: str, workers: int = 1,
+                                      chunk_size: int = 500, shard_size: int = 10000,
+                                      errors: list = None) -> int:
+    """
+    Ingest a folder into JSONL shards under `checkpoint_dir`, recording every file in a manifest.
+
+    Files already in the manifest with the same size and mtime (or the same content
+    hash) are skipped, so an interrupted or repeated run only parses new and changed
+    files. Read the result back with src.checkpoint.iter_checkpoint_records.
+    Returns the number of files parsed in this run.
+    """
+    if is_tar_source(folder_path):
+        raise ValueError("Checkpointed ingestion needs a maildir folder, not an archive")
+    manifest = Manifest(checkpoint_dir)
+    seen = set()
+
+    def pending_chunks():
+        for chunk in iter_file_chunks(folder_path, chunk_size):
+            seen.update(chunk)
+            todo = [(path, None, mailbox_of(path, folder_path)) for path in chunk if manifest.needs_update(path)]
+            if todo:
+                yield todo
+
+    parsed = 0
+    with ShardWriter(manifest, shard_size) as writer:
+        worker = partial(_parse_items, digests=True)
+        for results in _run_chunks(worker, pending_chunks(), workers, errors):
+            for record, file_entry in results:
+                writer.add(record, file_entry)
+            parsed += len(results)
+
+    # The walk finished, so anything not seen was removed from the source folder
+    manifest.prune(seen)
+    manifest.compact()
+    return parsed
+
+
+def process_enron_folder(folder_path: str, workers: int = 1, chunk_size: int = 500,
+                         errors: list = None) -> list:
+    """
+    Walk through a folder of raw Enron email files and parse them into a list of cleaned emails.
+    See iter_enron_folder for the streaming version.
+    """
+    return list(iter_enron_folder(folder_path, workers=workers, chunk_size=chunk_size, errors=errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse and clean a folder of raw Enron emails.")
+    parser.add_argument("folder", nargs="?", default="/Users/ivanfuentes/Desktop/maildir/",
+                        help="maildir folder, or a .tar/.tar.gz archive of it")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (1 disables the pool)")
+    parser.add_argument("--output", default="cleaned_enron_emails.jsonl",
+                        help="output path; a .json extension writes a single JSON array instead of JSONL")
+    parser.add_argument("--checkpoint-dir",
+                        help="write resumable shards and a manifest here; reruns only parse new or changed files")
+    parser.add_argument("--export-dir",
+                        help="also export the cleaned emails as a dataset partitioned by mailbox and year")
+    parser.add_argument("--export-format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--compression", default="snappy")
+    parser.add_argument("--cache", metavar="DB_PATH",
+                        help="reuse parsed emails from this SQLite cache; only new or changed content is parsed")
+    parser.add_argument("--tar-root", metavar="FOLDER",
+                        help="folder holding the mailboxes inside a tar source (default: the top-level folder "
+                             "of its first file; pass \"\" when the mailboxes are at the top of the archive)")
+    parser.add_argument("--keep-history", action="store_true",
+                        help="keep the quoted history cut from each body in a QuotedHistory field")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="read up to N files ahead concurrently while parsing (helps on NFS and other slow filesystems)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="save per-stage timings and counters (Prometheus text if PATH ends in .prom, else JSON)")
+    parser.add_argument("--profile-dir",
+                        help="write a cProfile file per stage here (profiles cover this process only, use --workers 1)")
+    args = parser.parse_args()
+
+    if args.profile_dir:
+        metrics.enable_profiling()
+
+    if args.checkpoint_dir and (args.cache or args.prefetch or args.keep_history):
+        # The manifest cannot tell which options the records already in its shards were parsed with
+        parser.error("--checkpoint-dir cannot be combined with --cache, --prefetch or --keep-history")
+
+    errors = []
+    if args.checkpoint_dir:
+        parsed = process_enron_folder_checkpointed(args.folder, args.checkpoint_dir,
+                                                   workers=args.workers, errors=errors)
+        print(f"Parsed {parsed} new or changed files")
+        emails = iter_checkpoint_records(args.checkpoint_dir)
+    else:
+        emails = iter_enron_folder(args.folder, workers=args.workers, errors=errors, cache_path=args.cache,
+                                   prefetch=args.prefetch, keep_history=args.keep_history, tar_root=args.tar_root)
 
-    return cleaned_emails
+    if args.output.endswith(".json"):
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(list(emails), f, indent=2)
+    else:
+        # One record per line, written as it is parsed
+        count = write_jsonl(emails, args.output)
+        print(f"Wrote {count} emails to {args.output}")
 
+    print(f"{len(errors)} errors")
 
+    if args.export_dir:
+        if args.output.endswith(".json"):
+            with open(args.output, "r", encoding="utf-8") as f:
+                source = json.load(f)
+        else:
+            source = iter_jsonl(args.output)
+        written = write_columnar(source, args.export_dir, format=args.export_format, compression=args.compression)
+        print(f"Exported {written} dataset to {args.export_dir}")
 
+    if args.metrics:
+        metrics.write_metrics(args.metrics)
+    if args.profile_dir:
+        metrics.dump_profiles(args.profile_dir)
 
-emails = process_enron_folder("/Users/ivanfuentes/Desktop/maildir/")
 
-# Optionally save as JSON
-with open("cleaned_enron_emails.json", "w", encoding="utf-8") as f:
-    json.dump(emails, f, indent=2)
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,182 @@
-from tqdm import tqdm
 import json
+import argparse
+from src import metrics
 from src.thread_builder import build_thread_map
+from src.thread_stream import thread_jsonl
+from src.external_sort import thread_jsonl_external
+from src.thread_state import ThreadState, write_threads
+from src.sharding import (
+    PHASES,
+    shard_count,
+    partition_jsonl,
+    map_shard,
+    reduce_shards,
+    assemble_shard,
+    merge_shards,
+    run_shards,
+    thread_jsonl_sharded,
+)
+from src.near_dedup import deduplicate_near, deduplicate_jsonl
+from src.record_store import RecordStore, json_default
+from src.writers import ColumnarWriter, flatten_threads
+from src.search_index import IndexWriter
 
 def main():
-    with open("../cleaned_enron_emails.json", "r", encoding="utf-8") as f:
-        emails = json.load(f)
+    parser = argparse.ArgumentParser(description="Group cleaned emails into threads.")
+    parser.add_argument("input", nargs="?", default="../cleaned_enron_emails.jsonl",
+                        help="cleaned emails as JSONL (streamed) or a JSON array (loaded in memory)")
+    parser.add_argument("--output", default="threaded_emails.json")
+    parser.add_argument("--near-dedup", type=float, metavar="THRESHOLD",
+                        help="drop near-duplicate emails corpus-wide before threading (e.g. 0.9)")
+    parser.add_argument("--keep", choices=["first", "earliest"], default="first",
+                        help="which copy of a near-duplicate cluster to keep")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="thread a JSONL input in memory using the compact record store")
+    parser.add_argument("--external-sort", action="store_true",
+                        help="assemble threads with an on-disk merge sort, for corpora larger than memory")
+    parser.add_argument("--run-size", type=int, default=100000,
+                        help="records per sorted run file with --external-sort")
+    parser.add_argument("--tmp-dir", help="where --external-sort puts its run files")
+    parser.add_argument("--state", metavar="STATE_PATH",
+                        help="keep thread state here and only thread emails appended to the JSONL input "
+                             "since the last run; the output then holds just the threads that changed")
+    parser.add_argument("--shards", type=int,
+                        help="thread in this many shards split by subject, then merge them (JSONL input)")
+    parser.add_argument("--shard-dir", help="shared directory for the shard files; needed with --phase")
+    parser.add_argument("--phase", choices=PHASES, default="all",
+                        help="run a single phase of sharded threading, e.g. one map step per host")
+    parser.add_argument("--shard-index", type=int,
+                        help="with --phase map or assemble, only process this shard")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for the map and assemble phases of sharded threading")
+    parser.add_argument("--export-dir",
+                        help="also export the threaded emails as a dataset partitioned by mailbox and year")
+    parser.add_argument("--export-format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--compression", default="snappy")
+    parser.add_argument("--index", metavar="DB_PATH",
+                        help="also build a SQLite full-text/sender/date index of the threaded emails "
+                             "(replacing any index at DB_PATH)")
+    parser.add_argument("--index-extend", action="store_true",
+                        help="add the threaded emails to the existing --index instead of rebuilding it")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="save per-stage timings and counters (Prometheus text if PATH ends in .prom, else JSON)")
+    parser.add_argument("--profile-dir", help="write a cProfile file per stage here")
+    args = parser.parse_args()
+    if args.state and (not args.input.endswith(".jsonl") or args.near_dedup or args.in_memory
+                       or args.external_sort or args.export_dir or args.index):
+        parser.error("--state only works on a JSONL input, without near-dedup, exports or other threading modes")
+    args.sharded = bool(args.shards) or args.phase != "all"
+    if args.sharded and (not args.input.endswith(".jsonl") or args.in_memory or args.external_sort or args.state):
+        parser.error("--shards only works on a JSONL input, without other threading modes")
+    if args.phase != "all" and not args.shard_dir:
+        parser.error("--phase needs --shard-dir")
+    if args.phase in ("all", "partition") and args.sharded and not args.shards:
+        parser.error(f"--phase {args.phase} needs --shards")
+    if args.phase not in ("all", "partition") and args.near_dedup:
+        parser.error("--near-dedup is applied before partitioning")
+    if args.phase not in ("all", "merge") and (args.export_dir or args.index):
+        parser.error("exports are written by the merge phase")
+
+    if args.profile_dir:
+        metrics.enable_profiling()
+    try:
+        run(args)
+    finally:
+        if args.metrics:
+            metrics.write_metrics(args.metrics)
+        if args.profile_dir:
+            metrics.dump_profiles(args.profile_dir)
+
+
+def run_sharded(args, on_thread=None):
+    """
+    Run one phase of sharded threading, or all of them (see src/sharding.py).
+    Returns the number of threads written by the merge, None for the other phases.
+    """
+    if args.phase == "all":
+        return thread_jsonl_sharded(args.input, args.output, shards=args.shards, workers=args.workers,
+                                    shard_dir=args.shard_dir, on_thread=on_thread)
+    if args.phase == "partition":
+        partition_jsonl(args.input, args.shard_dir, args.shards)
+    elif args.phase == "reduce":
+        print(f"Resolved {reduce_shards(args.shard_dir)} cross-shard reply links")
+    elif args.phase == "merge":
+        return merge_shards(args.shard_dir, args.output, on_thread=on_thread)
+    else:
+        indexes = range(shard_count(args.shard_dir)) if args.shard_index is None else [args.shard_index]
+        run_shards(map_shard if args.phase == "map" else assemble_shard, args.shard_dir, indexes, args.workers)
+    return None
+
+
+def run(args):
+    """
+    Thread the input described by the parsed command-line arguments.
+    """
+    # Extra outputs that receive the threaded emails as they are produced
+    sinks = []
+    if args.export_dir:
+        exporter = ColumnarWriter(args.export_dir, format=args.export_format, compression=args.compression)
+        sinks.append((exporter.write, exporter.close))
+    if args.index:
+        indexer = IndexWriter(args.index, extend=args.index_extend)
+        sinks.append((indexer.add, indexer.close))
+
+    if args.state:
+        state = ThreadState.load(args.state)
+        changed = state.index_jsonl(args.input)
+        state.save(args.state)
+        count = write_threads(state, args.input, args.output, changed)
+        print(f"Threaded emails saved ({count} changed threads, {len(state.threads)} in total).")
+        return
+
+    if args.input.endswith(".jsonl"):
+        if args.near_dedup:
+            deduped_path = args.input[:-len(".jsonl")] + ".dedup.jsonl"
+            dropped = deduplicate_jsonl(args.input, deduped_path, threshold=args.near_dedup, keep=args.keep)
+            print(f"Dropped {dropped} near-duplicate emails")
+            args.input = deduped_path
+        if not args.in_memory:
+            # Only a compact index is kept in memory; bodies are read back per thread
+            def on_thread(thread_id, emails):
+                for write, _ in sinks:
+                    write(emails)
+
+            if args.sharded:
+                count = run_sharded(args, on_thread=on_thread if sinks else None)
+                if count is None:
+                    print(f"Sharded {args.phase} phase done.")
+                    return
+            elif args.external_sort:
+                count = thread_jsonl_external(args.input, args.output, run_size=args.run_size,
+                                              tmp_dir=args.tmp_dir, on_thread=on_thread if sinks else None)
+            else:
+                count = thread_jsonl(args.input, args.output, on_thread=on_thread if sinks else None)
+            with metrics.timer("write"):
+                for _, close in sinks:
+                    close()
+            print(f"Threaded emails saved ({count} threads).")
+            return
+        with metrics.timer("read"):
+            emails = RecordStore.from_jsonl(args.input)
+    else:
+        with metrics.timer("read"), open(args.input, "r", encoding="utf-8") as f:
+            emails = RecordStore.from_records(json.load(f))
 
     print(f"Loaded {len(emails)} emails")
 
-    # Show progress bar while assigning ThreadIDs (optional)
-    for email in tqdm(emails, desc="Assigning thread IDs"):
-        pass  # This loop can include any preprocessing if needed
+    if args.near_dedup and not args.input.endswith(".jsonl"):
+        emails = RecordStore.from_records(deduplicate_near(emails, threshold=args.near_dedup, keep=args.keep))
+        print(f"{len(emails)} emails left after near-duplicate removal")
+
+    thread_map = build_thread_map(emails)
 
-    thread_map = build_thread_map(emails)  # Usually fast, no progress bar needed here
+    with metrics.timer("write"):
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(thread_map, f, indent=2, default=json_default)
 
-    with open("threaded_emails.json", "w", encoding="utf-8") as f:
-        json.dump(thread_map, f, indent=2)
+        for write, close in sinks:
+            write(flatten_threads(thread_map))
+            close()
 
     print("Threaded emails saved.")
 
@@ -0,0 +1,93 @@
+# src/addresses.py
+
+from functools import lru_cache
+from email.utils import getaddresses
+from typing import Dict, List, Tuple
+
+ADDRESS_CACHE_SIZE = 65536
+
+# Headers without these characters (or inner whitespace) are plain comma-separated address lists
+_SPECIAL_CHARS = frozenset('<>"():;\\')
+
+
+def canonical_address(address: str) -> str:
+    """
+    Canonical form of one email address: lower-cased, without surrounding
+    whitespace, quotes or angle brackets.
+    """
+    return address.strip().strip("<>\"' \t").rstrip(".").lower()
+
+
+def parse_addresses(header: str) -> Tuple[str, ...]:
+    """
+    Canonical addresses of a From/To header, in order and without repeats.
+    Display names and formatting are dropped, so "John Arnold <John.Arnold@enron.com>"
+    and "john.arnold@enron.com" give the same result. A non-empty header with no
+    address in it (e.g. a bare display name) is kept whole, lower-cased, so it
+    still identifies someone.
+    """
+    if not header:
+        return ()
+    return _parse_addresses_cached(header)
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _parse_addresses_cached(header: str) -> Tuple[str, ...]:
+    candidates = [part.strip() for part in header.split(",")]
+    if not _SPECIAL_CHARS.isdisjoint(header) or any(len(part.split()) > 1 for part in candidates):
+        candidates = [address for _, address in getaddresses([header])]
+    addresses = dict.fromkeys(a for a in map(canonical_address, candidates) if "@" in a)
+    if not addresses and header.strip():
+        return (header.strip().lower(),)
+    return tuple(addresses)
+
+
+class AddressTable:
+    """
+    Interns canonical addresses as small integer IDs, so participant sets can be
+    stored and hashed as tuples of ints. IDs are only meaningful within one table.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._addresses: List[str] = []
+        self._header_ids: Dict[str, Tuple[int, ...]] = {}  # raw header -> its address IDs
+
+    def id_for(self, address: str) -> int:
+        address_id = self._ids.get(address)
+        if address_id is None:
+            address_id = self._ids[address] = len(self._addresses)
+            self._addresses.append(address)
+        return address_id
+
+    def address(self, address_id: int) -> str:
+        return self._addresses[address_id]
+
+    def participants(self, *headers: str) -> Tuple[int, ...]:
+        """
+        Sorted, de-duplicated IDs of every address in the given headers (e.g. From and To).
+        """
+        ids = set()
+        for header in headers:
+            header_ids = self._header_ids.get(header)
+            if header_ids is None:
+                header_ids = self._header_ids[header] = tuple(self.id_for(a) for a in parse_addresses(header))
+            ids.update(header_ids)
+        return tuple(sorted(ids))
+
+    def addresses(self, participant_ids: Tuple[int, ...]) -> List[str]:
+        """
+        Canonical addresses of a participant tuple, sorted as strings so the order
+        does not depend on when each address was first seen.
+        """
+        return sorted(self._addresses[i] for i in participant_ids)
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._ids
+
+
+# Shared table used when callers do not bring their own
+ADDRESS_TABLE = AddressTable()
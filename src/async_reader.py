@@ -0,0 +1,132 @@
+# src/async_reader.py
+
+import queue
+import asyncio
+import threading
+from collections import deque
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from src import metrics
+
+# (path, file contents or None, error message or None)
+ReadResult = Tuple[str, Optional[bytes], Optional[str]]
+
+_DONE = object()
+
+
+def _read_file(path: str) -> Tuple[ReadResult, float]:
+    # Runs on a pool thread; the latency is recorded by the consumer, which owns the metrics
+    start = perf_counter()
+    try:
+        with open(path, "rb") as f:
+            result = (path, f.read(), None)
+    except OSError as e:
+        result = (path, None, str(e))
+    return result, perf_counter() - start
+
+
+def _put(out: queue.Queue, item, stop: threading.Event) -> None:
+    # Blocks while the queue is full (backpressure) but gives up once the consumer has left
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+async def _produce(paths: Iterable[str], out: queue.Queue, concurrency: int, stop: threading.Event) -> None:
+    """
+    Read files on a thread pool with at most `concurrency` reads in flight and
+    hand the results to `out` in input order.
+    """
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="prefetch") as pool:
+        in_flight = deque()
+        try:
+            for path in paths:
+                if stop.is_set():
+                    return
+                in_flight.append(loop.run_in_executor(pool, _read_file, path))
+                if len(in_flight) >= concurrency:
+                    await loop.run_in_executor(None, _put, out, await in_flight.popleft(), stop)
+            while in_flight and not stop.is_set():
+                await loop.run_in_executor(None, _put, out, await in_flight.popleft(), stop)
+        finally:
+            for future in in_flight:
+                future.cancel()
+            await loop.run_in_executor(None, _put, out, _DONE, stop)
+
+
+def iter_prefetched(paths: Iterable[str], concurrency: int = 32, queue_size: int = 256) -> Iterator[ReadResult]:
+    """
+    Yield (path, contents, error) for every path, in order, while up to
+    `concurrency` files are being read ahead on a thread pool driven by an
+    asyncio event loop in a background thread.
+
+    Reads feed a queue of at most `queue_size` files, so the reader stalls when
+    parsing falls behind instead of buffering the whole folder. This overlaps
+    file latency (e.g. on NFS) with CPU work in the caller. Read times are
+    recorded under the "read" stage, time spent waiting on an empty queue under
+    "prefetch_wait", and the queue depth as the prefetch_queue_depth gauges.
+    """
+    out = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    failure = []
+
+    def run():
+        try:
+            asyncio.run(_produce(paths, out, concurrency, stop))
+        except BaseException as e:  # re-raised in the consumer
+            failure.append(e)
+            try:
+                out.put_nowait(_DONE)
+            except queue.Full:
+                pass
+
+    producer = threading.Thread(target=run, name="prefetch-loop", daemon=True)
+    producer.start()
+    max_depth = 0
+    try:
+        while True:
+            depth = out.qsize()
+            max_depth = max(max_depth, depth)
+            metrics.set_gauge("prefetch_queue_depth", depth)
+            metrics.set_gauge("prefetch_queue_depth_max", max_depth)
+            with metrics.timer("prefetch_wait"):
+                item = out.get()
+            if item is _DONE:
+                break
+            result, latency = item
+            metrics.add_time("read", latency)
+            yield result
+        producer.join()
+        if failure:
+            raise failure[0]
+    finally:
+        stop.set()
+        producer.join()
+
+
+def iter_prefetched_chunks(chunks: Iterable[List[str]], concurrency: int = 32,
+                           queue_size: int = 256) -> Iterator[List[ReadResult]]:
+    """
+    Prefetch the files of a stream of path chunks (e.g. iter_file_chunks) and
+    yield the same chunks with each path replaced by its ReadResult.
+    """
+    sizes = deque()
+
+    def paths():
+        for chunk in chunks:
+            sizes.append(len(chunk))
+            yield from chunk
+
+    batch = []
+    for result in iter_prefetched(paths(), concurrency, queue_size):
+        batch.append(result)
+        if len(batch) == sizes[0]:
+            sizes.popleft()
+            yield batch
+            batch = []
@@ -0,0 +1,212 @@
+# src/checkpoint.py
+
+import os
+import json
+import hashlib
+from typing import Iterator, Optional
+
+MANIFEST_NAME = "manifest.jsonl"
+SHARD_PATTERN = "part-{:05d}.jsonl"
+
+
+def file_digest(path: str) -> str:
+    """
+    Return the SHA-256 of a file's contents.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _shard_names(checkpoint_dir: str) -> list:
+    return [name for name in os.listdir(checkpoint_dir) if name.startswith("part-") and name.endswith(".jsonl")]
+
+
+def _next_shard_index(checkpoint_dir: str) -> int:
+    return max((int(name[5:10]) for name in _shard_names(checkpoint_dir)), default=-1) + 1
+
+
+class Manifest:
+    """
+    Record of every raw file already ingested into a checkpoint directory:
+    path -> {"size", "mtime", "sha256", "shard", "line"}.
+
+    Stored as an append-only JSONL log (later lines win) so progress can be
+    saved after every shard without rewriting the whole manifest.
+    """
+
+    def __init__(self, checkpoint_dir: str):
+        self.checkpoint_dir = checkpoint_dir
+        self.path = os.path.join(checkpoint_dir, MANIFEST_NAME)
+        self.entries = {}
+        # Shards holding lines that a later entry superseded or deleted
+        self.stale_shards = set()
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    self._apply(entry)
+
+    def needs_update(self, path: str) -> bool:
+        """
+        True if the file is new or its content changed since it was ingested.
+        Size and mtime are checked first; the content hash is only computed when
+        they disagree, and a touched-but-identical file just gets its mtime refreshed.
+        A known file that no longer exists is forgotten.
+        """
+        entry = self.entries.get(path)
+        if entry is None:
+            return True
+        try:
+            stat = os.stat(path)
+            if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+                return False
+            if entry["size"] == stat.st_size and entry["sha256"] == file_digest(path):
+                self.append([dict(entry, mtime=stat.st_mtime_ns)])
+                return False
+        except FileNotFoundError:
+            # Removed after the folder walk listed it
+            self.append([{"path": path, "deleted": True}])
+            return False
+        return True
+
+    def append(self, entries: list) -> None:
+        """
+        Add entries to the log and make them durable.
+        """
+        with open(self.path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+                self._apply(entry)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _apply(self, entry: dict) -> None:
+        old = self.entries.pop(entry["path"], None)
+        if not entry.get("deleted"):
+            self.entries[entry["path"]] = entry
+            if old is not None and (old["shard"], old["line"]) == (entry["shard"], entry["line"]):
+                return
+        if old is not None:
+            self.stale_shards.add(old["shard"])
+
+    def prune(self, existing_paths: set) -> int:
+        """
+        Forget files that are no longer in the source folder. Returns how many were removed.
+        """
+        gone = [path for path in self.entries if path not in existing_paths]
+        if gone:
+            self.append([{"path": path, "deleted": True} for path in gone])
+        return len(gone)
+
+    def compact(self, min_live: float = 0.5) -> None:
+        """
+        Rewrite the log with one line per live entry and reclaim shard space.
+
+        Shards that lost lines to re-ingested or removed files are rewritten with
+        just their live lines once less than `min_live` of them are left, and shards
+        no entry points to any more (including ones left by a crash) are deleted.
+        The new manifest is in place before any old shard is removed, so a crash
+        part-way only leaves unreferenced shards for the next compaction.
+        """
+        live = {}
+        for entry in self.entries.values():
+            live.setdefault(entry["shard"], {})[entry["line"]] = entry
+        next_index = _next_shard_index(self.checkpoint_dir)
+        for shard in sorted(self.stale_shards & set(live)):
+            old_path = os.path.join(self.checkpoint_dir, shard)
+            with open(old_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+            if len(live[shard]) >= min_live * len(lines):
+                continue
+            new_shard = SHARD_PATTERN.format(next_index)
+            next_index += 1
+            with open(os.path.join(self.checkpoint_dir, new_shard), "w", encoding="utf-8") as f:
+                for new_line, (line, entry) in enumerate(sorted(live.pop(shard).items())):
+                    f.write(lines[line])
+                    self.entries[entry["path"]] = dict(entry, shard=new_shard, line=new_line)
+                f.flush()
+                os.fsync(f.fileno())
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.stale_shards = set()
+
+        referenced = {entry["shard"] for entry in self.entries.values()}
+        for name in _shard_names(self.checkpoint_dir):
+            if name not in referenced:
+                os.remove(os.path.join(self.checkpoint_dir, name))
+
+
+class ShardWriter:
+    """
+    Write records into numbered JSONL shards, rolling over every `shard_size` records.
+    Manifest entries for a shard are only saved once its lines are on disk, so a
+    crash loses at most the shard being written.
+    """
+
+    def __init__(self, manifest: Manifest, shard_size: int = 10000):
+        self.manifest = manifest
+        self.shard_size = shard_size
+        self.next_shard = _next_shard_index(manifest.checkpoint_dir)
+        self.file = None
+        self.shard = None
+        self.lines = 0
+        self.pending = []
+
+    def add(self, record: dict, file_entry: dict) -> None:
+        if self.file is None:
+            self.shard = SHARD_PATTERN.format(self.next_shard)
+            self.next_shard += 1
+            self.file = open(os.path.join(self.manifest.checkpoint_dir, self.shard), "w", encoding="utf-8")
+            self.lines = 0
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.pending.append(dict(file_entry, shard=self.shard, line=self.lines))
+        self.lines += 1
+        if self.lines >= self.shard_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.file is None:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
+        self.manifest.append(self.pending)
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def iter_checkpoint_records(checkpoint_dir: str, manifest: Optional[Manifest] = None) -> Iterator[dict]:
+    """
+    Yield the current record of every file in the manifest, shard by shard.
+    Lines superseded by a re-ingested file or left over from a crash are skipped.
+    """
+    manifest = manifest or Manifest(checkpoint_dir)
+    wanted = {}
+    for entry in manifest.entries.values():
+        wanted.setdefault(entry["shard"], set()).add(entry["line"])
+
+    for shard in sorted(wanted):
+        lines = wanted[shard]
+        with open(os.path.join(checkpoint_dir, shard), "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                if i in lines:
+                    yield json.loads(line)
@@ -2,16 +2,178 @@
 
 import re
 import os
+import codecs
+from functools import lru_cache
+from typing import Optional
 from email import message_from_string, policy
 from email.parser import BytesParser
 from bs4 import BeautifulSoup
+from src.dates import normalize_date, parse_date_epoch
+from src.quote_stripper import strip_quotes
+from src import metrics
 
 
 
+# Raw header name (lower-cased) -> output field
+HEADER_FIELDS = {
+    "message-id": "MessageID",
+    "from": "From",
+    "to": "To",
+    "in-reply-to": "InReplyTo",
+    "subject": "Subject",
+    "date": "Date",
+}
+
+_ADDR = r"[\w+'-]+(?:\.[\w+'-]+)*@[\w-]+(?:\.[\w-]+)*"
+
+# Values that policy.default would return unchanged, so they can skip the header registry
+_PLAIN_VALUE_RE = {
+    "from": re.compile(rf"{_ADDR}\Z"),
+    "to": re.compile(rf"{_ADDR}(, {_ADDR})*\Z"),
+    "message-id": re.compile(r"<[^<>\s\"()\\,;:\[\]]+>\Z"),
+    "in-reply-to": re.compile(r"<[^<>\s\"()\\,;:\[\]]+>\Z"),
+}
+_HEADER_NAME_RE = re.compile(r"[\041-\071\073-\176]+\Z")
+_HEADER_NAME_BYTES_RE = re.compile(rb"[\041-\071\073-\176]+\Z")
+_CHARSET_RE = re.compile(rb"charset\s*=\s*[\"']?([\w.:+-]+)", flags=re.IGNORECASE)
+# The bytes parser also needs Content-Type, to pick the body charset
+_WANTED_BYTES_HEADERS = frozenset(HEADER_FIELDS) | {"content-type"}
+
+
+def _scan_header_block(block, name_re, wanted) -> Optional[dict]:
+    """
+    Collect the raw value pieces of the `wanted` headers (lower-case names) of a
+    str or bytes header block, keyed by lower-case str name. Repeated headers
+    keep their first value. Returns None when a line is neither "Name: value"
+    nor a folded continuation, so the email package should parse the email.
+    """
+    newline, colon, space, tab = ("\n", ":", " ", "\t") if isinstance(block, str) else (b"\n", b":", b" ", b"\t")
+    raw_values = {}
+    current = None
+    for line in block.split(newline):
+        if line[:1] in (space, tab):
+            # Folded continuation of the previous header
+            if current is None:
+                return None
+            if current:
+                raw_values[current].append(line)
+            continue
+
+        name, sep, value = line.partition(colon)
+        if not sep or not name_re.match(name):
+            return None
+        current = name.lower() if isinstance(name, str) else name.decode("ascii").lower()
+        if current in wanted and current not in raw_values:
+            raw_values[current] = [value.lstrip(space + tab)]
+        else:
+            current = ""  # not needed, or a repeated header (the first one wins)
+    return raw_values
+
+
+def parse_header_block(raw_email: str) -> tuple:
+    """
+    Scan only the header block of a raw Enron email (up to the first blank line).
+    Returns (headers, body_offset), where headers maps output field names to
+    values and raw_email[body_offset:] is the body. headers is None when the block
+    is not plain "Name: value" lines and the email package should parse it instead.
+    """
+    end = raw_email.find("\n\n")
+    body_offset = end + 2 if end != -1 else len(raw_email)
+    block = raw_email[:end] if end != -1 else raw_email
+
+    if "\r" in block or block.startswith("From "):
+        return None, body_offset
+    raw_values = _scan_header_block(block, _HEADER_NAME_RE, HEADER_FIELDS)
+    if raw_values is None:
+        return None, body_offset
+
+    headers = {field: "" for field in HEADER_FIELDS.values()}
+    for name, parts in raw_values.items():
+        headers[HEADER_FIELDS[name]] = _decode_header_value(name, "".join(parts))
+    return headers, body_offset
+
+
+def parse_header_block_bytes(data: bytes) -> tuple:
+    """
+    Bytes version of parse_header_block for raw file contents with LF line
+    endings. Returns (headers, body_offset, charset): only the values of the
+    wanted headers are decoded, and charset is the body encoding named by
+    Content-Type (see body_charset). headers is None when the email package
+    should parse the email instead.
+    """
+    end = data.find(b"\n\n")
+    body_offset = end + 2 if end != -1 else len(data)
+    block = data[:end] if end != -1 else data
+
+    if block.startswith(b"From "):
+        return None, body_offset, "utf-8"
+    raw_values = _scan_header_block(block, _HEADER_NAME_BYTES_RE, _WANTED_BYTES_HEADERS)
+    if raw_values is None:
+        return None, body_offset, "utf-8"
+
+    content_type = raw_values.pop("content-type", None)
+    headers = {field: "" for field in HEADER_FIELDS.values()}
+    for name, parts in raw_values.items():
+        value = b"".join(parts).decode("utf-8", errors="ignore")
+        headers[HEADER_FIELDS[name]] = _decode_header_value(name, value)
+    return headers, body_offset, body_charset(b"".join(content_type) if content_type else b"")
+
+
+@lru_cache(maxsize=256)
+def body_charset(content_type: bytes) -> str:
+    """
+    Codec for a body with this Content-Type value. ASCII declarations (most of
+    Enron says us-ascii or ANSI_X3.4-1968) and missing or unknown charsets give
+    utf-8, which reads ASCII the same and keeps stray UTF-8 text.
+    """
+    match = _CHARSET_RE.search(content_type)
+    if match is None:
+        return "utf-8"
+    try:
+        name = codecs.lookup(match.group(1).decode("ascii")).name
+    except LookupError:
+        return "utf-8"
+    return "utf-8" if name == "ascii" else name
+
+
+def _decode_header_value(name: str, value: str) -> str:
+    """
+    Return the header value as policy.default would. Only values that could be
+    encoded, non-ASCII or irregular go through the header registry.
+    """
+    plain = value.isascii() and "=?" not in value
+    candidate = value
+    if plain and name in ("from", "to") and value.strip():
+        # Folded address lists only differ from the parsed form by whitespace
+        candidate = ", ".join(part.strip(" \t") for part in value.split(","))
+    plain = plain and candidate == candidate.strip()
+    if plain and name in _PLAIN_VALUE_RE and candidate:
+        plain = _PLAIN_VALUE_RE[name].match(candidate) is not None
+
+    if plain and name == "date" and candidate:
+        # Same normalization DateHeader applies, without building the header object
+        return normalize_date(candidate)
+    if plain:
+        return candidate
+    metrics.incr("header_value_fallback")
+    return str(policy.default.header_factory(name, value))
+
+
 def extract_headers(raw_email: str) -> dict:
     """
     Extract basic headers like From, To, Subject, and Date from a raw email string.
     """
+    headers, _ = parse_header_block(raw_email)
+    if headers is None:
+        metrics.incr("header_block_fallback")
+        headers = _extract_headers_with_email_package(raw_email)
+    return headers
+
+
+def _extract_headers_with_email_package(raw_email: str) -> dict:
+    """
+    Full parse with the standard library, used when the header block is irregular.
+    """
     msg = message_from_string(raw_email, policy=policy.default)
    
     return {
@@ -23,14 +185,47 @@ def extract_headers(raw_email: str) -> dict:
         "Date": msg.get("Date", ""),
     }
 
-def clean_body(raw_body: str) -> str:
+# Anything that could be markup or an entity goes through BeautifulSoup;
+# everything else is plain text and only needs the line filter.
+_HTML_MARKER_RE = re.compile(r"<[a-zA-Z/!?]|&")
+
+HTML_PARSER = "html.parser"
+
+_clean_body_stats = {"plain": 0, "html": 0}
+
+
+def clean_body(raw_body: str, html_parser: str = None, strip_history: bool = True) -> str:
     """
     Remove HTML tags, email signatures, and quoted replies from the body text.
+    Plain-text bodies skip the HTML parser entirely. `html_parser` picks the
+    BeautifulSoup backend for bodies with markup ("lxml", "html.parser", or
+    "auto" to use lxml when it is installed); defaults to HTML_PARSER.
+    With `strip_history`, everything from the first Original Message / Forwarded by /
+    From:-Sent: block on is dropped as well (see src.quote_stripper).
     """
-    # Remove HTML if present
-    soup = BeautifulSoup(raw_body, "html.parser")
-    text = soup.get_text()
+    return clean_body_with_history(raw_body, html_parser, strip_history)[0]
+
+
+def clean_body_with_history(raw_body: str, html_parser: str = None, strip_history: bool = True) -> tuple:
+    """
+    Like clean_body, but returns (body, history) where history is the quoted
+    text that was cut off ("" when there was none).
+    """
+    if _HTML_MARKER_RE.search(raw_body):
+        _clean_body_stats["html"] += 1
+        soup = BeautifulSoup(raw_body, _resolve_html_parser(html_parser or HTML_PARSER))
+        text = soup.get_text()
+    else:
+        _clean_body_stats["plain"] += 1
+        text = raw_body
+
+    history = ""
+    if strip_history:
+        text, history, _, _ = strip_quotes(text)
+    return _filter_lines(text), history.strip()
 
+
+def _filter_lines(text: str) -> str:
     lines = text.strip().splitlines()
     cleaned_lines = []
 
@@ -48,21 +243,60 @@ def clean_body(raw_body: str) -> str:
         cleaned_lines.append(stripped)
 
     return "\n".join(cleaned_lines).strip()
+
+
+def _resolve_html_parser(name: str) -> str:
+    if name != "auto":
+        return name
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+def clean_body_stats() -> dict:
+    """
+    Return how many bodies went through each cleaning tier ("plain" or "html").
+    """
+    return dict(_clean_body_stats)
+
+
+def reset_clean_body_stats() -> None:
+    for tier in _clean_body_stats:
+        _clean_body_stats[tier] = 0
+
+
+# Reply/forward prefixes, including localized ones (AW/WG German, SV/VS Nordic,
+# TR French, RIF Italian, ANTW Dutch, ODP Polish); nested prefixes go in one match.
+_SUBJECT_PREFIX_RE = re.compile(
+    r'^(?:(?:re|fwd?|aw|wg|sv|vs|tr|rif|antw|odp)(?:\[\d+\])?\s*:\s*)+',
+    flags=re.IGNORECASE,
+)
+
+SUBJECT_CACHE_SIZE = 65536
+
+
 def normalize_subject(subject: str) -> str:
     """
     Normalize the subject line by removing prefixes like 'Re:', 'Fwd:', etc.
+    Results are memoized, since the same subject repeats across a whole thread.
     """
     if not subject:
         return ""
+    return _normalize_subject_cached(subject)
 
-    # Regular expression to remove common prefixes
-    cleaned = re.sub(r'^(Re|Fwd|FW)(\[\d+\])?:\s*', '', subject, flags=re.IGNORECASE)
 
-    # Repeat in case of multiple nested prefixes (e.g. Re: Fwd: Re: Subject)
-    while re.match(r'^(Re|Fwd|FW)(\[\d+\])?:\s*', cleaned, flags=re.IGNORECASE):
-        cleaned = re.sub(r'^(Re|Fwd|FW)(\[\d+\])?:\s*', '', cleaned, flags=re.IGNORECASE)
+@lru_cache(maxsize=SUBJECT_CACHE_SIZE)
+def _normalize_subject_cached(subject: str) -> str:
+    return _SUBJECT_PREFIX_RE.sub('', subject, count=1).strip()
 
-    return cleaned.strip()
+
+def normalize_subject_cache_info():
+    """
+    Return hit/miss statistics of the normalize_subject cache (a functools CacheInfo).
+    """
+    return _normalize_subject_cached.cache_info()
 
 
 def is_quoted_line(line: str) -> bool:
@@ -110,24 +344,58 @@ def parse_email_file(filepath: str) -> dict:
         **headers,
         "Body": cleaned_body,
         "ThreadKey": build_thread_key(headers["Subject"], headers["Date"]),
+        "Timestamp": parse_date_epoch(headers["Date"]),
         "Filename": os.path.basename(filepath),
     }
 
-def parse_enron_email_string(raw_email: str, filename: str = "") -> dict:
+def parse_enron_email_string(raw_email: str, filename: str = "", keep_history: bool = False) -> dict:
     """
     Parse a raw Enron email string (not .eml) into cleaned fields.
+    With `keep_history`, the quoted history cut from the body is kept in a QuotedHistory field.
     """
-    headers = extract_headers(raw_email)
+    # Headers and body offset come from a single scan of the header block
+    with metrics.timer("header_parse"):
+        headers, body_offset = parse_header_block(raw_email)
+        if headers is None:
+            metrics.incr("header_block_fallback")
+            headers = _extract_headers_with_email_package(raw_email)
 
-    # Split header and body using double newline as separator
-    parts = raw_email.split("\n\n", 1)
-    body = parts[1] if len(parts) > 1 else ""
+    with metrics.timer("body_clean"):
+        cleaned_body, history = clean_body_with_history(raw_email[body_offset:])
 
-    cleaned_body = clean_body(body)
+    return _email_record(headers, cleaned_body, history, filename, keep_history)
 
-    return {
+
+def parse_enron_email_bytes(data: bytes, filename: str = "", keep_history: bool = False) -> dict:
+    """
+    Parse the raw bytes of an Enron email file into the same fields as
+    parse_enron_email_string, without decoding the whole file first: the header
+    block is scanned as bytes, and only the wanted header values and the body
+    are decoded, the body with the charset named by Content-Type.
+    """
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    with metrics.timer("header_parse"):
+        headers, body_offset, charset = parse_header_block_bytes(data)
+        if headers is None:
+            metrics.incr("header_block_fallback")
+            headers = _extract_headers_with_email_package(data.decode("utf-8", errors="ignore"))
+
+    with metrics.timer("body_clean"):
+        body = data[body_offset:].decode(charset, errors="ignore")
+        cleaned_body, history = clean_body_with_history(body)
+
+    return _email_record(headers, cleaned_body, history, filename, keep_history)
+
+
+def _email_record(headers: dict, cleaned_body: str, history: str, filename: str, keep_history: bool) -> dict:
+    record = {
         **headers,
         "Body": cleaned_body,
         "ThreadKey": build_thread_key(headers["Subject"], headers["Date"]),
+        "Timestamp": parse_date_epoch(headers["Date"]),
         "Filename": filename,
-    }
\ No newline at end of file
+    }
+    if keep_history:
+        record["QuotedHistory"] = history
+    return record
@@ -0,0 +1,84 @@
+# src/dates.py
+
+import calendar
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, List, Optional, Tuple
+
+# Sort key for emails whose Date could not be parsed; sorts before any real date
+MISSING_TIMESTAMP = -(2 ** 63)
+
+DATE_CACHE_SIZE = 65536
+
+# Date string -> (normalized header value, epoch or None). Ingestion normalizes the
+# Date header and then derives the Timestamp from the normalized value, and copies
+# of a message share one Date, so both lookups usually hit. Cleared when full.
+_parsed_dates = {}
+
+_date_stats = {"parsed": 0, "failed": 0, "missing": 0}
+
+
+def _parse_date(date_str: str) -> Tuple[str, Optional[int]]:
+    try:
+        return _parsed_dates[date_str]
+    except KeyError:
+        pass
+    try:
+        dt = parsedate_to_datetime(date_str)
+    except (TypeError, ValueError):
+        parsed = (date_str, None)
+    else:
+        parsed = (format_datetime(dt), calendar.timegm(dt.utctimetuple()))
+    if len(_parsed_dates) >= DATE_CACHE_SIZE:
+        _parsed_dates.clear()
+    _parsed_dates[date_str] = parsed
+    # The normalized value parses to the same instant, so remember it too
+    _parsed_dates.setdefault(parsed[0], parsed)
+    return parsed
+
+
+def normalize_date(date_str: str) -> str:
+    """
+    Return a Date header value as policy.default prints it, or unchanged when it
+    cannot be parsed. The epoch is kept, so parse_date_epoch on the result does
+    not parse it again.
+    """
+    return _parse_date(date_str)[0]
+
+
+def parse_date_epoch(date_str: str) -> Optional[int]:
+    """
+    Parse an RFC 2822 Date header into UTC epoch seconds.
+    Dates without a timezone are taken as UTC. Returns None (and counts the
+    failure) when the value is missing or cannot be parsed.
+    """
+    if not date_str:
+        _date_stats["missing"] += 1
+        return None
+    epoch = _parse_date(date_str)[1]
+    _date_stats["failed" if epoch is None else "parsed"] += 1
+    return epoch
+
+
+def parse_dates(date_strings: Iterable[str]) -> List[Optional[int]]:
+    """
+    Batch version of parse_date_epoch: each distinct Date string is parsed only once.
+    """
+    seen = {}
+    result = []
+    for date_str in date_strings:
+        if date_str not in seen:
+            seen[date_str] = parse_date_epoch(date_str)
+        result.append(seen[date_str])
+    return result
+
+
+def date_parse_stats() -> dict:
+    """
+    Return counts of parsed, failed and missing Date values since the last reset.
+    """
+    return dict(_date_stats)
+
+
+def reset_date_parse_stats() -> None:
+    for key in _date_stats:
+        _date_stats[key] = 0
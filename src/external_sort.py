@@ -0,0 +1,150 @@
+# src/external_sort.py
+
+import os
+import json
+import heapq
+import tempfile
+from itertools import groupby
+from typing import Callable, Iterator, List, Optional, Tuple
+from tqdm import tqdm
+
+from src import metrics
+from src.thread_builder import assign_thread_ids, deduplicate_threads
+from src.thread_stream import build_message_index
+from src.writers import ThreadMapWriter
+from src.addresses import AddressTable
+
+# Sort key of a spilled record: (ThreadID, timestamp, position in the input file)
+SortKey = Tuple[str, int, int]
+
+
+def write_sorted_run(items: List[Tuple[SortKey, str]], run_dir: str, n: int) -> str:
+    """
+    Sort a batch of (key, raw JSON line) pairs and write it as one run file.
+    Each line is the JSON key, a tab, then the record exactly as read; JSON
+    escapes control characters, so the first tab always ends the key.
+    """
+    with metrics.timer("sort"):
+        items.sort(key=lambda item: item[0])
+    return _write_run_from(items, run_dir, n)
+
+
+def _write_run_from(items, run_dir: str, n: int) -> str:
+    path = os.path.join(run_dir, f"run-{n:05d}.txt")
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for key, line in items:
+            f.write(json.dumps(key))
+            f.write("\t")
+            f.write(line)
+            f.write("\n")
+    return path
+
+
+def read_run(path: str) -> Iterator[Tuple[SortKey, str]]:
+    with open(path, "r", encoding="utf-8", newline="\n") as f:
+        for line in f:
+            key, _, record = line.rstrip("\n").partition("\t")
+            yield tuple(json.loads(key)), record
+
+
+def _merge_runs(paths: List[str]) -> Iterator[Tuple[SortKey, str]]:
+    return heapq.merge(*(read_run(path) for path in paths), key=lambda item: item[0])
+
+
+def spill_sorted_runs(jsonl_path: str, thread_ids: List[Optional[str]], timestamps: List[int],
+                      run_dir: str, run_size: int = 100000, fan_in: int = 64) -> List[str]:
+    """
+    Read the JSONL file sequentially and spill every threaded record to sorted
+    run files of at most `run_size` records. When there are more than `fan_in`
+    runs, groups of them are merged into longer runs first so the final merge
+    never holds more than `fan_in` files open.
+    """
+    runs = []
+    batch = []
+    # Records are spilled as the original JSON text, never decoded here. Lines
+    # are split on "\n" only, exactly like build_message_index.
+    with open(jsonl_path, "r", encoding="utf-8", newline="\n") as f:
+        lines = (line for line in f if line.strip())
+        for seq, line in enumerate(tqdm(lines, desc="Spilling sorted runs", unit="email")):
+            thread_id = thread_ids[seq]
+            if thread_id is None:
+                continue  # missing required fields, not threaded
+            batch.append(((thread_id, timestamps[seq], seq), line.rstrip("\n")))
+            if len(batch) >= run_size:
+                runs.append(write_sorted_run(batch, run_dir, len(runs)))
+                batch = []
+    if batch:
+        runs.append(write_sorted_run(batch, run_dir, len(runs)))
+    return merge_in_passes(runs, run_dir, fan_in)
+
+
+def merge_in_passes(runs: List[str], run_dir: str, fan_in: int = 64) -> List[str]:
+    """
+    Merge groups of `fan_in` sorted runs into longer runs until at most
+    `fan_in` are left, removing the inputs of each pass.
+    """
+    n = len(runs)
+    while len(runs) > fan_in:
+        merged = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            merged.append(_write_run_from(_merge_runs(group), run_dir, n))
+            n += 1
+            for path in group:
+                os.remove(path)
+        runs = merged
+    return runs
+
+
+def iter_threads_external(jsonl_path: str, run_size: int = 100000, tmp_dir: str = None,
+                          fan_in: int = 64) -> Iterator[Tuple[str, List[dict]]]:
+    """
+    Yield (ThreadID, emails) pairs for a JSONL corpus using an external merge sort,
+    so at most `run_size` records are in memory at once.
+
+    ThreadIDs are resolved on the compact message index as in thread_jsonl. The
+    records are then spilled to sorted runs keyed by (ThreadID, timestamp, input
+    position) and k-way merged, so each thread comes out complete and in date
+    order. Threads are yielded in ThreadID order, deduplicated, with ThreadPosition set.
+    """
+    addresses = AddressTable()
+    entries = build_message_index(jsonl_path, addresses)
+    thread_ids = assign_thread_ids(entries, addresses)
+    timestamps = [entry.timestamp for entry in entries]
+    del entries, addresses
+
+    with tempfile.TemporaryDirectory(prefix="thread-runs-", dir=tmp_dir) as run_dir:
+        runs = spill_sorted_runs(jsonl_path, thread_ids, timestamps, run_dir, run_size, fan_in)
+        del thread_ids, timestamps
+        yield from iter_run_threads(runs)
+
+
+def iter_run_threads(runs: List[str]) -> Iterator[Tuple[str, List[dict]]]:
+    """
+    K-way merge sorted run files and yield each thread, deduplicated and with
+    ThreadPosition set, in ThreadID order.
+    """
+    for thread_id, items in groupby(_merge_runs(runs), key=lambda item: item[0][0]):
+        emails = []
+        for position, (_, line) in enumerate(items):
+            email = json.loads(line)
+            email["ThreadID"] = thread_id
+            email["ThreadPosition"] = position
+            emails.append(email)
+        yield thread_id, deduplicate_threads({thread_id: emails})[thread_id]
+
+
+def thread_jsonl_external(jsonl_path: str, output_path: str, run_size: int = 100000, tmp_dir: str = None,
+                          on_thread: Optional[Callable[[str, List[dict]], None]] = None) -> int:
+    """
+    Out-of-core version of thread_jsonl: same output format and the same threads,
+    written in ThreadID order. Run files go to `tmp_dir` (default: the system
+    temp directory) and are removed afterwards. Returns the number of threads written.
+    """
+    with ThreadMapWriter(output_path) as out:
+        for thread_id, emails in iter_threads_external(jsonl_path, run_size, tmp_dir):
+            if on_thread is not None:
+                with metrics.timer("write"):
+                    on_thread(thread_id, emails)
+            out.write(thread_id, emails)
+    return out.count
@@ -0,0 +1,226 @@
+# src/metrics.py
+
+import os
+import json
+import cProfile
+import functools
+from time import perf_counter
+from typing import Dict, Iterable, List
+
+# Pipeline stages timed by the ingestion and threading code
+STAGES = ("read", "header_parse", "body_clean", "thread_resolve", "sort", "dedup", "write")
+
+_timers = {}     # stage -> [calls, seconds]
+_counters = {}   # name -> count
+_gauge_values = {}  # name -> last value set with set_gauge
+_profilers = {}  # stage -> cProfile.Profile, only for stages with profiling enabled
+_active_profiler = None
+
+
+class _Timer:
+    """
+    Context manager that adds its wall time to a stage, and runs the stage's
+    profiler when profiling is enabled for it.
+    """
+    __slots__ = ("stage", "start", "profiler")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        global _active_profiler
+        # cProfile cannot nest, so a stage inside a profiled stage is only timed
+        self.profiler = _profilers.get(self.stage) if _active_profiler is None else None
+        if self.profiler is not None:
+            _active_profiler = self.profiler
+            self.profiler.enable()
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _active_profiler
+        elapsed = perf_counter() - self.start
+        if self.profiler is not None:
+            self.profiler.disable()
+            _active_profiler = None
+        add_time(self.stage, elapsed)
+
+
+def timer(stage: str) -> _Timer:
+    """
+    Time a block of code as part of `stage`:
+
+        with metrics.timer("write"):
+            f.write(...)
+    """
+    return _Timer(stage)
+
+
+def timed(stage: str):
+    """
+    Decorator form of timer(): every call of the function counts towards `stage`.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_time(stage: str, seconds: float, calls: int = 1) -> None:
+    entry = _timers.get(stage)
+    if entry is None:
+        entry = _timers[stage] = [0, 0.0]
+    entry[0] += calls
+    entry[1] += seconds
+
+
+def incr(name: str, n: int = 1) -> None:
+    """
+    Increment an event counter (errors, fallbacks, ...).
+    """
+    _counters[name] = _counters.get(name, 0) + n
+
+
+def set_gauge(name: str, value: float) -> None:
+    """
+    Record the current value of a gauge (queue depth, cache size, ...).
+    """
+    _gauge_values[name] = value
+
+
+def enable_profiling(stages: Iterable[str] = STAGES) -> None:
+    """
+    Collect a cProfile profile for each of `stages` from now on. Profiles only
+    cover work done in this process, so use workers=1 when profiling ingestion.
+    """
+    for stage in stages:
+        _profilers.setdefault(stage, cProfile.Profile())
+
+
+def dump_profiles(out_dir: str) -> List[str]:
+    """
+    Write one <stage>.prof file per profiled stage (readable with pstats or snakeviz).
+    Returns the paths written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for stage, profiler in _profilers.items():
+        if stage not in _timers:
+            continue  # the stage never ran
+        path = os.path.join(out_dir, f"{stage}.prof")
+        profiler.dump_stats(path)
+        paths.append(path)
+    return paths
+
+
+def _collected_counters() -> Dict[str, int]:
+    # The cleaner and date parser keep their own counters; fold them in here
+    from src.cleaner import clean_body_stats
+    from src.dates import date_parse_stats
+    from src.quote_stripper import quote_stripper_stats
+
+    collected = {f"clean_body_{tier}": n for tier, n in clean_body_stats().items()}
+    collected.update({f"date_{outcome}": n for outcome, n in date_parse_stats().items()})
+    collected.update({f"quote_rule_{rule}": n for rule, n in quote_stripper_stats().items()})
+    return collected
+
+
+def _gauges() -> Dict[str, int]:
+    # Point-in-time values of this process; never summed across workers
+    from src.cleaner import normalize_subject_cache_info
+
+    cache = normalize_subject_cache_info()
+    return {
+        **_gauge_values,
+        "subject_cache_hits": cache.hits,
+        "subject_cache_misses": cache.misses,
+        "subject_cache_size": cache.currsize,
+    }
+
+
+def snapshot() -> dict:
+    """
+    Return every timer and counter recorded in this process (plus anything merged
+    in from workers) as a JSON-serializable dict.
+    """
+    counters = dict(_counters)
+    for name, n in _collected_counters().items():
+        counters[name] = counters.get(name, 0) + n
+    return {
+        "stages": {stage: {"calls": calls, "seconds": round(seconds, 6)}
+                   for stage, (calls, seconds) in _timers.items()},
+        "counters": counters,
+        "gauges": _gauges(),
+    }
+
+
+def merge(other: dict) -> None:
+    """
+    Add a snapshot taken in another process (e.g. a pool worker) to this one.
+    Gauges describe the other process only and are not merged.
+    """
+    for stage, stats in other.get("stages", {}).items():
+        add_time(stage, stats["seconds"], stats["calls"])
+    for name, n in other.get("counters", {}).items():
+        incr(name, n)
+
+
+def reset() -> None:
+    """
+    Clear timers, counters and the cleaner/date/quote counters. The subject cache is left warm.
+    """
+    from src.cleaner import reset_clean_body_stats
+    from src.dates import reset_date_parse_stats
+    from src.quote_stripper import reset_quote_stripper_stats
+
+    _timers.clear()
+    _counters.clear()
+    _gauge_values.clear()
+    reset_clean_body_stats()
+    reset_date_parse_stats()
+    reset_quote_stripper_stats()
+
+
+def prometheus_text(prefix: str = "enron") -> str:
+    """
+    Render a snapshot in the Prometheus text exposition format.
+    """
+    data = snapshot()
+    lines = [
+        f"# HELP {prefix}_stage_seconds_total Wall time spent in each pipeline stage.",
+        f"# TYPE {prefix}_stage_seconds_total counter",
+    ]
+    lines += [f'{prefix}_stage_seconds_total{{stage="{stage}"}} {stats["seconds"]}'
+              for stage, stats in sorted(data["stages"].items())]
+    lines += [
+        f"# HELP {prefix}_stage_calls_total Number of timed calls of each pipeline stage.",
+        f"# TYPE {prefix}_stage_calls_total counter",
+    ]
+    lines += [f'{prefix}_stage_calls_total{{stage="{stage}"}} {stats["calls"]}'
+              for stage, stats in sorted(data["stages"].items())]
+    lines += [
+        f"# HELP {prefix}_events_total Errors, fallbacks and other pipeline events.",
+        f"# TYPE {prefix}_events_total counter",
+    ]
+    lines += [f'{prefix}_events_total{{event="{name}"}} {n}' for name, n in sorted(data["counters"].items())]
+    for name, value in sorted(data["gauges"].items()):
+        lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: str) -> None:
+    """
+    Save the current metrics to `path`: Prometheus text when it ends in .prom
+    (e.g. for the node_exporter textfile collector), JSON otherwise.
+    The file is replaced atomically so a scraper never sees a partial write.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        if path.endswith(".prom"):
+            f.write(prometheus_text())
+        else:
+            json.dump(snapshot(), f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,231 @@
+# src/near_dedup.py
+
+import re
+import sys
+import random
+import hashlib
+from array import array
+from typing import Callable, Iterable, List, Optional, Union
+
+from src.addresses import parse_addresses
+from src.cleaner import normalize_subject
+from src.dates import parse_date_epoch
+from src.union_find import UnionFind
+from src.writers import iter_jsonl
+
+_TOKEN_RE = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_EMPTY = (1 << 64) - 1
+
+
+def shingles(text: str, size: int = 5) -> set:
+    """
+    Hash the overlapping word n-grams of a text (case and whitespace insensitive).
+    Texts shorter than `size` words become a single shingle.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) <= size:
+        grams = [" ".join(tokens)]
+    else:
+        grams = [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+    return {int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams}
+
+
+class MinHasher:
+    """
+    MinHash signatures of `num_perm` slots using one-permutation hashing with
+    rotation densification (Shrivastava & Li, 2014): each shingle is hashed once
+    and lands in one slot, and empty slots borrow from the next filled one.
+    This estimates Jaccard similarity like classic MinHash at O(shingles + slots)
+    per document instead of O(shingles * slots). The same seed always gives the
+    same signatures, so they can be compared across runs.
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = rng.randrange(1, _MERSENNE_PRIME)
+        self.b = rng.randrange(0, _MERSENNE_PRIME)
+        # Offset added per borrowed slot, so borrowed values never equal real ones by accident
+        self.bin_width = _MERSENNE_PRIME // num_perm + 1
+
+    def signature(self, shingle_set: set) -> array:
+        k = self.num_perm
+        slots = [_EMPTY] * k
+        a, b = self.a, self.b
+        for x in shingle_set:
+            h = (a * x + b) % _MERSENNE_PRIME
+            slot, value = h % k, h // k
+            if value < slots[slot]:
+                slots[slot] = value
+        if not shingle_set:
+            return array("Q", slots)
+
+        # Densify: walk backwards so each empty slot takes its right neighbour's value
+        offset_step = self.bin_width
+        last_filled = max(i for i in range(k) if slots[i] != _EMPTY)
+        carry, distance = slots[last_filled], 0
+        for i in range(last_filled - 1, last_filled - 1 - k, -1):
+            j = i % k
+            if slots[j] == _EMPTY:
+                distance += 1
+                slots[j] = carry + distance * offset_step
+            else:
+                carry, distance = slots[j], 0
+        return array("Q", slots)
+
+
+def lsh_params(threshold: float, num_perm: int) -> tuple:
+    """
+    Pick (bands, rows) with bands * rows == num_perm whose S-curve midpoint
+    (1/bands) ** (1/rows) is closest to the similarity threshold.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def _dedup_text(email: dict) -> str:
+    return f"{normalize_subject(email.get('Subject', ''))} {email.get('Body', '')}"
+
+
+def _sender(email: dict) -> str:
+    # Canonical addresses, so display-name and case variants of one sender share buckets
+    return sys.intern(",".join(parse_addresses(email.get("From") or "")))
+
+
+def _timestamp(email: dict) -> Optional[int]:
+    if "Timestamp" in email:
+        return email["Timestamp"]
+    return parse_date_epoch(email.get("Date"))
+
+
+def find_near_duplicates(emails: Iterable[dict], threshold: float = 0.8, num_perm: int = 128,
+                         shingle_size: int = 5, time_window: Optional[int] = 86400,
+                         seed: int = 1) -> List[List[int]]:
+    """
+    Group near-identical emails across the whole corpus.
+
+    Emails are compared on shingles of their normalized subject and body.
+    Candidates come from LSH buckets over MinHash signatures, so the cost grows with
+    the corpus size rather than the number of pairs. A candidate pair is kept when
+    both emails have the same sender, their estimated Jaccard similarity is at
+    least `threshold` and, unless time_window is None, their Timestamps are at
+    most time_window seconds apart.
+    Returns clusters of two or more input positions, each sorted.
+    """
+    hasher = MinHasher(num_perm, seed)
+    bands, rows = lsh_params(threshold, num_perm)
+    signatures = []
+    timestamps = []
+    senders = []
+    buckets = {}
+
+    for i, email in enumerate(emails):
+        sig = hasher.signature(shingles(_dedup_text(email), shingle_size))
+        signatures.append(sig)
+        timestamps.append(_timestamp(email))
+        senders.append(_sender(email))
+        # Only same-sender pairs can match, so the sender is part of the bucket key: a
+        # short text sent by thousands of people ("Thanks") makes thousands of small buckets
+        for band in range(bands):
+            key = (band, senders[i], sig[band * rows:(band + 1) * rows].tobytes())
+            buckets.setdefault(key, []).append(i)
+
+    def similar(a, b):
+        if senders[a] != senders[b]:
+            return False
+        if time_window is not None:
+            ta, tb = timestamps[a], timestamps[b]
+            if ta is None or tb is None or abs(ta - tb) > time_window:
+                return False
+        same = sum(x == y for x, y in zip(signatures[a], signatures[b]))
+        return same / num_perm >= threshold
+
+    clusters = UnionFind()
+    for members in buckets.values():
+        # Compare each member with one representative per cluster already in the
+        # bucket, so a bucket of n copies of one message costs O(n), not O(n^2)
+        representatives = []
+        for member in members:
+            for rep in representatives:
+                if clusters.find(rep) == clusters.find(member) or similar(rep, member):
+                    clusters.union(rep, member)
+                    break
+            else:
+                representatives.append(member)
+
+    groups = [sorted(members) for members in clusters.groups().values() if len(members) > 1]
+    return sorted(groups)
+
+
+def _canonical(cluster: List[int], emails: List[dict], keep: Union[str, Callable]) -> int:
+    if keep == "first":
+        return cluster[0]
+    if keep == "longest":
+        return max(cluster, key=lambda i: (len(emails[i].get("Body") or ""), -i))
+    if keep == "earliest":
+        return min(cluster, key=lambda i: (_timestamp(emails[i]) is None, _timestamp(emails[i]) or 0, i))
+    if callable(keep):
+        members = [emails[i] for i in cluster]
+        chosen = keep(members)
+        return next(i for i, email in zip(cluster, members) if email is chosen)
+    raise ValueError(f"Unknown keep strategy: {keep!r}")
+
+
+def deduplicate_near(emails: List[dict], threshold: float = 0.8, keep: Union[str, Callable] = "first",
+                     **kwargs) -> List[dict]:
+    """
+    Drop near-duplicate emails, keeping one canonical copy per cluster.
+    keep is "first" (input order), "longest" (longest Body), "earliest" (lowest
+    Timestamp) or a callable that picks one email from a cluster's list.
+    Other keyword arguments go to find_near_duplicates.
+    """
+    dropped = set()
+    for cluster in find_near_duplicates(emails, threshold=threshold, **kwargs):
+        canonical = _canonical(cluster, emails, keep)
+        dropped.update(i for i in cluster if i != canonical)
+    return [email for i, email in enumerate(emails) if i not in dropped]
+
+
+def deduplicate_jsonl(input_path: str, output_path: str, threshold: float = 0.8,
+                      keep: str = "first", **kwargs) -> int:
+    """
+    Near-deduplicate a JSONL corpus in two passes without keeping bodies in memory:
+    the first pass computes signatures, the second copies the surviving lines.
+    keep may be "first" or "earliest". Returns the number of records dropped.
+    """
+    if keep not in ("first", "earliest"):
+        raise ValueError(f"Unknown keep strategy for JSONL input: {keep!r}")
+
+    timestamps = []
+
+    def remember_timestamps(records):
+        for record in records:
+            timestamps.append(_timestamp(record))
+            yield record
+
+    clusters = find_near_duplicates(remember_timestamps(iter_jsonl(input_path)), threshold=threshold, **kwargs)
+    dropped = set()
+    for cluster in clusters:
+        if keep == "first":
+            canonical = cluster[0]
+        else:
+            canonical = min(cluster, key=lambda i: (timestamps[i] is None, timestamps[i] or 0, i))
+        dropped.update(i for i in cluster if i != canonical)
+
+    with open(input_path, "r", encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as out:
+        i = 0
+        for line in src:
+            if not line.strip():
+                continue
+            if i not in dropped:
+                out.write(line)
+            i += 1
+    return len(dropped)
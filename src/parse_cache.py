@@ -0,0 +1,164 @@
+# src/parse_cache.py
+
+import os
+import json
+import time
+import inspect
+import hashlib
+import sqlite3
+from typing import Dict, Iterable, Tuple
+
+import bs4
+
+from src import cleaner, dates, quote_stripper
+
+# Fields that depend on where a file lives rather than what it contains
+LOCATION_FIELDS = ("Filename", "Mailbox")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    digest TEXT NOT NULL,
+    version TEXT NOT NULL,
+    record TEXT NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (digest, version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+"""
+
+
+def cleaner_version() -> str:
+    """
+    Fingerprint of the parsing and cleaning code: a hash of the source of the
+    cleaner, quote stripper and date modules plus the BeautifulSoup version. Any edit to
+    clean_body, the header parser or their helpers changes it.
+    """
+    h = hashlib.sha256()
+    for module in (cleaner, quote_stripper, dates):
+        h.update(inspect.getsource(module).encode("utf-8"))
+    h.update(bs4.__version__.encode("ascii"))
+    return h.hexdigest()[:16]
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(digest: str, keep_history: bool = False) -> str:
+    """
+    Cache key of content with this digest. Records parsed with keep_history
+    carry a QuotedHistory field, so they are stored apart from the others.
+    """
+    return f"{digest}:history" if keep_history else digest
+
+
+class ParseCache:
+    """
+    SQLite store of parsed emails keyed by the SHA-256 of the raw file plus the
+    cleaner version, so unchanged files skip parse_enron_email_string entirely.
+
+    Entries written by another cleaner version are dropped when the cache is
+    opened. On close, the least recently used entries beyond `max_entries` are evicted.
+    Only one process should write; pool workers read through open_reader().
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 1_000_000, version: str = None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.version = version or cleaner_version()
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        with self.conn:
+            self.conn.execute("DELETE FROM entries WHERE version != ?", (self.version,))
+
+    def get_many(self, digests: Iterable[str]) -> Dict[str, dict]:
+        return _lookup(self.conn, self.version, digests)
+
+    def put_many(self, items: Iterable[Tuple[str, dict]]) -> None:
+        """
+        Store (digest, record) pairs. Location fields are not cached, since
+        identical files in different folders share one entry.
+        """
+        now = int(time.time())
+        rows = [(digest, self.version, json.dumps(strip_location(record), ensure_ascii=False), now)
+                for digest, record in items]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows)
+
+    def touch(self, digests: Iterable[str]) -> None:
+        """
+        Mark entries as used now, so eviction keeps them.
+        """
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany("UPDATE entries SET last_used = ? WHERE digest = ? AND version = ?",
+                                  [(now, digest, self.version) for digest in digests])
+
+    def evict(self) -> int:
+        """
+        Drop the least recently used entries beyond max_entries. Returns how many were removed.
+        """
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM entries WHERE (digest, version) IN "
+                "(SELECT digest, version FROM entries ORDER BY last_used LIMIT ?)", (excess,))
+        return excess
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self) -> None:
+        self.evict()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def strip_location(record: dict) -> dict:
+    return {k: v for k, v in record.items() if k not in LOCATION_FIELDS}
+
+
+def _lookup(conn, version: str, digests: Iterable[str]) -> Dict[str, dict]:
+    found = {}
+    digests = list(set(digests))
+    # Stay under SQLite's limit on bound parameters
+    for start in range(0, len(digests), 500):
+        batch = digests[start:start + 500]
+        rows = conn.execute(
+            f"SELECT digest, record FROM entries WHERE version = ? AND digest IN ({','.join('?' * len(batch))})",
+            [version] + batch)
+        found.update((digest, json.loads(record)) for digest, record in rows)
+    return found
+
+
+_readers = {}
+
+
+def open_reader(db_path: str) -> "CacheReader":
+    """
+    Read-only handle on a cache, opened once per process (for pool workers).
+    Keyed by process ID too, so a forked child never reuses its parent's connection.
+    """
+    key = (os.getpid(), db_path)
+    reader = _readers.get(key)
+    if reader is None:
+        reader = _readers[key] = CacheReader(db_path)
+    return reader
+
+
+class CacheReader:
+    def __init__(self, db_path: str):
+        self.version = cleaner_version()
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+    def get_many(self, digests: Iterable[str]) -> Dict[str, dict]:
+        return _lookup(self.conn, self.version, digests)
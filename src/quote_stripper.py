@@ -0,0 +1,78 @@
+# src/quote_stripper.py
+
+import re
+from typing import NamedTuple, Optional
+
+# Markers that start the quoted history of an Enron reply or forward, in the
+# formats Outlook and Lotus Notes produced. Every rule is anchored at a line start.
+RULES = {
+    # -----Original Message-----
+    "original_message": r"^[ \t>]*-{2,}[ \t]*Original Message[ \t]*-{2,}[ \t]*$",
+    # ---------------------- Forwarded by Phillip K Allen/HOU/ECT on 10/16/2000 01:42 PM -----
+    "forwarded_by": r"^[ \t>]*-{3,}[ \t]*Forwarded by\b[^\n]*$",
+    # From: John Arnold
+    # Sent: Monday, May 14, 2001 4:39 PM
+    "from_sent": r"^[ \t>]*From:[ \t][^\n]*\n[ \t>]*Sent:[ \t]",
+    # "Dasovich, Jeff" <jeff.dasovich@enron.com> on 10/16/2000 01:42:07 PM
+    # To: ...
+    "notes_header": (r"^[ \t>]*[^\n]{1,200}? on \d{1,2}/\d{1,2}/\d{2,4} \d{1,2}:\d{2}(?::\d{2})?[ \t]*[AP]M[ \t]*$"
+                     r"(?=(?:\n[ \t]*)*\n[ \t>]*To:)"),
+    # On Mon, 14 May 2001, Bob wrote:
+    # > ...
+    "wrote": r"^[^\n]{1,200}\bwrote:[ \t]*$(?=(?:\n[ \t]*)*\n[ \t]*>)",
+}
+
+# One alternation of every rule: a single left-to-right search finds the
+# earliest marker of any kind, and the named group that matched tells which rule fired.
+_QUOTE_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in RULES.items()),
+                       flags=re.MULTILINE)
+
+# Text every rule needs somewhere in the body. Most bodies contain none of it,
+# and a substring check is far cheaper than trying the regex at every line start.
+_KEYWORDS = ("Original Message", "Forwarded by", "Sent:", "To:", "wrote:")
+
+_rule_hits = {name: 0 for name in RULES}
+_rule_hits["kept_forward"] = 0
+
+
+class QuoteCut(NamedTuple):
+    """
+    Result of strip_quotes: the new text, the quoted history cut from it, the
+    offset of the cut in the input (None when nothing was cut) and the rule that matched.
+    """
+    text: str
+    history: str
+    cut: Optional[int]
+    rule: Optional[str]
+
+
+def strip_quotes(text: str) -> QuoteCut:
+    """
+    Cut `text` at the first quoted-history marker (see RULES).
+
+    A pure forward, where the marker comes before any text of the sender's own,
+    is kept whole: cutting it would leave an empty message.
+    """
+    if not any(keyword in text for keyword in _KEYWORDS):
+        return QuoteCut(text, "", None, None)
+    match = _QUOTE_RE.search(text)
+    if match is None:
+        return QuoteCut(text, "", None, None)
+    cut = match.start()
+    if not text[:cut].strip():
+        _rule_hits["kept_forward"] += 1
+        return QuoteCut(text, "", None, match.lastgroup)
+    _rule_hits[match.lastgroup] += 1
+    return QuoteCut(text[:cut], text[cut:], cut, match.lastgroup)
+
+
+def quote_stripper_stats() -> dict:
+    """
+    Return how many bodies each rule cut, and how many pure forwards were kept whole.
+    """
+    return dict(_rule_hits)
+
+
+def reset_quote_stripper_stats() -> None:
+    for name in _rule_hits:
+        _rule_hits[name] = 0
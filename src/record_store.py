@@ -0,0 +1,186 @@
+# src/record_store.py
+
+import sys
+import json
+from array import array
+from collections.abc import MutableMapping
+from typing import Iterable, Iterator
+
+from src.dates import MISSING_TIMESTAMP, parse_date_epoch
+
+# Header-like fields repeat heavily across the corpus, so their values are interned
+STRING_FIELDS = ("MessageID", "From", "To", "InReplyTo", "Subject", "Date", "ThreadKey", "Filename", "ThreadID")
+
+
+class RecordStore:
+    """
+    Column-oriented container for cleaned emails.
+
+    Each string field is one list of interned strings, Timestamp and ThreadPosition
+    are typed arrays, and every Body lives in a single UTF-8 buffer addressed by
+    offsets. Indexing returns a RecordView, a dict-like view, so code written for
+    lists of dicts (build_thread_map, deduplicate_threads, ...) keeps working.
+    """
+
+    def __init__(self):
+        self._columns = {field: [] for field in STRING_FIELDS}
+        self._timestamps = array("q")
+        self._positions = array("q")
+        self._bodies = bytearray()
+        self._body_offsets = array("Q", [0])
+        self._has_body = bytearray()
+        self._extra = {}  # index -> fields outside the fixed schema
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "RecordStore":
+        store = cls()
+        store.extend(records)
+        return store
+
+    @classmethod
+    def from_jsonl(cls, path: str) -> "RecordStore":
+        """
+        Load a JSONL file one line at a time, so the decoded dicts never pile up.
+        """
+        store = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    store.append(json.loads(line))
+        return store
+
+    def append(self, record: dict) -> int:
+        index = len(self._timestamps)
+        for field in STRING_FIELDS:
+            value = record.get(field)
+            self._columns[field].append(sys.intern(str(value)) if value is not None else None)
+
+        timestamp = record["Timestamp"] if "Timestamp" in record else parse_date_epoch(record.get("Date"))
+        self._timestamps.append(MISSING_TIMESTAMP if timestamp is None else timestamp)
+        self._positions.append(record.get("ThreadPosition", -1))
+
+        body = record.get("Body")
+        self._has_body.append(body is not None)
+        if body is not None:
+            self._bodies += body.encode("utf-8")
+        self._body_offsets.append(len(self._bodies))
+
+        extra = {k: v for k, v in record.items() if k not in _KNOWN_FIELDS}
+        if extra:
+            self._extra[index] = extra
+        return index
+
+    def extend(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def __getitem__(self, index: int) -> "RecordView":
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        return RecordView(self, index)
+
+    def __iter__(self) -> Iterator["RecordView"]:
+        for index in range(len(self)):
+            yield RecordView(self, index)
+
+    def body(self, index: int) -> str:
+        start, end = self._body_offsets[index], self._body_offsets[index + 1]
+        return self._bodies[start:end].decode("utf-8")
+
+    def to_dicts(self) -> list:
+        return [view.to_dict() for view in self]
+
+
+_KNOWN_FIELDS = frozenset(STRING_FIELDS + ("Timestamp", "ThreadPosition", "Body"))
+
+
+class RecordView(MutableMapping):
+    """
+    Dict-like view of one record in a RecordStore. Reads and writes go to the store.
+    """
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: RecordStore, index: int):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, key):
+        store, i = self._store, self._index
+        if key in store._columns:
+            value = store._columns[key][i]
+        elif key == "Body":
+            if "Body" in store._extra.get(i, ()):
+                return store._extra[i]["Body"]
+            value = store.body(i) if store._has_body[i] else None
+        elif key == "Timestamp":
+            value = store._timestamps[i]
+            return None if value == MISSING_TIMESTAMP else value
+        elif key == "ThreadPosition":
+            value = store._positions[i]
+            value = None if value < 0 else value
+        else:
+            return store._extra[i][key]
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        store, i = self._store, self._index
+        if key in store._columns:
+            store._columns[key][i] = sys.intern(str(value)) if value is not None else None
+        elif key == "Timestamp":
+            store._timestamps[i] = MISSING_TIMESTAMP if value is None else value
+        elif key == "ThreadPosition":
+            store._positions[i] = -1 if value is None else value
+        elif key == "Body":
+            # Bodies are append-only in the shared buffer; rewrites are kept aside
+            store._extra.setdefault(i, {})["Body"] = value
+        else:
+            store._extra.setdefault(i, {})[key] = value
+
+    def __delitem__(self, key):
+        store, i = self._store, self._index
+        if key in store._columns and store._columns[key][i] is not None:
+            store._columns[key][i] = None
+        elif key == "ThreadPosition" and store._positions[i] >= 0:
+            store._positions[i] = -1
+        elif key in store._extra.get(i, {}):
+            del store._extra[i][key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        store, i = self._store, self._index
+        extra = store._extra.get(i, {})
+        for field in STRING_FIELDS:
+            if store._columns[field][i] is not None:
+                yield field
+        if store._has_body[i] and "Body" not in extra:
+            yield "Body"
+        yield "Timestamp"
+        if store._positions[i] >= 0:
+            yield "ThreadPosition"
+        yield from extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self}
+
+    def __repr__(self) -> str:
+        return f"RecordView({self.to_dict()!r})"
+
+
+def json_default(obj):
+    """
+    `default=` hook for json.dump so RecordViews serialize as plain objects.
+    """
+    if isinstance(obj, RecordView):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
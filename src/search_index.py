@@ -0,0 +1,217 @@
+# src/search_index.py
+
+import os
+import json
+import sqlite3
+import calendar
+from datetime import datetime
+from email.utils import getaddresses
+from typing import Iterable, List, Optional, Union
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    id INTEGER PRIMARY KEY,
+    message_id TEXT,
+    thread_id TEXT,
+    thread_position INTEGER,
+    sender TEXT,
+    timestamp INTEGER,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recipients (
+    email_id INTEGER NOT NULL,
+    address TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(subject, body, content='');
+"""
+
+# Built after the bulk load, which is much faster than maintaining them row by row
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_emails_sender ON emails (sender, timestamp);
+CREATE INDEX IF NOT EXISTS idx_emails_timestamp ON emails (timestamp);
+CREATE INDEX IF NOT EXISTS idx_emails_thread ON emails (thread_id, thread_position);
+CREATE INDEX IF NOT EXISTS idx_emails_message_id ON emails (message_id);
+CREATE INDEX IF NOT EXISTS idx_recipients_address ON recipients (address, email_id);
+"""
+
+
+def _addresses(header: str) -> List[str]:
+    return [addr.lower() for _, addr in getaddresses([header or ""]) if addr]
+
+
+class IndexWriter:
+    """
+    Load records into a SQLite search index: an FTS5 token index over Subject and
+    Body plus B-tree indexes on sender, recipients, Timestamp and ThreadID.
+    Records are inserted in batches inside one transaction per batch.
+
+    The index is built in a temporary file next to `db_path` that replaces it on
+    close, so re-running a pipeline stage rebuilds the index instead of adding
+    every record again, and readers never see a half-built index. With `extend`,
+    records are added to the existing index instead.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 10000, extend: bool = False):
+        self.db_path = db_path
+        self.build_path = db_path if extend else db_path + ".tmp"
+        if not extend and os.path.exists(self.build_path):
+            os.remove(self.build_path)  # left over from an interrupted build
+        self.conn = sqlite3.connect(self.build_path)
+        self.conn.executescript(_SCHEMA)
+        self.batch_size = batch_size
+        self.pending = []
+        self.count = 0
+
+    def add(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.pending.append(record)
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        with self.conn:
+            for record in self.pending:
+                senders = _addresses(record.get("From"))
+                cursor = self.conn.execute(
+                    "INSERT INTO emails (message_id, thread_id, thread_position, sender, timestamp, record) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        record.get("MessageID"),
+                        record.get("ThreadID"),
+                        record.get("ThreadPosition"),
+                        senders[0] if senders else None,
+                        record.get("Timestamp"),
+                        json.dumps(dict(record), ensure_ascii=False),
+                    ),
+                )
+                email_id = cursor.lastrowid
+                self.conn.execute(
+                    "INSERT INTO emails_fts (rowid, subject, body) VALUES (?, ?, ?)",
+                    (email_id, record.get("Subject") or "", record.get("Body") or ""),
+                )
+                self.conn.executemany(
+                    "INSERT INTO recipients (email_id, address) VALUES (?, ?)",
+                    [(email_id, address) for address in _addresses(record.get("To"))],
+                )
+        self.count += len(self.pending)
+        self.pending = []
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.executescript(_INDEXES)
+        self.conn.execute("ANALYZE")
+        self.conn.close()
+        if self.build_path != self.db_path:
+            os.replace(self.build_path, self.db_path)
+
+    def abort(self) -> None:
+        """
+        Stop without touching the index at db_path (a new build is discarded;
+        batches already added with `extend` stay).
+        """
+        self.conn.close()
+        if self.build_path != self.db_path:
+            os.remove(self.build_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def build_index(records: Iterable[dict], db_path: str, batch_size: int = 10000, extend: bool = False) -> int:
+    """
+    Build the search index at `db_path`, replacing any index there, or add to it
+    with `extend`. Returns the number of records indexed.
+    For a thread map, pass src.writers.flatten_threads(thread_map).
+    """
+    with IndexWriter(db_path, batch_size, extend) as writer:
+        writer.add(records)
+    return writer.count
+
+
+def _epoch(value: Union[int, datetime, None]) -> Optional[int]:
+    # Stored Timestamps are UTC epochs, so a naive datetime is read as UTC, never as local time
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple())
+    return value
+
+
+class EmailIndex:
+    """
+    Read-only query API over an index built by build_index.
+
+        with EmailIndex("enron.sqlite") as index:
+            index.find(text="gas forecast", sender="john.arnold@enron.com")
+            index.find_threads(text="california", start=datetime(2001, 1, 1))
+
+    Filters can be combined; `text` uses FTS5 query syntax over Subject and Body.
+    start/end are epoch seconds or datetimes (end is exclusive).
+    """
+
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+    def _where(self, text, sender, recipient, start, end):
+        clauses, params = [], []
+        if text:
+            clauses.append("e.id IN (SELECT rowid FROM emails_fts WHERE emails_fts MATCH ?)")
+            params.append(text)
+        if sender:
+            clauses.append("e.sender = ?")
+            params.append(sender.lower())
+        if recipient:
+            clauses.append("e.id IN (SELECT email_id FROM recipients WHERE address = ?)")
+            params.append(recipient.lower())
+        if start is not None:
+            clauses.append("e.timestamp >= ?")
+            params.append(_epoch(start))
+        if end is not None:
+            clauses.append("e.timestamp < ?")
+            params.append(_epoch(end))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def find(self, text: str = None, sender: str = None, recipient: str = None,
+             start=None, end=None, limit: int = 100) -> List[dict]:
+        """
+        Return matching email records, oldest first.
+        """
+        where, params = self._where(text, sender, recipient, start, end)
+        rows = self.conn.execute(
+            f"SELECT e.record FROM emails e{where} ORDER BY e.timestamp, e.id LIMIT ?", params + [limit])
+        return [json.loads(record) for record, in rows]
+
+    def find_threads(self, text: str = None, sender: str = None, recipient: str = None,
+                     start=None, end=None, limit: int = 100) -> List[str]:
+        """
+        Return the ThreadIDs of threads with at least one matching email.
+        """
+        where, params = self._where(text, sender, recipient, start, end)
+        rows = self.conn.execute(
+            f"SELECT e.thread_id FROM emails e{where} "
+            f"{'AND' if where else 'WHERE'} e.thread_id IS NOT NULL "
+            f"GROUP BY e.thread_id ORDER BY MIN(e.timestamp) LIMIT ?", params + [limit])
+        return [thread_id for thread_id, in rows]
+
+    def thread(self, thread_id: str) -> List[dict]:
+        """
+        Return every email of a thread in ThreadPosition order.
+        """
+        rows = self.conn.execute(
+            "SELECT record FROM emails WHERE thread_id = ? ORDER BY thread_position, id", (thread_id,))
+        return [json.loads(record) for record, in rows]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,278 @@
+# src/sharding.py
+
+import os
+import json
+import hashlib
+import tempfile
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+from tqdm import tqdm
+
+from src import metrics
+from src.cleaner import normalize_subject
+from src.union_find import UnionFind
+from src.addresses import AddressTable
+from src.writers import ThreadMapWriter
+from src.thread_builder import make_entry, link_replies, assign_thread_ids, chain_root, thread_id_for_root
+from src.external_sort import write_sorted_run, read_run, merge_in_passes, iter_run_threads
+
+MANIFEST_NAME = "shards.json"
+SHARD_PATTERN = "shard-{:05d}.jsonl"
+LOCAL_PATTERN = "shard-{:05d}.local.txt"
+SUMMARY_PATTERN = "shard-{:05d}.summary.json"
+REMAP_PATTERN = "shard-{:05d}.remap.json"
+
+PHASES = ("all", "partition", "map", "reduce", "assemble", "merge")
+
+# Sharded threading runs in five phases over one shared directory:
+#
+#   partition  split the corpus into shards by a hash of the normalized subject
+#   map        thread every shard on its own (any process or host)
+#   reduce     resolve In-Reply-To links whose parent is in another shard
+#   assemble   apply the reduce result to every shard and sort it (any process or host)
+#   merge      k-way merge the sorted shards into the thread map
+#
+# Heuristic threads never span shards, because the subject decides the shard.
+# Only reply chains can, and the reduce step only reads each shard's compact link summary.
+
+
+def shard_for_subject(subject: str, shards: int) -> int:
+    """
+    Shard of an email with this Subject: a stable hash of its normalized form,
+    so a thread's replies land with their parent and every host agrees.
+    """
+    digest = hashlib.sha256(normalize_subject(subject).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def shard_count(shard_dir: str) -> int:
+    with open(os.path.join(shard_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)["shards"]
+
+
+def _path(shard_dir: str, pattern: str, index: int) -> str:
+    return os.path.join(shard_dir, pattern.format(index))
+
+
+def _write_json(path: str, data) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _iter_shard(shard_dir: str, index: int):
+    # Shard lines are the input position, a tab, then the record as read
+    with open(_path(shard_dir, SHARD_PATTERN, index), "r", encoding="utf-8", newline="\n") as f:
+        for line in f:
+            seq, _, record = line.rstrip("\n").partition("\t")
+            yield int(seq), record
+
+
+def partition_jsonl(jsonl_path: str, shard_dir: str, shards: int) -> List[int]:
+    """
+    Split a JSONL corpus into `shards` files in `shard_dir`, keeping every
+    record's position in the input so the shards can be merged back in the
+    same order as a single-process run. Returns the number of records per shard.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    files = [open(_path(shard_dir, SHARD_PATTERN, i), "w", encoding="utf-8", newline="\n")
+             for i in range(shards)]
+    counts = [0] * shards
+    try:
+        with metrics.timer("read"), open(jsonl_path, "r", encoding="utf-8", newline="\n") as f:
+            lines = (line for line in f if line.strip())
+            for seq, line in enumerate(tqdm(lines, desc="Partitioning emails", unit="email")):
+                record = line.rstrip("\n")
+                index = shard_for_subject(json.loads(record).get("Subject", ""), shards)
+                files[index].write(f"{seq}\t{record}\n")
+                counts[index] += 1
+    finally:
+        for f in files:
+            f.close()
+    _write_json(os.path.join(shard_dir, MANIFEST_NAME), {"shards": shards, "counts": counts})
+    return counts
+
+
+def map_shard(shard_dir: str, index: int) -> None:
+    """
+    Thread one shard on its own. Writes its records keyed by their local
+    ThreadID, and a summary of its reply links for reduce_shards: the shard
+    representative of every MessageID, the MessageIDs with a parent in the
+    shard, the replies whose parent is not in the shard, and the local
+    ThreadID of every reply chain.
+    """
+    addresses = AddressTable()
+    entries = [make_entry(json.loads(record), seq, addresses=addresses)
+               for seq, record in _iter_shard(shard_dir, index)]
+    # The links are kept so the reduce step can extend them across shards
+    links = link_replies(entries)
+    thread_ids = assign_thread_ids(entries, addresses, links)
+    reply_sets = links.reply_sets
+    known_ids = {e.message_id for e in entries if e.message_id}
+    components = {representative: thread_id_for_root(root) for representative, root in links.roots.items()}
+
+    with metrics.timer("write"):
+        with open(_path(shard_dir, LOCAL_PATTERN, index), "w", encoding="utf-8", newline="\n") as out:
+            for entry, thread_id, (_, record) in zip(entries, thread_ids, _iter_shard(shard_dir, index)):
+                if thread_id is None:
+                    continue  # missing required fields, not threaded
+                key = [thread_id, entry.timestamp, entry.offset, entry.message_id or None, entry.in_reply_to or None]
+                out.write(f"{json.dumps(key)}\t{record}\n")
+        _write_json(_path(shard_dir, SUMMARY_PATTERN, index), {
+            "nodes": {m: (reply_sets.find(m) if m in reply_sets else None) for m in known_ids},
+            "parented": list(links.parent_of),
+            "dangling": [[msg_id or None, in_reply_to] for msg_id, in_reply_to in links.dangling],
+            "components": components,
+        })
+
+
+@metrics.timed("thread_resolve")
+def reduce_shards(shard_dir: str) -> int:
+    """
+    Join the reply chains of all shards. Every reply whose parent landed in
+    another shard, and every MessageID found in more than one shard, links the
+    chains involved with a union-find over (shard, local representative) keys.
+    Each joined chain gets the ThreadID a single-process run would give it,
+    and every shard gets a remap from its local ThreadIDs to the global ones.
+    Returns the number of cross-shard links resolved.
+    """
+    shards = shard_count(shard_dir)
+    summaries = [_read_json(_path(shard_dir, SUMMARY_PATTERN, i)) for i in range(shards)]
+
+    def key_of(index, msg_id):
+        representative = summaries[index]["nodes"][msg_id]
+        return (index, representative) if representative is not None else (None, msg_id)
+
+    where = {}
+    reply_sets = UnionFind()
+    for index, summary in enumerate(summaries):
+        for msg_id in summary["nodes"]:
+            if msg_id not in where:
+                where[msg_id] = index
+                continue
+            # The same MessageID in two shards is one node, as in a single run
+            first, other = key_of(where[msg_id], msg_id), key_of(index, msg_id)
+            if first != other:
+                reply_sets.union(first, other)
+
+    parented = set()
+    orphans = []
+    links = 0
+    for index, summary in enumerate(summaries):
+        parented.update(summary["parented"])
+        for msg_id, in_reply_to in summary["dangling"]:
+            if in_reply_to not in where:
+                continue
+            links += 1
+            target = key_of(where[in_reply_to], in_reply_to)
+            if msg_id:
+                parented.add(msg_id)
+                reply_sets.union(key_of(index, msg_id), target)
+            else:
+                reply_sets.add(target)
+                orphans.append((index, in_reply_to, target))
+
+    members = {}
+    for index, summary in enumerate(summaries):
+        for msg_id, representative in summary["nodes"].items():
+            if representative is not None and (index, representative) in reply_sets:
+                members.setdefault((index, representative), []).append(msg_id)
+
+    remaps = [{"threads": {}, "ids": {}, "orphans": {}} for _ in range(shards)]
+    chain_ids = {}
+    for representative, keys in reply_sets.groups().items():
+        chain = [m for key in keys for m in (members[key] if key[0] is not None else [key[1]])]
+        thread_id = chain_ids[representative] = thread_id_for_root(chain_root(chain, parented))
+        for index, node in keys:
+            if index is not None:
+                local_id = summaries[index]["components"][node]
+                if local_id != thread_id:
+                    remaps[index]["threads"][local_id] = thread_id
+                continue
+            for shard, summary in enumerate(summaries):
+                if summary["nodes"].get(node, False) is None:
+                    remaps[shard]["ids"][node] = thread_id
+    for index, in_reply_to, target in orphans:
+        remaps[index]["orphans"][in_reply_to] = chain_ids[reply_sets.find(target)]
+
+    with metrics.timer("write"):
+        for index, remap in enumerate(remaps):
+            _write_json(_path(shard_dir, REMAP_PATTERN, index), remap)
+    return links
+
+
+def assemble_shard(shard_dir: str, index: int) -> str:
+    """
+    Apply the reduce remap to one shard and write it as a run sorted by
+    (ThreadID, timestamp, input position). Returns the run file path.
+    """
+    remap = _read_json(_path(shard_dir, REMAP_PATTERN, index))
+    threads, ids, orphans = remap["threads"], remap["ids"], remap["orphans"]
+    items = []
+    for key, record in read_run(_path(shard_dir, LOCAL_PATTERN, index)):
+        thread_id, timestamp, seq, msg_id, in_reply_to = key
+        if thread_id in threads:
+            thread_id = threads[thread_id]
+        elif msg_id:
+            thread_id = ids.get(msg_id, thread_id)
+        elif in_reply_to:
+            thread_id = orphans.get(in_reply_to, thread_id)
+        items.append(((thread_id, timestamp, seq), record))
+    return write_sorted_run(items, shard_dir, index)
+
+
+def merge_shards(shard_dir: str, output_path: str, fan_in: int = 64,
+                 on_thread: Optional[Callable[[str, List[dict]], None]] = None) -> int:
+    """
+    Merge the assembled shards into one thread map, in the format and ThreadID
+    order of thread_jsonl_external. Returns the number of threads written.
+    """
+    runs = [os.path.join(shard_dir, f"run-{i:05d}.txt") for i in range(shard_count(shard_dir))]
+    runs = merge_in_passes(runs, shard_dir, fan_in)
+    with ThreadMapWriter(output_path) as out:
+        for thread_id, emails in iter_run_threads(runs):
+            if on_thread is not None:
+                with metrics.timer("write"):
+                    on_thread(thread_id, emails)
+            out.write(thread_id, emails)
+    return out.count
+
+
+def run_shards(fn, shard_dir: str, indexes, workers: int = 1) -> None:
+    """
+    Run a per-shard phase (map_shard or assemble_shard) on the given shards,
+    over `workers` processes.
+    """
+    if workers <= 1:
+        for index in indexes:
+            fn(shard_dir, index)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(partial(fn, shard_dir), indexes))
+
+
+def thread_jsonl_sharded(jsonl_path: str, output_path: str, shards: int = 8, workers: int = 1,
+                         shard_dir: str = None,
+                         on_thread: Optional[Callable[[str, List[dict]], None]] = None) -> int:
+    """
+    Thread a JSONL corpus by running every phase on this machine, with the map
+    and assemble phases spread over `workers` processes. The output is the same
+    as thread_jsonl_external. Shard files go to `shard_dir`, or to a temporary
+    directory that is removed afterwards. Returns the number of threads written.
+    """
+    if shard_dir is None:
+        with tempfile.TemporaryDirectory(prefix="thread-shards-") as tmp_dir:
+            return thread_jsonl_sharded(jsonl_path, output_path, shards, workers, tmp_dir, on_thread)
+
+    partition_jsonl(jsonl_path, shard_dir, shards)
+    run_shards(map_shard, shard_dir, range(shards), workers)
+    reduce_shards(shard_dir)
+    run_shards(assemble_shard, shard_dir, range(shards), workers)
+    return merge_shards(shard_dir, output_path, on_thread=on_thread)
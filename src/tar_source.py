@@ -0,0 +1,78 @@
+# src/tar_source.py
+
+import os
+import tarfile
+from typing import Iterator, List, Optional, Tuple
+
+from src import metrics
+
+
+def is_tar_source(path: str) -> bool:
+    """
+    True if `path` is a tar archive (plain or compressed) rather than a folder.
+    """
+    return os.path.isfile(path) and tarfile.is_tarfile(path)
+
+
+def _normalize_name(name: str) -> str:
+    while name.startswith("./"):
+        name = name[2:]
+    return name.strip("/")
+
+
+def tar_mailbox_of(name: str, root: str) -> str:
+    """
+    Mailbox of an archive member, i.e. the first folder under `root` (e.g. "allen-p"
+    for "maildir/allen-p/inbox/1." with root "maildir").
+    """
+    name = _normalize_name(name)
+    if root:
+        if not name.startswith(root + "/"):
+            return ""
+        name = name[len(root) + 1:]
+    parts = name.split("/")
+    return parts[0] if len(parts) > 1 else ""
+
+
+def iter_tar_chunks(tar_path: str, chunk_size: int = 500,
+                    root: Optional[str] = None) -> Iterator[Tuple[str, List[Tuple[str, bytes]]]]:
+    """
+    Stream a .tar/.tar.gz archive and yield (root, chunk) pairs, where each chunk holds
+    up to `chunk_size` (member name, raw bytes) pairs from one directory.
+
+    Members are read sequentially in archive order, so nothing is extracted to disk
+    and only the current chunk is held in memory. `root` is the folder the mailboxes
+    sit in (e.g. "maildir", or "" for mailboxes at the top of the archive). When it
+    is not given it is the top-level folder of the first file, and a later file
+    outside that folder raises ValueError rather than landing in the wrong mailbox.
+    """
+    detect = root is None
+    if not detect:
+        root = _normalize_name(root)
+    chunk = []
+    chunk_dir = None
+    with tarfile.open(tar_path, mode="r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+
+            name = _normalize_name(member.name)
+            if detect:
+                top, sep, _ = name.partition("/")
+                if root is None:
+                    root = top if sep else ""
+                elif root and (not sep or top != root):
+                    raise ValueError(
+                        f"{tar_path}: {name} is outside {root!r}, the top-level folder of the first file; "
+                        f"give the mailbox root explicitly (\"\" for mailboxes at the top of the archive)")
+
+            directory = os.path.dirname(name)
+            if chunk and (directory != chunk_dir or len(chunk) >= chunk_size):
+                yield root, chunk
+                chunk = []
+            chunk_dir = directory
+            with metrics.timer("read"):
+                chunk.append((name, tar.extractfile(member).read()))
+
+    if chunk:
+        yield root, chunk
@@ -1,98 +1,218 @@
-import uuid
 import hashlib
 from collections import defaultdict
-from datetime import datetime,timezone
-from typing import List, Dict
+from typing import Collection, List, Dict, NamedTuple, Optional, Tuple
 from tqdm import tqdm
 
-from email.utils import parsedate_to_datetime
 from src.cleaner import normalize_subject  # Assumes normalize_subject is available
+from src.union_find import UnionFind
+from src.addresses import ADDRESS_TABLE, AddressTable
+from src.dates import MISSING_TIMESTAMP, parse_date_epoch, parse_dates
+from src import metrics
 
-def build_thread_map(emails: List[dict]) -> Dict[str, List[dict]]:
+REQUIRED_FIELDS = ("From", "To", "Subject", "Date")
+
+
+class MessageEntry(NamedTuple):
     """
-    Group emails into threads using In-Reply-To headers when possible.
-    Falls back to subject/participants heuristics otherwise.
-    Ensures that replies and their parent messages share the same ThreadID.
+    Compact per-message view used for threading. Holds only what is needed to
+    resolve threads and order them, plus where the full record lives
+    (list index or file offset), so bodies never have to stay in memory.
     """
-    id_lookup = {e["MessageID"]: e for e in emails if e.get("MessageID")}
-    thread_ids = {}
-    heuristic_threads = {}
-    thread_map = defaultdict(list)
+    message_id: str
+    in_reply_to: str
+    subject: str
+    participants: tuple
+    timestamp: int
+    offset: int
+    complete: bool
 
-    def resolve_root_and_assign_chain(email):
-        """
-        Traverse reply chain and assign a common thread ID to all.
-        """
-        chain = []
-        current = email
-
-        while current:
-            chain.append(current)
-            in_reply_to = current.get("InReplyTo")
-            if in_reply_to and in_reply_to in id_lookup:
-                current = id_lookup[in_reply_to]
-            else:
-                current = None
-
-        root = chain[-1]
-        thread_id = f"thread-{root.get('MessageID') or uuid.uuid4()}"
-
-        for e in chain:
-            thread_ids[e["MessageID"]] = thread_id
-
-    # First pass: assign thread IDs via In-Reply-To
-    for email in tqdm(emails, desc="Building thread map"):
+
+def make_entry(email: dict, offset: int, timestamp: Optional[int] = None,
+               addresses: AddressTable = None) -> MessageEntry:
+    """
+    Build the compact index entry for one email record.
+    Uses the record's Timestamp (set during cleaning) unless one is passed in,
+    and only parses the Date header when neither is available.
+    Participants are the sorted IDs of every From/To address in `addresses`
+    (the shared ADDRESS_TABLE by default); pass the same table to assign_thread_ids.
+    """
+    if timestamp is None:
+        timestamp = email.get("Timestamp")
+        if timestamp is None and "Timestamp" not in email:
+            timestamp = parse_date_epoch(email.get("Date"))
+    if addresses is None:
+        addresses = ADDRESS_TABLE
+    return MessageEntry(
+        message_id=email.get("MessageID"),
+        in_reply_to=email.get("InReplyTo"),
+        subject=normalize_subject(email.get("Subject", "")),
+        participants=addresses.participants(email.get("From", ""), email.get("To", "")),
+        timestamp=MISSING_TIMESTAMP if timestamp is None else timestamp,
+        offset=offset,
         # Skip emails missing any essential header
-        if not all(email.get(field) for field in ["From", "To", "Subject", "Date"]):
+        complete=all(email.get(field) for field in REQUIRED_FIELDS),
+    )
+
+
+def thread_id_for_root(message_id: str) -> str:
+    """
+    ThreadID of a reply chain, derived from the MessageID of its root message.
+    """
+    return _hash_thread_key(f"msg\x1f{message_id}")
+
+
+def thread_id_for_key(subject: str, participants: List[str]) -> str:
+    """
+    ThreadID of a heuristic thread, derived from its normalized subject and the
+    sorted canonical addresses of its participants (not their table IDs, which
+    depend on input order).
+    """
+    return _hash_thread_key("\x1f".join(("subj", subject, *participants)))
+
+
+def _hash_thread_key(key: str) -> str:
+    # Content-derived IDs are identical across runs and shards, so outputs can be diffed and merged
+    return f"thread-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]}"
+
+
+def chain_root(members: Collection[str], parented: Collection[str]) -> str:
+    """
+    Root MessageID of a reply chain, given its members and the MessageIDs whose
+    parent is known. The root is the message whose parent is unknown; a chain
+    made only of a cycle has no such message, so it falls back to its smallest
+    MessageID.
+    """
+    candidates = [m for m in members if m not in parented]
+    return min(candidates or members)
+
+
+class ReplyLinks(NamedTuple):
+    """
+    In-Reply-To links among a list of entries (see link_replies).
+    """
+    reply_sets: UnionFind  # reply chains, as sets of MessageIDs
+    parent_of: Dict[str, str]  # MessageID -> MessageID it replies to, when that one is known
+    dangling: List[Tuple[str, str]]  # (MessageID, In-Reply-To) of replies to an unknown MessageID
+    roots: Dict[str, str]  # union-find representative -> root MessageID of its chain (see chain_root)
+
+
+def link_replies(entries: List[MessageEntry]) -> ReplyLinks:
+    """
+    Link every entry to the entry its In-Reply-To names, with a union-find
+    keyed by MessageID, so each message is visited a constant number of times
+    and cyclic or self-referencing headers cannot loop. A reply without its own
+    MessageID still puts its parent in a chain.
+    """
+    known_ids = {e.message_id for e in entries if e.message_id}
+    reply_sets = UnionFind()
+    parent_of = {}
+    dangling = []
+
+    for entry in entries:
+        msg_id, in_reply_to = entry.message_id, entry.in_reply_to
+        if not in_reply_to or in_reply_to == msg_id:
+            continue
+        if in_reply_to not in known_ids:
+            dangling.append((msg_id, in_reply_to))
+        elif msg_id:
+            parent_of[msg_id] = in_reply_to
+            reply_sets.union(msg_id, in_reply_to)
+        else:
+            reply_sets.add(in_reply_to)
+
+    roots = {representative: chain_root(members, parent_of)
+             for representative, members in reply_sets.groups().items()}
+    return ReplyLinks(reply_sets, parent_of, dangling, roots)
+
+
+@metrics.timed("thread_resolve")
+def assign_thread_ids(entries: List[MessageEntry], addresses: AddressTable = None,
+                      links: ReplyLinks = None) -> List[Optional[str]]:
+    """
+    Resolve a ThreadID for every entry using In-Reply-To headers when possible,
+    falling back to subject/participants heuristics otherwise.
+    Returns one ThreadID per entry (None for incomplete emails).
+
+    Reply chains come from link_replies, or from `links` when the caller has
+    already computed them. ThreadIDs are hashes of the chain's root MessageID
+    or of the heuristic key, so the same input always produces the same IDs.
+    """
+    if addresses is None:
+        addresses = ADDRESS_TABLE
+    if links is None:
+        links = link_replies(entries)
+    reply_sets, roots = links.reply_sets, links.roots
+
+    heuristic_threads = {}
+    thread_ids = []
+    for entry in tqdm(entries, desc="Building thread map"):
+        if not entry.complete:
+            thread_ids.append(None)
             continue
 
-        msg_id = email.get("MessageID")
-        if msg_id in thread_ids:
-            continue  # already handled in a chain
-        in_reply_to = email.get("InReplyTo")
+        if entry.message_id in reply_sets:
+            node = entry.message_id
+        elif entry.in_reply_to in reply_sets:
+            node = entry.in_reply_to  # reply without its own MessageID
+        else:
+            node = None
 
-        if in_reply_to and in_reply_to in id_lookup:
-            resolve_root_and_assign_chain(email)
+        if node is not None:
+            thread_ids.append(thread_id_for_root(roots[reply_sets.find(node)]))
         else:
             # Fallback: heuristic
-            norm_subj = normalize_subject(email.get("Subject", ""))
-            participants = tuple(sorted([
-                email.get("From", "").lower(),
-                email.get("To", "").lower()
-            ]))
-            key = (norm_subj, participants)
+            key = (entry.subject, entry.participants)
             if key not in heuristic_threads:
-                heuristic_threads[key] = f"thread-{uuid.uuid4()}"
-            thread_ids[msg_id] = heuristic_threads[key]
+                heuristic_threads[key] = thread_id_for_key(
+                    entry.subject, addresses.addresses(entry.participants))
+            thread_ids.append(heuristic_threads[key])
 
-    # Second pass: assign and group
-    for email in tqdm(emails, desc="Building thread map Second Round"):
-        # Skip emails missing any essential header
-        if not all(email.get(field) for field in ["From", "To", "Subject", "Date"]):
-            continue
-        thread_id = thread_ids.get(email.get("MessageID"))
-        email["ThreadID"] = thread_id
-        thread_map[thread_id].append(email)
-
-    # Sort and assign ThreadPosition
-    for thread in thread_map.values():
-        thread.sort(key=lambda e: _safe_date_parse(e.get("Date")))
-        for i, email in enumerate(thread):
+    return thread_ids
+
+
+@metrics.timed("sort")
+def group_threads(entries: List[MessageEntry], thread_ids: List[Optional[str]]) -> Dict[str, List[MessageEntry]]:
+    """
+    Group entries by ThreadID (in order of first appearance) and sort each thread by date.
+    """
+    grouped = defaultdict(list)
+    for entry, thread_id in zip(entries, thread_ids):
+        if entry.complete:
+            grouped[thread_id].append(entry)
+
+    for thread in grouped.values():
+        thread.sort(key=lambda e: e.timestamp)
+    return grouped
+
+
+def build_thread_map(emails: List[dict]) -> Dict[str, List[dict]]:
+    """
+    Group emails into threads using In-Reply-To headers when possible.
+    Falls back to subject/participants heuristics otherwise.
+    Ensures that replies and their parent messages share the same ThreadID.
+    """
+    # Emails cleaned before Timestamp existed get their dates parsed in one deduplicated batch
+    parsed = parse_dates(e.get("Date") for e in emails if "Timestamp" not in e)
+    parsed.reverse()
+    addresses = AddressTable()
+    entries = []
+    for i, email in enumerate(emails):
+        timestamp = email["Timestamp"] if "Timestamp" in email else parsed.pop()
+        entries.append(make_entry(email, i, MISSING_TIMESTAMP if timestamp is None else timestamp, addresses))
+    thread_ids = assign_thread_ids(entries, addresses)
+    thread_map = defaultdict(list)
+
+    # Assign, group and set ThreadPosition
+    for thread_id, thread in group_threads(entries, thread_ids).items():
+        for i, entry in enumerate(thread):
+            email = emails[entry.offset]
+            email["ThreadID"] = thread_id
             email["ThreadPosition"] = i
-    
+            thread_map[thread_id].append(email)
+
     return (deduplicate_threads(thread_map))
 
 
-def _safe_date_parse(date_str: str) -> datetime:
-    try:
-        dt = parsedate_to_datetime(date_str)
-        if dt.tzinfo is not None:
-            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
-        return dt
-    except Exception as e:
-        print(f"Error: {e}")
-        return datetime.min
- 
 def hash_email(email: dict) -> str:
     """
     creates the hash for the email
@@ -100,6 +220,7 @@ def hash_email(email: dict) -> str:
     key_str = f"{email.get('From','')}|{email.get('To','')}|{email.get('Subject','')}|{email.get('Date','')}|{email.get('Body','')}"
     return hashlib.sha256(key_str.encode('utf-8')).hexdigest()
 
+@metrics.timed("dedup")
 def deduplicate_threads(thread_map: dict) -> dict:
     """
     remove the repeated emails
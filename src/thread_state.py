@@ -0,0 +1,292 @@
+# src/thread_state.py
+
+import os
+import json
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set
+
+from src import metrics
+from src.union_find import UnionFind
+from src.addresses import AddressTable
+from src.writers import ThreadMapWriter
+from src.thread_stream import read_record
+from src.thread_builder import (
+    MessageEntry,
+    make_entry,
+    chain_root,
+    thread_id_for_root,
+    thread_id_for_key,
+    deduplicate_threads,
+)
+
+STATE_VERSION = 2
+
+# Fields of a message row: [message_id, in_reply_to, timestamp, offset, complete, thread_id]
+_MSG_ID, _IN_REPLY_TO, _TIMESTAMP, _OFFSET, _COMPLETE, _THREAD = range(6)
+
+
+class ThreadState:
+    """
+    Threading state that survives between runs, so new batches of mail can be
+    threaded without re-reading the corpus.
+
+    Holds every message seen so far (MessageID, In-Reply-To, timestamp, offset
+    of its record and current ThreadID), the ordered members of every thread
+    and the subject/participants key of every heuristic thread. After any
+    sequence of batches the threads are the same as assign_thread_ids and
+    group_threads would give for all the messages at once: replies join their
+    parent's thread, a parent that arrives after its replies merges them into
+    one chain, and a heuristic thread is absorbed when a reply links to it.
+
+    Adding a batch only touches the reply chains it links into and the threads
+    its messages land in, so it costs time proportional to the batch and to
+    those threads, not to the corpus.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.threads = {}  # ThreadID -> message rows indexes, in thread order
+        self.heuristic_keys = {}  # ThreadID -> (subject, participant addresses)
+        self.jsonl_size = 0  # bytes of the JSONL corpus already indexed (see index_jsonl)
+        self.jsonl_sha256 = hashlib.sha256().hexdigest()  # of those bytes
+        self._rebuild_links()
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def _rebuild_links(self) -> None:
+        # Lookup tables derived from self.messages; rebuilt on load instead of being saved
+        self._known = {}  # MessageID -> rows with that MessageID
+        self._orphans = {}  # MessageID -> rows without a MessageID replying to it
+        self._pending = {}  # unknown MessageID -> rows waiting for it to arrive
+        self._reply_sets = UnionFind()
+        self._members = {}  # union-find representative -> MessageIDs in its set
+        self._parent_of = {}
+        self._register(0)
+        for row in range(len(self.messages)):
+            self._resolve_links(row)
+
+    def _register(self, start: int) -> None:
+        for row in range(start, len(self.messages)):
+            msg_id, in_reply_to = self.messages[row][_MSG_ID], self.messages[row][_IN_REPLY_TO]
+            if msg_id:
+                self._known.setdefault(msg_id, []).append(row)
+            elif in_reply_to:
+                self._orphans.setdefault(in_reply_to, []).append(row)
+
+    def _resolve_links(self, row: int) -> Set[str]:
+        """
+        Link a registered message to its parent and to any earlier replies that
+        were waiting for it. Returns a MessageID of every reply set it changed.
+        """
+        touched = set()
+        msg_id, in_reply_to = self.messages[row][_MSG_ID], self.messages[row][_IN_REPLY_TO]
+        for waiting in self._pending.pop(msg_id, ()) if msg_id else ():
+            touched.add(self._link(waiting))
+        if in_reply_to and in_reply_to != msg_id:
+            if in_reply_to in self._known:
+                touched.add(self._link(row))
+            else:
+                self._pending.setdefault(in_reply_to, []).append(row)
+        return touched
+
+    def _link(self, row: int) -> str:
+        msg_id, in_reply_to = self.messages[row][_MSG_ID], self.messages[row][_IN_REPLY_TO]
+        for node in (msg_id, in_reply_to) if msg_id else (in_reply_to,):
+            if node not in self._reply_sets:
+                self._reply_sets.add(node)
+                self._members[node] = [node]
+        if msg_id:
+            self._parent_of[msg_id] = in_reply_to
+            before = {self._reply_sets.find(msg_id), self._reply_sets.find(in_reply_to)}
+            root = self._reply_sets.union(msg_id, in_reply_to)
+            for other in before - {root}:
+                self._members[root].extend(self._members.pop(other))
+        return in_reply_to
+
+    def _chain_thread_id(self, representative: str) -> str:
+        return thread_id_for_root(chain_root(self._members[representative], self._parent_of))
+
+    def _move(self, row: int, thread_id: str, changed: Set[str]) -> None:
+        message = self.messages[row]
+        if not message[_COMPLETE] or message[_THREAD] == thread_id:
+            return
+        if message[_THREAD] is not None:
+            self.threads[message[_THREAD]].remove(row)
+            changed.add(message[_THREAD])
+        self.threads.setdefault(thread_id, []).append(row)
+        message[_THREAD] = thread_id
+        changed.add(thread_id)
+
+    def add_entries(self, entries: Iterable[MessageEntry], addresses: AddressTable) -> Set[str]:
+        """
+        Merge a batch of index entries (see make_entry; `addresses` is the table
+        their participants were interned in) and return the ThreadIDs whose
+        members or order changed. A returned ThreadID that is no longer in
+        self.threads was merged into another thread.
+        """
+        entries = list(entries)
+        start = len(self.messages)
+        changed = set()
+        with metrics.timer("thread_resolve"):
+            for entry in entries:
+                self.messages.append([entry.message_id, entry.in_reply_to, entry.timestamp,
+                                      entry.offset, entry.complete, None])
+            self._register(start)
+
+            touched = set()
+            for row in range(start, len(self.messages)):
+                touched |= self._resolve_links(row)
+                msg_id, in_reply_to = self.messages[row][_MSG_ID], self.messages[row][_IN_REPLY_TO]
+                if msg_id in self._reply_sets:
+                    touched.add(msg_id)
+                elif in_reply_to in self._reply_sets:
+                    touched.add(in_reply_to)
+
+            for representative in {self._reply_sets.find(node) for node in touched}:
+                thread_id = self._chain_thread_id(representative)
+                for node in self._members[representative]:
+                    for row in self._known.get(node, []) + self._orphans.get(node, []):
+                        self._move(row, thread_id, changed)
+
+            heuristic_threads = {}
+            for row, entry in enumerate(entries, start):
+                if self.messages[row][_THREAD] is not None or not entry.complete:
+                    continue
+                key = (entry.subject, entry.participants)
+                if key not in heuristic_threads:
+                    participants = addresses.addresses(entry.participants)
+                    heuristic_threads[key] = thread_id_for_key(entry.subject, participants)
+                    self.heuristic_keys.setdefault(heuristic_threads[key], (entry.subject, participants))
+                self._move(row, heuristic_threads[key], changed)
+
+        with metrics.timer("sort"):
+            for thread_id in changed:
+                thread = self.threads[thread_id]
+                if thread:
+                    thread.sort(key=lambda row: (self.messages[row][_TIMESTAMP], row))
+                else:
+                    del self.threads[thread_id]
+                    self.heuristic_keys.pop(thread_id, None)
+        return changed
+
+    def add_emails(self, emails: List[dict]) -> Set[str]:
+        """
+        Merge a batch of email records. Their offsets are their positions in
+        the sequence of every email added so far.
+        """
+        addresses = AddressTable()
+        start = len(self.messages)
+        return self.add_entries([make_entry(email, start + i, addresses=addresses)
+                                 for i, email in enumerate(emails)], addresses)
+
+    def index_jsonl(self, jsonl_path: str) -> Set[str]:
+        """
+        Merge the records appended to a JSONL corpus since the last call, with
+        their byte offsets. The stored offsets are only valid while the part
+        already indexed is unchanged, so it is checked against its SHA-256 and a
+        corpus that was rewritten rather than appended to raises ValueError.
+        """
+        size = os.path.getsize(jsonl_path)
+        if size < self.jsonl_size:
+            raise ValueError(f"{jsonl_path} is shorter than the {self.jsonl_size} bytes already indexed")
+        addresses = AddressTable()
+        entries = []
+        digest = hashlib.sha256()
+        with metrics.timer("read"), open(jsonl_path, "rb") as f:
+            remaining = self.jsonl_size
+            while remaining:
+                block = f.read(min(remaining, 1 << 20))
+                digest.update(block)
+                remaining -= len(block)
+            if digest.hexdigest() != self.jsonl_sha256:
+                raise ValueError(f"The first {self.jsonl_size} bytes of {jsonl_path} changed since they were "
+                                 f"indexed; only appending is supported, rebuild the state after a rewrite")
+            offset = self.jsonl_size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a batch still being appended
+                if line.strip():
+                    entries.append(make_entry(json.loads(line), offset, addresses=addresses))
+                digest.update(line)
+                offset += len(line)
+        changed = self.add_entries(entries, addresses)
+        self.jsonl_size = offset
+        self.jsonl_sha256 = digest.hexdigest()
+        return changed
+
+    def thread_id(self, message_id: str) -> Optional[str]:
+        """
+        ThreadID of the first complete message with this MessageID, or None.
+        """
+        for row in self._known.get(message_id, ()):
+            if self.messages[row][_THREAD] is not None:
+                return self.messages[row][_THREAD]
+        return None
+
+    def thread_offsets(self, thread_id: str) -> List[int]:
+        """
+        Offsets of a thread's records, in thread order.
+        """
+        return [self.messages[row][_OFFSET] for row in self.threads.get(thread_id, ())]
+
+    def thread_map(self) -> Dict[str, List[int]]:
+        return {thread_id: self.thread_offsets(thread_id) for thread_id in self.threads}
+
+    def save(self, path: str) -> None:
+        """
+        Write the state to `path`, replacing the previous file atomically.
+        """
+        state = {
+            "version": STATE_VERSION,
+            "jsonl_size": self.jsonl_size,
+            "jsonl_sha256": self.jsonl_sha256,
+            "messages": self.messages,
+            "threads": self.threads,
+            "heuristic_keys": self.heuristic_keys,
+        }
+        tmp_path = path + ".tmp"
+        with metrics.timer("write"), open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ThreadState":
+        """
+        Read a state saved by save(). A missing file gives an empty state.
+        """
+        state = cls()
+        if not os.path.exists(path):
+            return state
+        with metrics.timer("read"), open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != STATE_VERSION:
+            raise ValueError(f"{path} has thread state version {data.get('version')}, expected {STATE_VERSION}")
+        state.jsonl_size = data["jsonl_size"]
+        state.jsonl_sha256 = data["jsonl_sha256"]
+        state.messages = data["messages"]
+        state.threads = data["threads"]
+        state.heuristic_keys = {thread_id: (subject, participants)
+                                for thread_id, (subject, participants) in data["heuristic_keys"].items()}
+        state._rebuild_links()
+        return state
+
+
+def write_threads(state: ThreadState, jsonl_path: str, output_path: str, thread_ids: Iterable[str]) -> int:
+    """
+    Write the given threads of a state built with index_jsonl, in the same
+    shape as thread_jsonl, reading each record back from the corpus. A thread
+    that was merged away is written as an empty list so consumers can drop it.
+    Returns the number of threads written.
+    """
+    with open(jsonl_path, "rb") as src, ThreadMapWriter(output_path) as out:
+        for thread_id in sorted(thread_ids):
+            emails = []
+            with metrics.timer("read"):
+                for position, offset in enumerate(state.thread_offsets(thread_id)):
+                    email = read_record(src, offset)
+                    email["ThreadID"] = thread_id
+                    email["ThreadPosition"] = position
+                    emails.append(email)
+            out.write(thread_id, deduplicate_threads({thread_id: emails})[thread_id])
+        return out.count
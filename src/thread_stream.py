@@ -0,0 +1,77 @@
+# src/thread_stream.py
+
+import json
+from typing import Callable, List, Optional
+from tqdm import tqdm
+
+from src import metrics
+from src.writers import ThreadMapWriter
+from src.addresses import AddressTable
+from src.thread_builder import (
+    MessageEntry,
+    make_entry,
+    assign_thread_ids,
+    group_threads,
+    deduplicate_threads,
+)
+
+
+def build_message_index(jsonl_path: str, addresses: AddressTable = None) -> List[MessageEntry]:
+    """
+    Scan a JSONL file of cleaned emails and keep only a compact entry per message.
+    Each entry remembers the byte offset of its line so the full record can be
+    read back later; bodies are decoded once and dropped. Participants are
+    interned in `addresses` (see make_entry).
+    """
+    entries = []
+    offset = 0
+    with metrics.timer("read"), open(jsonl_path, "rb") as f:
+        for line in tqdm(f, desc="Indexing emails", unit="email"):
+            if line.strip():
+                entries.append(make_entry(json.loads(line), offset, addresses=addresses))
+            offset += len(line)
+    return entries
+
+
+def read_record(f, offset: int) -> dict:
+    """
+    Read the record stored at a byte offset of an open JSONL file.
+    """
+    f.seek(offset)
+    return json.loads(f.readline())
+
+
+def thread_jsonl(jsonl_path: str, output_path: str,
+                 on_thread: Optional[Callable[[str, List[dict]], None]] = None) -> int:
+    """
+    Thread a JSONL corpus without loading it into memory.
+
+    Threads are resolved on the compact index, then written one at a time by
+    seeking back to each message. The output has the same shape as
+    build_thread_map: a JSON object mapping ThreadID to its list of emails.
+    `on_thread(thread_id, emails)` is called for every thread written, e.g. to
+    feed a second sink. Returns the number of threads written.
+    """
+    addresses = AddressTable()
+    entries = build_message_index(jsonl_path, addresses)
+    thread_ids = assign_thread_ids(entries, addresses)
+    threads = group_threads(entries, thread_ids)
+    del thread_ids
+
+    with open(jsonl_path, "rb") as src, ThreadMapWriter(output_path) as out:
+        for thread_id, thread in tqdm(threads.items(), desc="Writing threads"):
+            emails = []
+            with metrics.timer("read"):
+                for position, entry in enumerate(thread):
+                    email = read_record(src, entry.offset)
+                    email["ThreadID"] = thread_id
+                    email["ThreadPosition"] = position
+                    emails.append(email)
+            emails = deduplicate_threads({thread_id: emails})[thread_id]
+            if on_thread is not None:
+                with metrics.timer("write"):
+                    on_thread(thread_id, emails)
+
+            out.write(thread_id, emails)
+
+    return len(threads)
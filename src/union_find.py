@@ -0,0 +1,59 @@
+# src/union_find.py
+
+from typing import Dict, Hashable, List
+
+
+class UnionFind:
+    """
+    Disjoint-set forest with path compression and union by size.
+    Elements are added on first use, so any hashable key (e.g. a MessageID) works.
+    """
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.parent
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def add(self, item: Hashable) -> None:
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item: Hashable) -> Hashable:
+        """
+        Return the representative of the item's set, compressing the path on the way.
+        """
+        self.add(item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: Hashable, b: Hashable) -> Hashable:
+        """
+        Merge the sets containing a and b and return the new representative.
+        """
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size.pop(root_b)
+        return root_a
+
+    def groups(self) -> Dict[Hashable, List[Hashable]]:
+        """
+        Return every set as {representative: [members]}.
+        """
+        result = {}
+        for item in self.parent:
+            result.setdefault(self.find(item), []).append(item)
+        return result
@@ -0,0 +1,198 @@
+# src/writers.py
+
+import os
+import csv
+import gzip
+import json
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+
+from src import metrics
+
+
+def write_jsonl(records: Iterable[dict], path: str) -> int:
+    """
+    Write records to a JSONL file (one JSON object per line) as they arrive.
+    Returns the number of records written.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            with metrics.timer("write"):
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write("\n")
+            count += 1
+    return count
+
+
+def iter_jsonl(path: str) -> Iterator[dict]:
+    """
+    Yield records from a JSONL file one at a time. Blank lines are skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ThreadMapWriter:
+    """
+    Write a thread map one thread at a time. The file has the same shape as
+    json.dump(build_thread_map(...)): one JSON object mapping ThreadID to its emails.
+    """
+
+    def __init__(self, path: str):
+        self.f = open(path, "w", encoding="utf-8")
+        self.f.write("{")
+        self.count = 0
+
+    def write(self, thread_id: str, emails: list) -> None:
+        with metrics.timer("write"):
+            if self.count:
+                self.f.write(",")
+            self.f.write("\n")
+            self.f.write(json.dumps(thread_id))
+            self.f.write(": ")
+            self.f.write(json.dumps(emails, ensure_ascii=False))
+        self.count += 1
+
+    def close(self) -> None:
+        self.f.write("\n}\n")
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Column order of the columnar exports; Year is derived from Timestamp
+COLUMNS = [
+    "MessageID", "From", "To", "InReplyTo", "Subject", "Date", "Timestamp", "Body",
+    "ThreadKey", "Filename", "Mailbox", "Year", "ThreadID", "ThreadPosition",
+]
+_INT_COLUMNS = ("Timestamp", "ThreadPosition")
+UNKNOWN_PARTITION = "unknown"
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, CSV is used instead
+    pa = None
+    pq = None
+
+
+def _export_row(record: dict) -> dict:
+    row = {column: record.get(column) for column in COLUMNS}
+    timestamp = row["Timestamp"]
+    if row["Year"] is None:
+        row["Year"] = str(datetime.fromtimestamp(timestamp, timezone.utc).year) if timestamp is not None else None
+    for column in COLUMNS:
+        value = row[column]
+        if value is not None and column not in _INT_COLUMNS:
+            row[column] = str(value)
+    return row
+
+
+class ColumnarWriter:
+    """
+    Write records into a partitioned columnar dataset (Hive-style
+    `Mailbox=allen-p/Year=2001/` directories) as Parquet when pyarrow is installed,
+    or as CSV otherwise. Records are buffered and flushed every `batch_size` rows,
+    so memory stays bounded; each flush adds one file per partition it touches.
+
+    compression applies to Parquet ("snappy", "zstd", "gzip", ...) and, for CSV,
+    "gzip" writes .csv.gz files.
+    """
+
+    def __init__(self, out_dir: str, format: str = "parquet", partition_by=("Mailbox", "Year"),
+                 compression: str = "snappy", batch_size: int = 50000):
+        if format == "parquet" and pa is None:
+            print("pyarrow is not installed, writing CSV instead of Parquet")
+            format = "csv"
+        if format not in ("parquet", "csv"):
+            raise ValueError(f"Unknown export format: {format!r}")
+        self.out_dir = out_dir
+        self.format = format
+        self.partition_by = list(partition_by)
+        self.compression = compression
+        self.batch_size = batch_size
+        self.rows = []
+        self.batches = 0
+        os.makedirs(out_dir, exist_ok=True)
+
+    def write(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.rows.append(_export_row(record))
+            if len(self.rows) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        partitions = {}
+        for row in self.rows:
+            key = tuple(row[column] or UNKNOWN_PARTITION for column in self.partition_by)
+            partitions.setdefault(key, []).append(row)
+
+        columns = [column for column in COLUMNS if column not in self.partition_by]
+        for key, rows in partitions.items():
+            directory = os.path.join(self.out_dir, *(
+                f"{column}={value}" for column, value in zip(self.partition_by, key)))
+            os.makedirs(directory, exist_ok=True)
+            if self.format == "parquet":
+                self._write_parquet(directory, columns, rows)
+            else:
+                self._write_csv(directory, columns, rows)
+
+        self.rows = []
+        self.batches += 1
+
+    def _write_parquet(self, directory, columns, rows):
+        schema = pa.schema([(column, pa.int64() if column in _INT_COLUMNS else pa.string())
+                            for column in columns])
+        table = pa.Table.from_pylist(rows, schema=schema)
+        pq.write_table(table, os.path.join(directory, f"part-{self.batches:05d}.parquet"),
+                       compression=self.compression)
+
+    def _write_csv(self, directory, columns, rows):
+        name = f"part-{self.batches:05d}.csv"
+        if self.compression == "gzip":
+            f = gzip.open(os.path.join(directory, name + ".gz"), "wt", encoding="utf-8", newline="")
+        else:
+            f = open(os.path.join(directory, name), "w", encoding="utf-8", newline="")
+        with f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_columnar(records: Iterable[dict], out_dir: str, **kwargs) -> str:
+    """
+    Export records to a partitioned Parquet (or CSV fallback) dataset.
+    Keyword arguments go to ColumnarWriter. Returns the format actually written.
+    """
+    with ColumnarWriter(out_dir, **kwargs) as writer:
+        writer.write(records)
+    return writer.format
+
+
+def flatten_threads(thread_map: dict) -> Iterator[dict]:
+    """
+    Yield every email of a thread map, tagged with its ThreadID, in thread order.
+    """
+    for thread_id, emails in thread_map.items():
+        for email in emails:
+            if email.get("ThreadID") != thread_id:
+                email = dict(email, ThreadID=thread_id)
+            yield email
@@ -0,0 +1,35 @@
+import pytest
+
+
+def write_email(path, subject, body="Hello"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        "From: alice@enron.com\n"
+        "To: bob@enron.com\n"
+        f"Subject: {subject}\n"
+        "Date: Tue, 03 Apr 2001 10:15:00 -0700\n"
+        "\n"
+        f"{body}\n",
+        encoding="utf-8",
+    )
+
+
+@pytest.fixture
+def make_maildir(tmp_path):
+    """
+    Build a maildir at tmp_path/maildir with `count` emails in every folder of
+    every mailbox, with the Subject "<mailbox> <folder> <i>". Returns its path.
+    """
+    def make(boxes=("allen-p", "arora-h"), folders=("inbox", "sent"), count=3):
+        root = tmp_path / "maildir"
+        for box in boxes:
+            for folder in folders:
+                for i in range(count):
+                    write_email(root / box / folder / f"{i}.", f"{box} {folder} {i}")
+        return root
+    return make
+
+
+@pytest.fixture
+def maildir(make_maildir):
+    return make_maildir()
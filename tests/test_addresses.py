@@ -0,0 +1,39 @@
+from src.addresses import AddressTable, parse_addresses
+from src.thread_builder import build_thread_map, thread_id_for_key
+
+
+def test_parse_addresses_canonicalizes():
+    assert parse_addresses("John Arnold <John.Arnold@Enron.com>") == ("john.arnold@enron.com",)
+    assert parse_addresses("a@enron.com, B@enron.com,\n\ta@enron.com") == ("a@enron.com", "b@enron.com")
+    assert parse_addresses('"Allen, Phillip" <phillip.allen@enron.com>, kay.mann@enron.com') == (
+        "phillip.allen@enron.com", "kay.mann@enron.com")
+    assert parse_addresses("") == ()
+    assert parse_addresses("Undisclosed Recipients") == ("undisclosed recipients",)
+
+
+def test_participants_are_sorted_interned_ids():
+    table = AddressTable()
+    first = table.participants("b@enron.com", "a@enron.com, c@enron.com")
+    second = table.participants("C@enron.com", '"A" <a@enron.com>, b@enron.com')
+    assert first == second == tuple(sorted(first))
+    assert len(table) == 3
+    assert table.addresses(first) == ["a@enron.com", "b@enron.com", "c@enron.com"]
+
+
+def _email(mid, sender, to, date):
+    return {"MessageID": mid, "InReplyTo": "", "From": sender, "To": to,
+            "Subject": "Re: Curves", "Date": date, "Body": mid}
+
+
+def test_display_name_variants_share_a_heuristic_thread():
+    emails = [
+        _email("<1>", "john.arnold@enron.com", "kay.mann@enron.com, sara.shackleton@enron.com",
+               "Mon, 01 Jan 2001 10:00:00 -0800"),
+        _email("<2>", "Kay Mann <Kay.Mann@enron.com>", "sara.shackleton@enron.com,\n\tjohn.arnold@enron.com",
+               "Mon, 01 Jan 2001 11:00:00 -0800"),
+    ]
+    thread_map = build_thread_map(emails)
+    expected = thread_id_for_key("Curves", ["john.arnold@enron.com", "kay.mann@enron.com",
+                                            "sara.shackleton@enron.com"])
+    assert list(thread_map) == [expected]
+    assert len(thread_map[expected]) == 2
@@ -0,0 +1,79 @@
+import threading
+import time
+import pytest
+from src import metrics
+from src import async_reader
+from src.async_reader import iter_prefetched, iter_prefetched_chunks
+from process_enron_folder import iter_enron_folder
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for i in range(40):
+        path = tmp_path / f"{i}."
+        path.write_bytes(f"email {i}".encode())
+        paths.append(str(path))
+    return paths
+
+
+def test_results_keep_input_order_and_report_errors(files, tmp_path):
+    missing = str(tmp_path / "missing.")
+    results = list(iter_prefetched(files[:5] + [missing] + files[5:], concurrency=4, queue_size=3))
+
+    assert [path for path, _, _ in results] == files[:5] + [missing] + files[5:]
+    assert results[0][1:] == (b"email 0", None)
+    assert results[5][1] is None and results[5][2]
+
+    chunks = list(iter_prefetched_chunks([files[:3], files[3:10]], concurrency=4))
+    assert [[path for path, _, _ in chunk] for chunk in chunks] == [files[:3], files[3:10]]
+
+
+def test_reads_overlap_and_respect_backpressure(files, monkeypatch):
+    original = async_reader._read_file
+    started = []
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, peak
+
+    def slow_read(path):
+        with lock:
+            started.append(path)
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return original(path)
+
+    monkeypatch.setattr(async_reader, "_read_file", slow_read)
+
+    assert len(list(iter_prefetched(files, concurrency=10))) == 40
+    # Reads overlap, but never more than `concurrency` at once
+    assert 1 < in_flight[1] <= 10
+
+    started.clear()
+    reader = iter_prefetched(files, concurrency=2, queue_size=2)
+    next(reader)
+    time.sleep(0.3)
+    # One consumed, two queued, two in flight, one waiting to be queued
+    assert len(started) <= 6
+    reader.close()
+    assert not any(t.name == "prefetch-loop" for t in threading.enumerate())
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_prefetched_ingestion_matches_plain_reads(tmp_path, workers):
+    for box in ["allen-p", "arora-h"]:
+        for i in range(5):
+            path = tmp_path / box / "inbox" / f"{i}."
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(f"From: a@enron.com\nTo: b@enron.com\nSubject: {box} {i}\n\nHello\n")
+
+    metrics.reset()
+    expected = list(iter_enron_folder(str(tmp_path)))
+    result = list(iter_enron_folder(str(tmp_path), workers=workers, chunk_size=3, prefetch=4))
+    assert result == expected
+
+    data = metrics.snapshot()
+    assert data["stages"]["prefetch_wait"]["calls"] == len(expected) + 1
+    assert "prefetch_queue_depth_max" in data["gauges"]
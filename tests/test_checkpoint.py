@@ -0,0 +1,116 @@
+import os
+import pytest
+from process_enron_folder import process_enron_folder, process_enron_folder_checkpointed
+from src.checkpoint import Manifest, ShardWriter, iter_checkpoint_records
+from tests.conftest import write_email
+
+
+@pytest.fixture
+def maildir(make_maildir):
+    return make_maildir(boxes=["allen-p"], folders=["inbox"], count=5)
+
+
+def _subjects(checkpoint_dir):
+    return sorted(r["Subject"] for r in iter_checkpoint_records(str(checkpoint_dir)))
+
+
+def test_rerun_only_parses_new_and_changed_files(maildir, tmp_path):
+    ckpt = tmp_path / "ckpt"
+    assert process_enron_folder_checkpointed(str(maildir), str(ckpt), shard_size=2) == 5
+    assert _subjects(ckpt) == [f"allen-p inbox {i}" for i in range(5)]
+    assert process_enron_folder_checkpointed(str(maildir), str(ckpt)) == 0
+
+    write_email(maildir / "allen-p" / "inbox" / "1.", "allen-p inbox 1 edited")
+    write_email(maildir / "allen-p" / "sent" / "9.", "allen-p sent 9")
+    os.remove(maildir / "allen-p" / "inbox" / "4.")
+
+    assert process_enron_folder_checkpointed(str(maildir), str(ckpt)) == 2
+    assert _subjects(ckpt) == ["allen-p inbox 0", "allen-p inbox 1 edited", "allen-p inbox 2", "allen-p inbox 3",
+                               "allen-p sent 9"]
+
+
+def test_touched_file_with_same_content_is_skipped(maildir, tmp_path):
+    ckpt = tmp_path / "ckpt"
+    process_enron_folder_checkpointed(str(maildir), str(ckpt))
+
+    path = maildir / "allen-p" / "inbox" / "2."
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert process_enron_folder_checkpointed(str(maildir), str(ckpt)) == 0
+    assert Manifest(str(ckpt)).entries[str(path)]["mtime"] == stat.st_mtime_ns + 10 ** 9
+
+
+def test_resume_after_crash(maildir, tmp_path, monkeypatch):
+    ckpt = tmp_path / "ckpt"
+    original_add = ShardWriter.add
+    calls = []
+
+    def crashing_add(self, record, file_entry):
+        calls.append(1)
+        if len(calls) == 4:
+            raise KeyboardInterrupt
+        original_add(self, record, file_entry)
+
+    monkeypatch.setattr(ShardWriter, "add", crashing_add)
+    with pytest.raises(KeyboardInterrupt):
+        process_enron_folder_checkpointed(str(maildir), str(ckpt), chunk_size=1, shard_size=2)
+    monkeypatch.setattr(ShardWriter, "add", original_add)
+
+    # The 3 records written before the crash are kept; only the rest is parsed again
+    assert process_enron_folder_checkpointed(str(maildir), str(ckpt)) == 2
+    records = list(iter_checkpoint_records(str(ckpt)))
+    assert sorted(r["Subject"] for r in records) == [e["Subject"] for e in process_enron_folder(str(maildir))]
+
+
+def test_checkpointed_records_match_plain_run(maildir, tmp_path):
+    (maildir / "allen-p" / "inbox" / "crlf.").write_bytes(
+        b"From: carol@enron.com\r\nTo: dan@enron.com\r\nSubject: crlf\r\n"
+        b"Date: Tue, 03 Apr 2001 10:15:00 -0700\r\n\r\nLine one\r\nLine two\r\n"
+    )
+    ckpt = tmp_path / "ckpt"
+    process_enron_folder_checkpointed(str(maildir), str(ckpt))
+
+    assert list(iter_checkpoint_records(str(ckpt))) == process_enron_folder(str(maildir))
+
+
+def _shards(checkpoint_dir):
+    return sorted(name for name in os.listdir(checkpoint_dir) if name.startswith("part-"))
+
+
+def test_compact_reclaims_superseded_shards(maildir, tmp_path):
+    ckpt = tmp_path / "ckpt"
+    process_enron_folder_checkpointed(str(maildir), str(ckpt), shard_size=5)
+    assert _shards(ckpt) == ["part-00000.jsonl"]
+
+    # Only one of the five lines of the first shard is still current, so it is rewritten
+    for i in (0, 1, 2):
+        write_email(maildir / "allen-p" / "inbox" / f"{i}.", f"allen-p inbox {i} edited")
+    os.remove(maildir / "allen-p" / "inbox" / "4.")
+    assert process_enron_folder_checkpointed(str(maildir), str(ckpt), shard_size=5) == 3
+    assert _shards(ckpt) == ["part-00001.jsonl", "part-00002.jsonl"]
+    assert (ckpt / "part-00002.jsonl").read_text().count("\n") == 1
+    assert _subjects(ckpt) == ["allen-p inbox 0 edited", "allen-p inbox 1 edited", "allen-p inbox 2 edited",
+                               "allen-p inbox 3"]
+
+    # A shard with no current line left is deleted
+    write_email(maildir / "allen-p" / "inbox" / "3.", "allen-p inbox 3 edited")
+    assert process_enron_folder_checkpointed(str(maildir), str(ckpt)) == 1
+    assert _shards(ckpt) == ["part-00001.jsonl", "part-00003.jsonl"]
+    assert _subjects(ckpt) == [f"allen-p inbox {i} edited" for i in range(4)]
+
+    # Shards left behind by a crash are deleted too
+    (ckpt / "part-00099.jsonl").write_text('{"Subject": "orphan"}\n')
+    Manifest(str(ckpt)).compact()
+    assert "part-00099.jsonl" not in _shards(ckpt)
+
+
+def test_file_removed_after_the_walk_is_forgotten(maildir, tmp_path):
+    ckpt = tmp_path / "ckpt"
+    process_enron_folder_checkpointed(str(maildir), str(ckpt))
+    path = str(maildir / "allen-p" / "inbox" / "3.")
+    os.remove(path)
+
+    manifest = Manifest(str(ckpt))
+    assert not manifest.needs_update(path)
+    assert path not in Manifest(str(ckpt)).entries
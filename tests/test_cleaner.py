@@ -88,6 +88,10 @@ def test_normalize_subject_removes_reply_and_forward():
     ("FW: RE: FWD: FW: Hello", "Hello"),
     ("Re[2]: Hello", "Hello"),
     ("Fwd[10]: Re: FW: Hello", "Hello"),
+    ("AW: SV: Hello", "Hello"),
+    ("WG: Re : Hello", "Hello"),
+    ("Re:Re:Hello", "Hello"),
+    ("Reply needed", "Reply needed"),
     ("No prefix here", "No prefix here"),
     ("", ""),
     (None, ""),
@@ -161,4 +165,123 @@ def test_parse_enron_email_string_parses_correctly():
     assert result["Subject"] == "re:spreads"
     assert result["Body"] == "this is a test body"
     assert result["ThreadKey"].startswith("spreads::")
-    assert result["Filename"] == "email1.txt"
\ No newline at end of file
+    assert result["Filename"] == "email1.txt"
+
+@pytest.mark.parametrize("raw_body", [
+    "Hi team,\n\nHere's the update.\n\n-- \nAlice\n\n> On Mon, Bob wrote:\n> What's the update?",
+    "  indented\r\n\tline two  \r\n\r\n",
+    "prices: 3 < 4 and 5 > 2",
+    "AT&T and Barnes &amp; Noble",
+    "<p>Hello</p>\n<br>world",
+    "",
+])
+def test_clean_body_fast_path_matches_html_path(raw_body):
+    """
+    the plain-text tier gives the same result as running everything through BeautifulSoup
+    """
+    from bs4 import BeautifulSoup
+    from src.cleaner import _filter_lines
+
+    expected = _filter_lines(BeautifulSoup(raw_body, "html.parser").get_text())
+    assert clean_body(raw_body) == expected
+
+
+def test_clean_body_stats_counts_tiers():
+    from src.cleaner import clean_body_stats, reset_clean_body_stats
+
+    reset_clean_body_stats()
+    clean_body("just text")
+    clean_body("more text\n> quoted")
+    clean_body("<b>bold</b>")
+
+    assert clean_body_stats() == {"plain": 2, "html": 1}
+
+
+ENRON_RAW = (
+    "Message-ID: <18782981.1075855378110.JavaMail.evans@thyme>\n"
+    "Date: Mon, 14 May 2001 16:39:00 -0700 (PDT)\n"
+    "From: phillip.allen@enron.com\n"
+    "To: tim.belden@enron.com, john.lavorato@enron.com, \n"
+    "\tkim.ward@enron.com\n"
+    "Subject: =?utf-8?q?Caf=C3=A9?= forecast\n"
+    "X-From: Phillip K Allen\n"
+    "X-FileName: pallen (Non-Privileged).pst\n"
+    "\n"
+    "Here is our forecast\n"
+)
+
+
+def test_parse_header_block_matches_email_package():
+    """
+    the lean header parser returns what the email package would, and where the body starts
+    """
+    from src.cleaner import parse_header_block, _extract_headers_with_email_package
+
+    headers, body_offset = parse_header_block(ENRON_RAW)
+
+    expected = _extract_headers_with_email_package(ENRON_RAW)
+    assert headers == {key: str(value) for key, value in expected.items()}
+    assert headers["To"] == "tim.belden@enron.com, john.lavorato@enron.com, kim.ward@enron.com"
+    assert headers["Subject"] == "Café forecast"
+    assert headers["Date"] == "Mon, 14 May 2001 16:39:00 -0700"
+    assert ENRON_RAW[body_offset:] == "Here is our forecast\n"
+
+
+def test_parse_header_block_falls_back_on_irregular_headers():
+    from src.cleaner import parse_header_block
+
+    raw = "not a header line\nFrom: alice@example.com\n\nbody"
+    headers, body_offset = parse_header_block(raw)
+
+    assert headers is None
+    assert raw[body_offset:] == "body"
+    # extract_headers still returns what the email package makes of it
+    assert extract_headers(raw)["From"] == ""
+
+
+def test_extract_headers_keeps_first_of_repeated_headers():
+    raw = "Subject: first\nSubject: second\n  continued\nTo: bob@example.com\n\nbody"
+    headers = extract_headers(raw)
+    assert headers["Subject"] == "first"
+    assert headers["To"] == "bob@example.com"
+
+
+def test_parse_enron_email_string_sets_timestamp():
+    raw_email = (
+        "From: john.arnold@enron.com\n"
+        "To: slafontaine@globalp.com\n"
+        "Subject: re:spreads\n"
+        "Date: Wed, 13 Dec 2000 13:09:00 -0800 (PST)\n"
+        "\n"
+        "body"
+    )
+    assert parse_enron_email_string(raw_email)["Timestamp"] == 976741740
+    assert parse_enron_email_string("Subject: no date\n\nbody")["Timestamp"] is None
+
+
+@pytest.mark.parametrize("raw", [
+    ENRON_RAW,
+    ENRON_RAW.replace("\n", "\r\n"),
+    "not a header line\nFrom: alice@example.com\n\nbody",
+    "Subject: no body",
+])
+def test_parse_enron_email_bytes_matches_string_parser(raw):
+    from src.cleaner import parse_enron_email_bytes
+
+    expected = parse_enron_email_string(raw.replace("\r\n", "\n"), filename="1.")
+    assert parse_enron_email_bytes(raw.encode("utf-8"), filename="1.") == expected
+
+
+def test_parse_enron_email_bytes_decodes_body_with_declared_charset():
+    from src.cleaner import parse_enron_email_bytes, body_charset
+
+    head = "From: a@enron.com\nTo: b@enron.com\nSubject: prices\nDate: Mon, 14 May 2001 16:39:00 -0700\n"
+    latin = (head + "Content-Type: text/plain; charset=ISO-8859-1\n\nCaf\xe9 prices\n").encode("latin-1")
+    assert parse_enron_email_bytes(latin)["Body"] == "Café prices"
+
+    # Enron's ASCII declarations still keep UTF-8 text
+    ascii_declared = (head + "Content-Type: text/plain; charset=us-ascii\n\nCafé prices\n").encode("utf-8")
+    assert parse_enron_email_bytes(ascii_declared)["Body"] == "Café prices"
+    assert body_charset(b"text/plain; charset=ANSI_X3.4-1968") == "utf-8"
+    assert body_charset(b'text/plain; charset="windows-1252"') == "cp1252"
+    assert body_charset(b"text/plain; charset=no-such-codec") == "utf-8"
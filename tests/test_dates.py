@@ -0,0 +1,56 @@
+from email.utils import parsedate_to_datetime
+from src import dates
+from src.dates import parse_date_epoch, parse_dates, date_parse_stats, reset_date_parse_stats, normalize_date
+
+
+def test_parse_date_epoch_converts_to_utc():
+    assert parse_date_epoch("Mon, 14 May 2001 16:39:00 -0700 (PDT)") == 989883540
+    assert parse_date_epoch("Mon, 14 May 2001 23:39:00 +0000") == 989883540
+    # No timezone is taken as UTC
+    assert parse_date_epoch("Mon, 14 May 2001 23:39:00 -0000") == 989883540
+
+
+def test_failures_are_counted_not_printed(capsys):
+    reset_date_parse_stats()
+    assert parse_date_epoch("2000-12-01T09:00:00") is None
+    assert parse_date_epoch("") is None
+    assert parse_date_epoch(None) is None
+
+    assert capsys.readouterr().out == ""
+    assert date_parse_stats() == {"parsed": 0, "failed": 1, "missing": 2}
+
+
+def test_parse_dates_dedupes_identical_strings():
+    reset_date_parse_stats()
+    dates = ["Mon, 14 May 2001 16:39:00 -0700"] * 5 + ["garbage"] * 3
+
+    result = parse_dates(dates)
+
+    assert result == [989883540] * 5 + [None] * 3
+    assert date_parse_stats() == {"parsed": 1, "failed": 1, "missing": 0}
+
+
+def test_normalized_dates_are_not_parsed_again(monkeypatch):
+    calls = []
+
+    def counting_parse(value):
+        calls.append(value)
+        return parsedate_to_datetime(value)
+
+    monkeypatch.setattr(dates, "parsedate_to_datetime", counting_parse)
+    monkeypatch.setattr(dates, "_parsed_dates", {})
+    raw = "Mon, 14 May 2001 16:39:00 -0700 (PDT)"
+
+    normalized = normalize_date(raw)
+    assert normalized == "Mon, 14 May 2001 16:39:00 -0700"
+    assert parse_date_epoch(normalized) == parse_date_epoch(raw) == 989883540
+    assert normalize_date("garbage") == "garbage" and parse_date_epoch("garbage") is None
+    assert calls == [raw, "garbage"]
+
+
+def test_parsed_dates_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(dates, "_parsed_dates", {})
+    monkeypatch.setattr(dates, "DATE_CACHE_SIZE", 10)
+    for day in range(1, 29):
+        parse_date_epoch(f"Mon, {day} May 2001 16:39:00 -0700")
+    assert len(dates._parsed_dates) <= 11
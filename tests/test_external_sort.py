@@ -0,0 +1,64 @@
+import copy
+import json
+import os
+import pytest
+from benchmarks.synthetic_corpus import generate_corpus
+from src.cleaner import parse_enron_email_string
+from src.external_sort import iter_threads_external, spill_sorted_runs, thread_jsonl_external
+from src.thread_builder import build_thread_map
+from src.writers import write_jsonl
+
+
+@pytest.fixture
+def corpus_jsonl(tmp_path):
+    emails = [parse_enron_email_string(raw, path) for path, raw in generate_corpus(300, pathology_rate=0.1, seed=5)]
+    emails[0]["Body"] = "tab\there, line separator, \r return"
+    path = tmp_path / "emails.jsonl"
+    write_jsonl(emails, str(path))
+    return emails, str(path)
+
+
+@pytest.mark.parametrize("run_size", [7, 100000])
+def test_matches_in_memory_threading(corpus_jsonl, tmp_path, run_size):
+    emails, path = corpus_jsonl
+    expected = build_thread_map(copy.deepcopy(emails))
+
+    out = tmp_path / "threads.json"
+    count = thread_jsonl_external(path, str(out), run_size=run_size, tmp_dir=str(tmp_path))
+    result = json.loads(out.read_text(encoding="utf-8"))
+
+    assert count == len(expected)
+    assert result == json.loads(json.dumps(expected))
+    assert list(result) == sorted(result)
+    # Run files are cleaned up
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith("thread-runs-")] == []
+
+
+def test_many_runs_are_merged_in_passes(corpus_jsonl, tmp_path):
+    _, path = corpus_jsonl
+    lines = [line for line in open(path, "rb").read().split(b"\n") if line.strip()]
+    thread_ids = [f"t{i % 5}" for i in range(len(lines))]
+    timestamps = [len(lines) - i for i in range(len(lines))]
+
+    runs = spill_sorted_runs(path, thread_ids, timestamps, str(tmp_path), run_size=10, fan_in=4)
+    assert len(runs) <= 4
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(r) for r in runs] + ["emails.jsonl"])
+
+    total = 0
+    for run in runs:
+        keys = [json.loads(line.split("\t", 1)[0]) for line in open(run, encoding="utf-8")]
+        assert keys == sorted(keys)
+        total += len(keys)
+    assert total == len(lines)
+
+
+def test_threads_come_out_one_at_a_time_in_date_order(corpus_jsonl):
+    _, path = corpus_jsonl
+    seen = set()
+    for thread_id, thread in iter_threads_external(path, run_size=20):
+        assert thread_id not in seen
+        seen.add(thread_id)
+        positions = [e["ThreadPosition"] for e in thread]
+        assert positions == sorted(set(positions))
+        stamps = [e["Timestamp"] for e in thread if e["Timestamp"] is not None]
+        assert stamps == sorted(stamps)
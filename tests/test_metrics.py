@@ -0,0 +1,72 @@
+import json
+import pstats
+import pytest
+from src import metrics
+from src.cleaner import parse_enron_email_string, normalize_subject_cache_info
+from src.thread_builder import build_thread_map
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+    metrics._profilers.clear()
+
+
+RAW = "Message-ID: <1@x>\nFrom: a@enron.com\nTo: b@enron.com\nSubject: Hi\nDate: Mon, 14 May 2001 16:39:00 -0700\n\n<p>Hello</p>\n"
+
+
+def test_stages_and_counters_are_recorded():
+    emails = [parse_enron_email_string(RAW), parse_enron_email_string("not a header line\n\nbody")]
+    build_thread_map(emails)
+
+    data = metrics.snapshot()
+    assert data["stages"]["header_parse"]["calls"] == 2
+    assert data["stages"]["body_clean"]["calls"] == 2
+    for stage in ("thread_resolve", "sort", "dedup"):
+        assert data["stages"][stage]["calls"] == 1
+    assert data["counters"]["header_block_fallback"] == 1
+    assert data["counters"]["clean_body_html"] == 1
+    assert data["counters"]["date_parsed"] >= 1
+
+
+def test_merge_adds_worker_snapshots():
+    metrics.incr("parse_errors", 2)
+    with metrics.timer("read"):
+        pass
+    worker = {"stages": {"read": {"calls": 3, "seconds": 1.5}},
+              "counters": {"parse_errors": 1}, "gauges": {"subject_cache_hits": 99}}
+    metrics.merge(worker)
+
+    data = metrics.snapshot()
+    assert data["stages"]["read"]["calls"] == 4
+    assert data["stages"]["read"]["seconds"] >= 1.5
+    assert data["counters"]["parse_errors"] == 3
+    assert data["gauges"]["subject_cache_hits"] == normalize_subject_cache_info().hits
+
+
+def test_write_metrics_json_and_prometheus(tmp_path):
+    metrics.incr("parse_errors")
+    with metrics.timer("write"):
+        pass
+
+    metrics.write_metrics(str(tmp_path / "m.json"))
+    data = json.loads((tmp_path / "m.json").read_text())
+    assert data["counters"]["parse_errors"] == 1
+
+    metrics.write_metrics(str(tmp_path / "m.prom"))
+    text = (tmp_path / "m.prom").read_text()
+    assert 'enron_stage_calls_total{stage="write"} 1' in text
+    assert 'enron_events_total{event="parse_errors"} 1' in text
+    assert "# TYPE enron_subject_cache_hits gauge" in text
+
+
+def test_profiling_writes_one_file_per_stage_that_ran(tmp_path):
+    metrics.enable_profiling(["header_parse", "sort"])
+    parse_enron_email_string(RAW)
+
+    paths = metrics.dump_profiles(str(tmp_path))
+    assert [p.rsplit("/", 1)[-1] for p in paths] == ["header_parse.prof"]
+    stats = pstats.Stats(paths[0])
+    assert any(func[2] == "parse_header_block" for func in stats.stats)
@@ -0,0 +1,100 @@
+import json
+from src.near_dedup import (
+    shingles,
+    MinHasher,
+    lsh_params,
+    find_near_duplicates,
+    deduplicate_near,
+    deduplicate_jsonl,
+)
+from src.writers import write_jsonl
+
+BODY = (
+    "Phillip, the gas forecast for next week is attached. Demand in the west is "
+    "expected to stay high through Friday and storage injections will slow down. "
+    "Let me know if you want to go over the numbers before the Monday meeting."
+)
+
+
+def _email(body, sender="john.arnold@enron.com", subject="Gas forecast", timestamp=976741740, folder="inbox"):
+    return {
+        "From": sender,
+        "To": "phillip.allen@enron.com",
+        "Subject": subject,
+        "Body": body,
+        "Timestamp": timestamp,
+        "Filename": folder,
+    }
+
+
+def test_minhash_estimates_similarity():
+    hasher = MinHasher(num_perm=128)
+    a = hasher.signature(shingles(BODY))
+    b = hasher.signature(shingles(BODY.replace("Friday", "Thursday")))
+    c = hasher.signature(shingles("Completely unrelated text about trading desks and power"))
+
+    def estimate(x, y):
+        return sum(p == q for p, q in zip(x, y)) / 128
+
+    assert estimate(a, a) == 1.0
+    assert estimate(a, b) > 0.6
+    assert estimate(a, c) < 0.2
+
+
+def test_lsh_params_cover_all_permutations():
+    bands, rows = lsh_params(0.8, 128)
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.8) < 0.1
+
+
+def test_whitespace_and_header_variants_are_grouped():
+    emails = [
+        _email(BODY, folder="inbox"),
+        _email("unrelated note about the holiday party schedule"),
+        _email(BODY.replace(" ", "  ").replace(". ", ".\n"), subject="RE: Gas forecast", folder="all_documents"),
+        _email(BODY, sender="someone.else@enron.com"),
+        _email(BODY, timestamp=976741740 + 30 * 86400),
+        _email(BODY, sender="John Arnold <John.Arnold@enron.com>"),
+    ]
+    assert find_near_duplicates(emails, threshold=0.9) == [[0, 2, 5]]
+    assert find_near_duplicates(emails, threshold=0.9, time_window=None) == [[0, 2, 4, 5]]
+
+
+def test_deduplicate_near_keep_strategies():
+    emails = [_email(BODY, timestamp=20), _email(BODY + " Thanks", timestamp=10), _email("different message entirely")]
+
+    assert deduplicate_near(emails, threshold=0.7) == [emails[0], emails[2]]
+    assert deduplicate_near(emails, threshold=0.7, keep="earliest") == [emails[1], emails[2]]
+    assert deduplicate_near(emails, threshold=0.7, keep="longest") == [emails[1], emails[2]]
+
+
+def test_deduplicate_jsonl(tmp_path):
+    emails = [_email(BODY), _email(BODY), _email("different message entirely")]
+    src = tmp_path / "in.jsonl"
+    out = tmp_path / "out.jsonl"
+    write_jsonl(emails, str(src))
+
+    assert deduplicate_jsonl(str(src), str(out), threshold=0.9) == 1
+    assert [json.loads(line) for line in out.read_text().splitlines()] == [emails[0], emails[2]]
+
+
+def test_shared_short_text_from_many_senders_stays_linear(monkeypatch):
+    import src.near_dedup as near_dedup
+
+    lookups = []
+
+    class CountingUnionFind(near_dedup.UnionFind):
+        def find(self, item):
+            lookups.append(item)
+            return super().find(item)
+
+    # Every representative tried for a bucket member costs a lookup, so this counts bucket work
+    monkeypatch.setattr(near_dedup, "UnionFind", CountingUnionFind)
+    senders = [f"user{i}@enron.com" for i in range(300)]
+    emails = [_email("Thanks", sender=s, subject="Re: update") for s in senders for _ in range(2)]
+
+    clusters = find_near_duplicates(emails)
+
+    bands, _ = lsh_params(0.8, 128)
+    assert clusters == [[2 * i, 2 * i + 1] for i in range(len(senders))]
+    assert len(lookups) <= 10 * len(emails) * bands
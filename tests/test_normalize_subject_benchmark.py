@@ -0,0 +1,26 @@
+"""
+Micro-benchmark for normalize_subject. Run with `pytest -s` to see the timings.
+"""
+import random
+import timeit
+from src.cleaner import normalize_subject, normalize_subject_cache_info, _normalize_subject_cached
+
+
+def _thread_like_subjects(n=20000, distinct=500, seed=0):
+    rng = random.Random(seed)
+    prefixes = ["", "Re: ", "RE: ", "Fwd: ", "FW: Re: ", "Re[2]: ", "AW: "]
+    bases = [f"Gas forecast for week {i}" for i in range(distinct)]
+    return [rng.choice(prefixes) + rng.choice(bases) for _ in range(n)]
+
+
+def test_normalize_subject_cache_pays_off():
+    subjects = _thread_like_subjects()
+    _normalize_subject_cached.cache_clear()
+
+    uncached = timeit.timeit(lambda: [_normalize_subject_cached.__wrapped__(s) for s in subjects], number=3)
+    cached = timeit.timeit(lambda: [normalize_subject(s) for s in subjects], number=3)
+    info = normalize_subject_cache_info()
+    print(f"\nnormalize_subject: uncached {uncached:.4f}s, cached {cached:.4f}s, {info}")
+
+    assert info.misses == len(set(subjects))
+    assert info.hits == 3 * len(subjects) - info.misses
@@ -0,0 +1,94 @@
+import pytest
+import process_enron_folder
+from process_enron_folder import iter_enron_folder
+from src.parse_cache import ParseCache, cleaner_version, open_reader
+from tests.conftest import write_email
+
+
+@pytest.fixture
+def maildir(make_maildir):
+    root = make_maildir(folders=["inbox"])
+    # Same content in two mailboxes
+    write_email(root / "allen-p" / "sent" / "9.", "shared")
+    write_email(root / "arora-h" / "all_documents" / "9.", "shared")
+    return root
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_second_run_is_served_from_cache(maildir, tmp_path, monkeypatch, workers):
+    cache_path = str(tmp_path / f"cache-{workers}.sqlite")
+    uncached = list(iter_enron_folder(str(maildir)))
+    first = list(iter_enron_folder(str(maildir), workers=workers, cache_path=cache_path))
+    assert first == uncached
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached file was parsed again")
+
+    monkeypatch.setattr(process_enron_folder, "parse_enron_email_bytes", fail)
+    second = list(iter_enron_folder(str(maildir), cache_path=cache_path))
+    assert second == uncached
+    assert {(e["Mailbox"], e["Filename"]) for e in second if e["Subject"] == "shared"} == {
+        ("allen-p", "9."), ("arora-h", "9.")}
+
+
+def test_changed_file_is_parsed_again(maildir, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    list(iter_enron_folder(str(maildir), cache_path=cache_path))
+    write_email(maildir / "allen-p" / "inbox" / "0.", "edited")
+
+    subjects = [e["Subject"] for e in iter_enron_folder(str(maildir), cache_path=cache_path)]
+    assert "edited" in subjects and "allen-p inbox 0" not in subjects
+
+
+def test_other_cleaner_versions_are_dropped(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    with ParseCache(path, version="old") as cache:
+        cache.put_many([("d1", {"Subject": "a"})])
+        assert cache.get_many(["d1"]) == {"d1": {"Subject": "a"}}
+    with ParseCache(path, version="new") as cache:
+        assert len(cache) == 0
+    assert cleaner_version() == cleaner_version()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ParseCache(path, max_entries=2, version="v")
+    cache.put_many([(f"d{i}", {"Subject": str(i)}) for i in range(3)])
+    for i, digest in enumerate(["d1", "d0", "d2"]):
+        cache.conn.execute("UPDATE entries SET last_used = ? WHERE digest = ?", (i, digest))
+    cache.conn.commit()
+    cache.close()
+
+    with ParseCache(path, max_entries=2, version="v") as cache:
+        assert set(cache.get_many(["d0", "d1", "d2"])) == {"d0", "d2"}
+
+
+def test_readers_are_not_shared_across_processes(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite")
+    ParseCache(path).close()
+
+    reader = open_reader(path)
+    assert open_reader(path) is reader
+    # A forked pool worker has another process ID and must open its own connection
+    monkeypatch.setattr("os.getpid", lambda: -1)
+    assert open_reader(path) is not reader
+
+
+def test_history_records_are_cached_apart(maildir, tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "cache.sqlite")
+    write_email(maildir / "allen-p" / "inbox" / "0.", "reply",
+                body="Sounds good.\n\n-----Original Message-----\nFrom: Bob\nSent: Monday\n\nNumbers?")
+    plain = list(iter_enron_folder(str(maildir), cache_path=cache_path))
+    assert all("QuotedHistory" not in e for e in plain)
+
+    with_history = list(iter_enron_folder(str(maildir), cache_path=cache_path, keep_history=True))
+    reply = next(e for e in with_history if e["Subject"] == "reply")
+    assert reply["Body"] == "Sounds good."
+    assert reply["QuotedHistory"].startswith("-----Original Message-----")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached file was parsed again")
+
+    monkeypatch.setattr(process_enron_folder, "parse_enron_email_bytes", fail)
+    assert list(iter_enron_folder(str(maildir), cache_path=cache_path)) == plain
+    assert list(iter_enron_folder(str(maildir), cache_path=cache_path, keep_history=True)) == with_history
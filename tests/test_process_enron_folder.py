@@ -0,0 +1,60 @@
+import pytest
+from process_enron_folder import process_enron_folder, iter_enron_folder, iter_file_chunks
+
+
+def test_iter_file_chunks_splits_per_directory(maildir):
+    chunks = list(iter_file_chunks(str(maildir), chunk_size=2))
+    # 4 directories with 3 files each -> 2 chunks per directory
+    assert len(chunks) == 8
+    for chunk in chunks:
+        assert len({p.rsplit("/", 1)[0] for p in chunk}) == 1
+
+
+def test_parallel_matches_serial_order(maildir):
+    serial = process_enron_folder(str(maildir), workers=1, chunk_size=2)
+    parallel = process_enron_folder(str(maildir), workers=3, chunk_size=2)
+
+    assert len(serial) == 12
+    assert [e["Subject"] for e in parallel] == [e["Subject"] for e in serial]
+    assert serial[0]["Subject"] == "allen-p inbox 0"
+
+
+def test_errors_are_gathered(maildir, monkeypatch):
+    import process_enron_folder as module
+
+    def boom(data, filename="", keep_history=False):
+        if b"sent 1" in data:
+            raise ValueError("bad file")
+        return {"Subject": filename}
+
+    monkeypatch.setattr(module, "parse_enron_email_bytes", boom)
+    errors = []
+    emails = module.process_enron_folder(str(maildir), errors=errors)
+
+    assert len(emails) == 10
+    assert len(errors) == 2
+    assert all(message == "bad file" for _, message in errors)
+
+
+def test_iter_enron_folder_is_lazy(maildir):
+    stream = iter_enron_folder(str(maildir), workers=2, chunk_size=1)
+    first = next(stream)
+    assert first["Subject"] == "allen-p inbox 0"
+    assert len(list(stream)) == 11
+
+
+def test_records_carry_their_mailbox(maildir):
+    emails = process_enron_folder(str(maildir))
+    assert [e["Mailbox"] for e in emails] == ["allen-p"] * 6 + ["arora-h"] * 6
+
+
+@pytest.mark.parametrize("flag", [["--cache", "cache.sqlite"], ["--prefetch", "4"], ["--keep-history"]])
+def test_checkpoint_dir_rejects_cache_and_prefetch(maildir, tmp_path, monkeypatch, capsys, flag):
+    import process_enron_folder as module
+
+    monkeypatch.setattr("sys.argv", ["process_enron_folder.py", str(maildir),
+                                     "--checkpoint-dir", str(tmp_path / "ckpt"), *flag])
+    with pytest.raises(SystemExit):
+        module.main()
+    assert "--checkpoint-dir cannot be combined" in capsys.readouterr().err
+    assert not (tmp_path / "ckpt").exists()
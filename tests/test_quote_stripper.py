@@ -0,0 +1,76 @@
+import pytest
+from src.cleaner import clean_body, parse_enron_email_string
+from src.quote_stripper import strip_quotes, quote_stripper_stats, reset_quote_stripper_stats
+
+REPLY = "Sounds good, send me the numbers.\n\n"
+
+HISTORIES = {
+    "original_message": (
+        " -----Original Message-----\n"
+        "From: \tArnold, John\n"
+        "Sent:\tMonday, May 14, 2001 4:39 PM\n"
+        "To:\tAllen, Phillip K.\n"
+        "Subject:\tRE: gas forecast\n\n"
+        "Can you check the west desk curve?\n"
+    ),
+    "forwarded_by": (
+        "---------------------- Forwarded by Phillip K Allen/HOU/ECT on 10/16/2000 01:42 PM "
+        "---------------------------\n\n"
+        "Jeff Dasovich\n10/13/2000 09:12 AM\nTo: Phillip K Allen/HOU/ECT@ECT\n\nCalifornia update.\n"
+    ),
+    "from_sent": (
+        "From: Kay Mann\n"
+        "Sent: Tuesday, March 06, 2001 8:15 AM\n"
+        "To: Sara Shackleton\n\nTurbine contract attached.\n"
+    ),
+    "notes_header": (
+        '"Dasovich, Jeff" <jeff.dasovich@enron.com> on 10/16/2000 01:42:07 PM\n'
+        "To: Phillip K Allen/HOU/ECT@ECT\n"
+        "cc: \nSubject: storage\n\nNumbers attached.\n"
+    ),
+    "wrote": "On Mon, 14 May 2001, Bob wrote:\n\n> What's the update?\n",
+}
+
+
+@pytest.mark.parametrize("rule", list(HISTORIES))
+def test_each_rule_cuts_at_its_marker(rule):
+    text = REPLY + HISTORIES[rule]
+    result = strip_quotes(text)
+    assert result.rule == rule
+    assert result.cut == len(REPLY)
+    assert result.text == REPLY
+    assert result.history == HISTORIES[rule]
+
+
+def test_earliest_marker_wins_and_hits_are_counted():
+    reset_quote_stripper_stats()
+    text = REPLY + HISTORIES["from_sent"] + HISTORIES["original_message"]
+    assert strip_quotes(text).rule == "from_sent"
+    assert strip_quotes("no history here").cut is None
+    assert quote_stripper_stats()["from_sent"] == 1
+    assert sum(quote_stripper_stats().values()) == 1
+
+
+def test_pure_forward_is_kept_whole():
+    reset_quote_stripper_stats()
+    forward = "\n  " + HISTORIES["forwarded_by"]
+    result = strip_quotes(forward)
+    assert result.text == forward and result.cut is None
+    assert quote_stripper_stats()["kept_forward"] == 1
+    assert "California update." in clean_body(forward)
+
+
+def test_clean_body_and_history_field():
+    raw = ("Message-ID: <1@x>\nFrom: a@enron.com\nTo: b@enron.com\nSubject: Re: forecast\n"
+           "Date: Mon, 14 May 2001 16:39:00 -0700\n\n" + REPLY + HISTORIES["original_message"])
+    record = parse_enron_email_string(raw, keep_history=True)
+    assert record["Body"] == "Sounds good, send me the numbers."
+    assert record["QuotedHistory"].startswith("-----Original Message-----")
+    assert "QuotedHistory" not in parse_enron_email_string(raw)
+    assert "west desk" in clean_body(REPLY + HISTORIES["original_message"], strip_history=False)
+
+
+def test_wrote_needs_quoted_lines_after_it():
+    body = "Thanks, see below.\n\nAs Jeff wrote:\nwe should hedge the west desk now.\n"
+    assert strip_quotes(body).cut is None
+    assert clean_body(body) == "Thanks, see below.\n\nAs Jeff wrote:\nwe should hedge the west desk now."
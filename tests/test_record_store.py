@@ -0,0 +1,92 @@
+import json
+import random
+import tracemalloc
+from src.record_store import RecordStore, json_default
+from src.thread_builder import build_thread_map
+
+emails = [
+    {
+        "MessageID": "<1@enron.com>",
+        "InReplyTo": "",
+        "From": "alice@enron.com",
+        "To": "bob@enron.com",
+        "Subject": "Budget",
+        "Date": "Mon, 01 Jan 2001 10:00:00 -0800",
+        "Body": "First draft attached. Café?",
+        "Timestamp": 978372000,
+        "Filename": "1.",
+    },
+    {
+        "MessageID": "<2@enron.com>",
+        "InReplyTo": "<1@enron.com>",
+        "From": "bob@enron.com",
+        "To": "alice@enron.com",
+        "Subject": "Re: Budget",
+        "Date": "Mon, 01 Jan 2001 11:00:00 -0800",
+        "Filename": "2.",
+        "X-Custom": [1, 2],
+    },
+]
+
+
+def test_views_round_trip_records():
+    store = RecordStore.from_records(emails)
+
+    assert len(store) == 2
+    assert store[0].to_dict() == emails[0]
+    # Timestamp is always filled in, parsed from Date when the record had none
+    assert store[1].to_dict() == dict(emails[1], Timestamp=978375600)
+    assert "Body" not in store[1]
+    assert store[1].get("Body", "") == ""
+    assert store[-1]["X-Custom"] == [1, 2]
+
+
+def test_addresses_and_subjects_are_interned():
+    store = RecordStore.from_records([{"From": "a" + "lice@enron.com"}, {"From": "al" + "ice@enron.com"}])
+    assert store[0]["From"] is store[1]["From"]
+
+
+def test_build_thread_map_runs_on_store():
+    store = RecordStore.from_records(emails)
+    expected = build_thread_map(store.to_dicts())
+    thread_map = build_thread_map(store)
+
+    assert list(thread_map) == list(expected)
+    threaded = json.loads(json.dumps(thread_map, default=json_default))
+    assert threaded == json.loads(json.dumps(expected))
+    assert store[1]["ThreadPosition"] == 1
+
+
+def test_store_uses_less_memory_than_dicts():
+    rng = random.Random(0)
+    people = [f"person{i}@enron.com" for i in range(50)]
+    records = [
+        {
+            "MessageID": f"<{i}.JavaMail.evans@thyme>",
+            "InReplyTo": "",
+            "From": rng.choice(people),
+            "To": rng.choice(people),
+            "Subject": f"Re: deal {i % 40}",
+            "Date": "Mon, 01 Jan 2001 10:00:00 -0800",
+            "Body": "Please review the attached schedule. " * rng.randint(1, 5),
+            "ThreadKey": f"deal {i % 40}::Mon, 01 Jan 2001 10:00:00 -0800",
+            "Timestamp": 978372000,
+            "Filename": f"{i}.",
+        }
+        for i in range(3000)
+    ]
+    payload = json.dumps(records)
+
+    tracemalloc.start()
+    as_dicts = json.loads(payload)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del as_dicts
+
+    tracemalloc.start()
+    store = RecordStore.from_records(json.loads(line) for line in map(json.dumps, json.loads(payload)))
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert len(store) == 3000
+    assert baseline < dict_bytes * 0.6
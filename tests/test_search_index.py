@@ -0,0 +1,150 @@
+import time
+from datetime import datetime, timezone
+import pytest
+from src.search_index import build_index, EmailIndex
+from src.thread_builder import build_thread_map
+from src.writers import flatten_threads
+
+emails = [
+    {
+        "MessageID": "<1@enron.com>",
+        "InReplyTo": "",
+        "From": "john.arnold@enron.com",
+        "To": "phillip.allen@enron.com, Mike Grigsby <mike.grigsby@enron.com>",
+        "Subject": "Gas forecast",
+        "Date": "Mon, 01 Jan 2001 10:00:00 -0800",
+        "Timestamp": 978372000,
+        "Body": "Storage injections slow down next week.",
+    },
+    {
+        "MessageID": "<2@enron.com>",
+        "InReplyTo": "<1@enron.com>",
+        "From": "phillip.allen@enron.com",
+        "To": "john.arnold@enron.com",
+        "Subject": "Re: Gas forecast",
+        "Date": "Tue, 02 Jan 2001 10:00:00 -0800",
+        "Timestamp": 978458400,
+        "Body": "Agreed, California demand stays high.",
+    },
+    {
+        "MessageID": "<3@enron.com>",
+        "InReplyTo": "",
+        "From": "kay.mann@enron.com",
+        "To": "mike.grigsby@enron.com",
+        "Subject": "Turbine contract",
+        "Date": "Mon, 05 Mar 2001 10:00:00 -0800",
+        "Timestamp": 983815200,
+        "Body": "Draft attached for review.",
+    },
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    thread_map = build_thread_map([dict(e) for e in emails])
+    path = str(tmp_path / "enron.sqlite")
+    assert build_index(flatten_threads(thread_map), path) == 3
+    with EmailIndex(path) as index:
+        yield index
+
+
+def _ids(records):
+    return [r["MessageID"] for r in records]
+
+
+def test_full_text_search(index):
+    assert _ids(index.find(text="california")) == ["<2@enron.com>"]
+    assert _ids(index.find(text="gas")) == ["<1@enron.com>", "<2@enron.com>"]
+
+
+def test_sender_recipient_and_date_filters(index):
+    assert _ids(index.find(sender="John.Arnold@enron.com")) == ["<1@enron.com>"]
+    assert _ids(index.find(recipient="mike.grigsby@enron.com")) == ["<1@enron.com>", "<3@enron.com>"]
+    start = datetime(2001, 1, 2, tzinfo=timezone.utc)
+    assert _ids(index.find(start=start, end=983815200)) == ["<2@enron.com>"]
+    assert _ids(index.find(text="draft", recipient="mike.grigsby@enron.com")) == ["<3@enron.com>"]
+
+
+def test_thread_queries(index):
+    thread_ids = index.find_threads(text="california")
+    assert len(thread_ids) == 1
+    assert _ids(index.thread(thread_ids[0])) == ["<1@enron.com>", "<2@enron.com>"]
+    assert len(index.find_threads()) == 2
+
+
+def _plan(index, **filters):
+    where, params = index._where(filters.get("text"), filters.get("sender"), filters.get("recipient"),
+                                 filters.get("start"), filters.get("end"))
+    rows = index.conn.execute(f"EXPLAIN QUERY PLAN SELECT e.record FROM emails e{where} "
+                              "ORDER BY e.timestamp, e.id LIMIT ?", params + [100])
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_queries_use_the_indexes_on_a_larger_index(tmp_path):
+    path = str(tmp_path / "big.sqlite")
+    build_index(
+        ({"MessageID": f"<{i}>", "From": f"user{i % 100}@enron.com", "To": f"desk{i % 50}@enron.com",
+          "Subject": f"deal {i}", "Body": f"volume {i} mmbtu", "Timestamp": i, "ThreadID": f"t{i % 500}"}
+         for i in range(20000)),
+        path,
+    )
+    with EmailIndex(path) as index:
+        assert len(index.find(sender="user7@enron.com", limit=1000)) == 200
+        assert len(index.find(recipient="desk3@enron.com", limit=1000)) == 400
+        assert _ids(index.find(text="volume AND 12345")) == ["<12345>"]
+        assert len(index.find(start=100, end=200)) == 100
+
+        # Filters are answered from their indexes, never by scanning every email
+        assert "idx_emails_sender" in _plan(index, sender="user7@enron.com")
+        assert "idx_emails_timestamp" in _plan(index, start=100, end=200)
+        assert "idx_recipients_address" in _plan(index, recipient="desk3@enron.com")
+        assert "VIRTUAL TABLE INDEX" in _plan(index, text="volume")
+        for filters in ({"sender": "user7@enron.com"}, {"start": 100, "end": 200}):
+            assert "SCAN e " not in _plan(index, **filters) + " "
+
+
+@pytest.fixture
+def chicago_time(monkeypatch):
+    monkeypatch.setenv("TZ", "America/Chicago")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_naive_datetimes_are_utc_whatever_the_local_zone(tmp_path, chicago_time):
+    from src.search_index import _epoch
+
+    assert _epoch(datetime(2001, 1, 1)) == 978307200
+    assert _epoch(datetime(2001, 1, 1, tzinfo=timezone.utc)) == 978307200
+
+    path = str(tmp_path / "tz.sqlite")
+    build_index([{"MessageID": "<new-year>", "From": "a@enron.com", "To": "b@enron.com",
+                  "Subject": "midnight", "Body": "", "Timestamp": 978307200}], path)
+    with EmailIndex(path) as index:
+        assert _ids(index.find(start=datetime(2001, 1, 1))) == ["<new-year>"]
+        assert index.find(end=datetime(2001, 1, 1)) == []
+
+
+def test_rebuilding_replaces_the_index_unless_extending(tmp_path):
+    path = str(tmp_path / "enron.sqlite")
+    records = list(flatten_threads(build_thread_map([dict(e) for e in emails])))
+    build_index(records, path)
+    build_index(records, path)
+    with EmailIndex(path) as index:
+        assert len(index.find()) == 3
+
+    build_index(records[:1], path, extend=True)
+    with EmailIndex(path) as index:
+        assert len(index.find()) == 4
+
+    # A build that fails part-way leaves the previous index alone
+    def failing():
+        yield records[0]
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        build_index(failing(), path, batch_size=1)
+    with EmailIndex(path) as index:
+        assert len(index.find()) == 4
+    assert not (tmp_path / "enron.sqlite.tmp").exists()
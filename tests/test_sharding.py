@@ -0,0 +1,79 @@
+import copy
+import json
+import random
+import pytest
+from benchmarks.synthetic_corpus import generate_corpus
+from src.cleaner import parse_enron_email_string
+from src.thread_builder import build_thread_map
+from src.writers import write_jsonl
+from src.sharding import (
+    shard_for_subject,
+    partition_jsonl,
+    map_shard,
+    reduce_shards,
+    assemble_shard,
+    merge_shards,
+    thread_jsonl_sharded,
+)
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    rng = random.Random(11)
+    emails = [parse_enron_email_string(raw, path) for path, raw in generate_corpus(400, pathology_rate=0.1, seed=9)]
+    for i, email in enumerate(emails):
+        if email["InReplyTo"] and rng.random() < 0.2:
+            # A reply that changed the subject usually lands in another shard than its parent
+            email["Subject"] = f"Re: new topic {i}"
+            if rng.random() < 0.3:
+                email["MessageID"] = ""
+    # The same MessageID under another subject, as a second copy of a message would be
+    for email in rng.sample(emails, 10):
+        emails.append(dict(email, Subject=f"Fwd: copy of {email['MessageID']}", Body="copy"))
+    rng.shuffle(emails)
+
+    path = tmp_path_factory.mktemp("sharding") / "emails.jsonl"
+    write_jsonl(emails, str(path))
+    return emails, str(path)
+
+
+def _expected(emails):
+    return json.loads(json.dumps(build_thread_map(copy.deepcopy(emails))))
+
+
+@pytest.mark.parametrize("shards,workers", [(1, 1), (4, 1), (16, 1), (4, 2)])
+def test_sharded_threading_matches_single_process(corpus, tmp_path, shards, workers):
+    emails, path = corpus
+    out = tmp_path / "threads.json"
+
+    count = thread_jsonl_sharded(path, str(out), shards=shards, workers=workers)
+    result = json.loads(out.read_text(encoding="utf-8"))
+
+    expected = _expected(emails)
+    assert count == len(expected)
+    assert result == expected
+    assert list(result) == sorted(result)
+
+
+def test_phases_run_separately_from_a_shared_directory(corpus, tmp_path):
+    emails, path = corpus
+    shard_dir = str(tmp_path / "shards")
+
+    counts = partition_jsonl(path, shard_dir, 6)
+    assert sum(counts) == len(emails)
+    for i in reversed(range(6)):
+        map_shard(shard_dir, i)
+    assert reduce_shards(shard_dir) > 0
+    for i in range(6):
+        assemble_shard(shard_dir, i)
+    out = tmp_path / "threads.json"
+    merge_shards(shard_dir, str(out), fan_in=4)
+
+    assert json.loads(out.read_text(encoding="utf-8")) == _expected(emails)
+
+
+def test_shard_for_subject_is_stable_and_ignores_prefixes():
+    assert shard_for_subject("Re: Fwd: Budget", 8) == shard_for_subject("Budget", 8)
+    assert shard_for_subject("", 8) == shard_for_subject("Re:", 8)
+    assert [shard_for_subject(f"subject {i}", 1) for i in range(5)] == [0] * 5
+    assert len({shard_for_subject(f"subject {i}", 8) for i in range(100)}) == 8
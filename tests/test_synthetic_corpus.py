@@ -0,0 +1,47 @@
+from benchmarks.synthetic_corpus import generate_corpus, write_corpus
+from benchmarks.run_benchmarks import run_stage
+from src.cleaner import parse_enron_email_string
+from src.thread_builder import build_thread_map
+
+
+def test_generate_corpus_is_deterministic():
+    assert generate_corpus(200, seed=3) == generate_corpus(200, seed=3)
+    assert generate_corpus(200, seed=3) != generate_corpus(200, seed=4)
+
+
+def test_duplicates_and_html_follow_the_settings():
+    plain = generate_corpus(300, duplicate_rate=0.0, html_ratio=0.0, seed=1)
+    assert len(plain) == 300
+    assert not any("<html>" in raw for _, raw in plain)
+
+    dupes = generate_corpus(300, duplicate_rate=1.0, html_ratio=1.0, seed=1)
+    assert len(dupes) == 600
+    assert all("<html>" in raw for _, raw in dupes)
+
+
+def test_pathological_corpus_parses_and_threads(tmp_path):
+    corpus = generate_corpus(300, reply_depth=4, pathology_rate=1.0, seed=2)
+    emails = [parse_enron_email_string(raw, path) for path, raw in corpus]
+    thread_map = build_thread_map(emails)
+    assert sum(len(thread) for thread in thread_map.values()) <= len(emails)
+
+    # cyclic_reply closes real loops of several messages through In-Reply-To
+    parents = {e["MessageID"]: e["InReplyTo"] for e in emails if e["MessageID"]}
+    cycles = 0
+    for start in parents:
+        seen, current = [], start
+        while current in parents and current not in seen:
+            seen.append(current)
+            current = parents[current]
+        cycles += current == start and len(seen) > 1
+    assert cycles > 0
+
+    assert write_corpus(str(tmp_path), corpus) == len(corpus)
+    assert (tmp_path / corpus[0][0]).read_bytes() == corpus[0][1].encode("utf-8")
+
+
+def test_run_stage_reports_throughput_and_memory():
+    result = run_stage("clean_body", {"n_messages": 50, "seed": 0}, repeat=1)
+    assert result["messages"] == len(generate_corpus(50, seed=0))
+    assert result["messages_per_sec"] > 0
+    assert result["peak_rss_mb"] > 0
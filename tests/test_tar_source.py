@@ -0,0 +1,80 @@
+import tarfile
+import pytest
+from process_enron_folder import process_enron_folder, iter_enron_folder
+from src.tar_source import is_tar_source, iter_tar_chunks, tar_mailbox_of
+
+
+@pytest.mark.parametrize("mode, suffix", [("w:gz", ".tar.gz"), ("w", ".tar")])
+def test_archive_matches_extracted_folder(maildir, tmp_path, mode, suffix):
+    archive = tmp_path / f"enron{suffix}"
+    with tarfile.open(archive, mode) as tar:
+        tar.add(maildir, arcname="maildir")
+
+    assert is_tar_source(str(archive))
+    assert not is_tar_source(str(maildir))
+    from_folder = process_enron_folder(str(maildir))
+    from_archive = process_enron_folder(str(archive), workers=2, chunk_size=2)
+    assert from_archive == from_folder
+
+
+def test_chunks_stay_within_one_directory(maildir, tmp_path, monkeypatch):
+    archive = tmp_path / "enron.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add(maildir, arcname="maildir")
+    opened = []
+    original_open = tarfile.open
+    monkeypatch.setattr(tarfile, "open", lambda *args, **kwargs: opened.append(args) or original_open(*args, **kwargs))
+
+    chunks = list(iter_tar_chunks(str(archive), chunk_size=2))
+
+    # The root is found while streaming, so the archive is only decompressed once
+    assert len(opened) == 1
+
+    assert {root for root, _ in chunks} == {"maildir"}
+    assert [len(members) for _, members in chunks] == [2, 1] * 4
+    assert chunks[0][1][0][0] == "maildir/allen-p/inbox/0."
+
+
+def test_tar_mailbox_of():
+    assert tar_mailbox_of("maildir/allen-p/inbox/1.", "maildir") == "allen-p"
+    assert tar_mailbox_of("./allen-p/inbox/1.", "") == "allen-p"
+    assert tar_mailbox_of("1.", "") == ""
+
+
+def _files(maildir):
+    return sorted(path for path in maildir.rglob("*") if path.is_file())
+
+
+def test_root_comes_from_the_files_not_the_first_member(maildir, tmp_path):
+    # No directory entries at all, as `tar -T filelist` or many scripted archives write them
+    bare = tmp_path / "bare.tar"
+    with tarfile.open(bare, "w") as tar:
+        for path in _files(maildir):
+            tar.add(path, arcname=f"maildir/{path.relative_to(maildir).as_posix()}")
+    # Directory entries after the files
+    late = tmp_path / "late.tar"
+    with tarfile.open(late, "w") as tar:
+        for path in _files(maildir):
+            tar.add(path, arcname=f"./maildir/{path.relative_to(maildir).as_posix()}")
+        tar.add(maildir, arcname="maildir", recursive=False)
+
+    expected = process_enron_folder(str(maildir))
+    for archive in (bare, late):
+        assert {root for root, _ in iter_tar_chunks(str(archive))} == {"maildir"}
+        assert process_enron_folder(str(archive)) == expected
+
+
+def test_mailboxes_at_the_top_of_the_archive(maildir, tmp_path):
+    archive = tmp_path / "boxes.tar"
+    with tarfile.open(archive, "w") as tar:
+        for box in ["allen-p", "arora-h"]:
+            tar.add(maildir / box, arcname=box)
+
+    # The first file's folder is a mailbox here, so the next mailbox fails loudly
+    with pytest.raises(ValueError, match="arora-h/inbox/0. is outside 'allen-p'"):
+        list(iter_tar_chunks(str(archive)))
+
+    chunks = list(iter_tar_chunks(str(archive), root="./"))
+    assert {root for root, _ in chunks} == {""}
+    assert [r["Mailbox"] for r in iter_enron_folder(str(archive), tar_root="")] == \
+        [r["Mailbox"] for r in process_enron_folder(str(maildir))]
@@ -1,6 +1,7 @@
 # tests/test_thread_builder.py
 import pytest
-from src.thread_builder import build_thread_map
+import copy
+from src.thread_builder import build_thread_map, thread_id_for_root, link_replies, make_entry
 
 mock_emails = [
     {
@@ -177,3 +178,69 @@ def test_thread_email_date_sorting():
     # Check ThreadPosition are sequential 0..n-1
     positions = [email["ThreadPosition"] for email in thread_emails]
     assert positions == list(range(len(thread_emails))), "ThreadPosition not assigned correctly"
+
+
+def _reply(msg_id, parent, date):
+    return {
+        "MessageID": msg_id,
+        "InReplyTo": parent,
+        "From": "alice@enron.com",
+        "To": "bob@enron.com",
+        "Subject": f"Re: chain {msg_id}",
+        "Date": date,
+    }
+
+
+def test_cyclic_in_reply_to_terminates():
+    """
+    A cycle of In-Reply-To headers (including a self reference) ends up in one thread.
+    """
+    emails = [
+        _reply("<a>", "<c>", "Mon, 01 Jan 2001 10:00:00 -0800"),
+        _reply("<b>", "<a>", "Mon, 01 Jan 2001 11:00:00 -0800"),
+        _reply("<c>", "<b>", "Mon, 01 Jan 2001 12:00:00 -0800"),
+        _reply("<d>", "<d>", "Mon, 01 Jan 2001 13:00:00 -0800"),
+    ]
+    thread_map = build_thread_map(emails)
+
+    assert sorted(len(t) for t in thread_map.values()) == [1, 3]
+    assert thread_id_for_root("<a>") in thread_map
+
+
+def test_deep_chain_thread_id_comes_from_root():
+    emails = [_reply("<0>", "", "Mon, 01 Jan 2001 00:00:00 -0800")]
+    for i in range(1, 2000):
+        emails.append(_reply(f"<{i}>", f"<{i - 1}>", "Mon, 01 Jan 2001 00:00:00 -0800"))
+    emails.reverse()
+
+    thread_map = build_thread_map(emails)
+
+    assert list(thread_map) == [thread_id_for_root("<0>")]
+    assert len(thread_map[thread_id_for_root("<0>")]) == 2000
+
+
+def test_thread_ids_are_deterministic():
+    """
+    Heuristic and reply-chain ThreadIDs are the same across runs and input orders.
+    """
+    first = build_thread_map(copy.deepcopy(mock_emails))
+    second = build_thread_map(copy.deepcopy(mock_emails[::-1]))
+
+    assert sorted(first) == sorted(second)
+    for thread_id, thread in first.items():
+        assert sorted(e["MessageID"] for e in thread) == sorted(e["MessageID"] for e in second[thread_id])
+
+
+def test_link_replies_finds_roots_and_dangling_replies():
+    def entry(mid, reply_to):
+        return make_entry({"MessageID": mid, "InReplyTo": reply_to}, 0)
+
+    links = link_replies([entry("<b>", "<a>"), entry("<a>", ""), entry("", "<b>"), entry("<x>", "<gone>"),
+                          entry("<c1>", "<c2>"), entry("<c2>", "<c1>"), entry("<s>", "<s>")])
+
+    assert links.parent_of == {"<b>": "<a>", "<c1>": "<c2>", "<c2>": "<c1>"}
+    assert links.dangling == [("<x>", "<gone>")]
+    roots = {m: links.roots[links.reply_sets.find(m)] for m in ("<a>", "<b>", "<c1>", "<c2>")}
+    # A cycle has no message without a parent, so its smallest MessageID is the root
+    assert roots == {"<a>": "<a>", "<b>": "<a>", "<c1>": "<c1>", "<c2>": "<c1>"}
+    assert "<s>" not in links.reply_sets and "<x>" not in links.reply_sets
@@ -0,0 +1,105 @@
+import copy
+import json
+import random
+import pytest
+from benchmarks.synthetic_corpus import generate_corpus
+from src.addresses import AddressTable
+from src.cleaner import parse_enron_email_string
+from src.thread_builder import assign_thread_ids, build_thread_map, group_threads, make_entry, thread_id_for_root
+from src.thread_state import ThreadState, write_threads
+
+
+@pytest.fixture(scope="module")
+def emails():
+    emails = [parse_enron_email_string(raw, path) for path, raw in generate_corpus(300, pathology_rate=0.1, seed=7)]
+    # Replies before their parents, so batches keep linking back to earlier threads
+    random.Random(3).shuffle(emails)
+    return emails
+
+
+def _full_thread_map(emails):
+    addresses = AddressTable()
+    entries = [make_entry(email, i, addresses=addresses) for i, email in enumerate(emails)]
+    threads = group_threads(entries, assign_thread_ids(entries, addresses))
+    return {thread_id: [e.offset for e in thread] for thread_id, thread in threads.items()}
+
+
+@pytest.mark.parametrize("batch_size", [1, 17, 300])
+def test_batches_match_full_threading(emails, tmp_path, batch_size):
+    state = ThreadState()
+    for start in range(0, len(emails), batch_size):
+        # Reload between batches, as separate runs would
+        state.add_emails(emails[start:start + batch_size])
+        state.save(str(tmp_path / "state.json"))
+        state = ThreadState.load(str(tmp_path / "state.json"))
+
+    assert len(state) == len(emails)
+    assert state.thread_map() == _full_thread_map(emails)
+
+
+def _email(mid, reply_to, date):
+    return {"MessageID": mid, "InReplyTo": reply_to, "From": "a@enron.com", "To": "b@enron.com",
+            "Subject": "Re: storage", "Date": date, "Body": mid}
+
+
+def test_late_parent_merges_threads_and_reports_changes():
+    state = ThreadState()
+    state.add_emails([_email("<2>", "<1>", "Mon, 01 Jan 2001 11:00:00 -0800"),
+                      _email("<3>", "<1>", "Mon, 01 Jan 2001 12:00:00 -0800")])
+    # Both replies wait for <1>, so they share one heuristic thread for now
+    assert len(state.threads) == 1
+    heuristic_id = next(iter(state.threads))
+    assert state.heuristic_keys[heuristic_id] == ("storage", ["a@enron.com", "b@enron.com"])
+
+    changed = state.add_emails([_email("<1>", "", "Mon, 01 Jan 2001 10:00:00 -0800")])
+    root_id = thread_id_for_root("<1>")
+    assert changed == {heuristic_id, root_id}
+    assert heuristic_id not in state.threads and heuristic_id not in state.heuristic_keys
+    assert state.thread_offsets(root_id) == [2, 0, 1]
+    assert state.thread_id("<3>") == root_id
+
+    # A reply to an existing chain only touches that chain
+    assert state.add_emails([_email("<4>", "<3>", "Mon, 01 Jan 2001 09:00:00 -0800")]) == {root_id}
+    assert state.thread_offsets(root_id) == [3, 2, 0, 1]
+
+
+def test_index_jsonl_reads_only_appended_records(emails, tmp_path):
+    corpus = tmp_path / "emails.jsonl"
+    state_path = str(tmp_path / "state.json")
+    offsets = {}
+    for batch in (emails[:120], emails[120:]):
+        with open(corpus, "ab") as f:
+            for email in batch:
+                offsets[f.tell()] = len(offsets)
+                f.write((json.dumps(email, ensure_ascii=False) + "\n").encode("utf-8"))
+        state = ThreadState.load(state_path)
+        changed = state.index_jsonl(str(corpus))
+        state.save(state_path)
+
+    expected = {thread_id: [offsets[o] for o in thread] for thread_id, thread in state.thread_map().items()}
+    assert expected == _full_thread_map(emails)
+
+    out = tmp_path / "changed.json"
+    assert write_threads(state, str(corpus), str(out), changed) == len(changed)
+    result = json.loads(out.read_text(encoding="utf-8"))
+    full = json.loads(json.dumps(build_thread_map(copy.deepcopy(emails))))
+    for thread_id, thread in result.items():
+        assert thread == full.get(thread_id, [])
+
+    corpus.write_bytes(b"")
+    with pytest.raises(ValueError):
+        state.index_jsonl(str(corpus))
+
+
+def test_rewritten_corpus_is_rejected(emails, tmp_path):
+    corpus = tmp_path / "emails.jsonl"
+    lines = [json.dumps(email, ensure_ascii=False) + "\n" for email in emails]
+    corpus.write_text("".join(lines[:100]), encoding="utf-8")
+    state = ThreadState()
+    state.index_jsonl(str(corpus))
+
+    # A re-ingest rewrites the whole file in walk order, so new records land in the middle
+    corpus.write_text("".join(lines[:50] + lines[200:] + lines[50:100]), encoding="utf-8")
+    with pytest.raises(ValueError, match="changed since they were indexed"):
+        state.index_jsonl(str(corpus))
+    assert len(state) == 100
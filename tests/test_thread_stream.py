@@ -0,0 +1,80 @@
+import copy
+import json
+from src.thread_builder import build_thread_map
+from src.thread_stream import build_message_index, read_record, thread_jsonl
+from src.writers import write_jsonl
+from src.addresses import AddressTable
+
+emails = [
+    {
+        "MessageID": "<1@enron.com>",
+        "InReplyTo": "",
+        "From": "alice@enron.com",
+        "To": "bob@enron.com",
+        "Subject": "Budget",
+        "Date": "Mon, 01 Jan 2001 10:00:00 -0800",
+        "Body": "First draft attached.",
+    },
+    {
+        "MessageID": "<2@enron.com>",
+        "InReplyTo": "<1@enron.com>",
+        "From": "bob@enron.com",
+        "To": "alice@enron.com",
+        "Subject": "Re: Budget",
+        "Date": "Mon, 01 Jan 2001 09:00:00 -0800",
+        "Body": "Looks good.",
+    },
+    {
+        "MessageID": "<3@enron.com>",
+        "InReplyTo": "",
+        "From": "carol@enron.com",
+        "To": "dan@enron.com",
+        "Subject": "Gas prices",
+        "Date": "Tue, 02 Jan 2001 08:00:00 -0800",
+        "Body": "Café numbers are up.",
+    },
+    {
+        "MessageID": "<4@enron.com>",
+        "InReplyTo": "",
+        "From": "",
+        "To": "dan@enron.com",
+        "Subject": "Incomplete",
+        "Date": "Tue, 02 Jan 2001 08:00:00 -0800",
+        "Body": "Missing sender.",
+    },
+]
+
+
+def _shape(thread_map):
+    return sorted([[e["MessageID"] for e in thread] for thread in thread_map.values()])
+
+
+def test_message_index_offsets_point_at_records(tmp_path):
+    path = tmp_path / "emails.jsonl"
+    write_jsonl(emails, str(path))
+
+    addresses = AddressTable()
+    entries = build_message_index(str(path), addresses)
+
+    assert [e.message_id for e in entries] == [e["MessageID"] for e in emails]
+    assert entries[1].subject == "Budget"
+    assert addresses.addresses(entries[1].participants) == ["alice@enron.com", "bob@enron.com"]
+    with open(path, "rb") as f:
+        assert read_record(f, entries[2].offset)["Body"] == "Café numbers are up."
+
+
+def test_thread_jsonl_matches_build_thread_map(tmp_path):
+    src = tmp_path / "emails.jsonl"
+    out = tmp_path / "threads.json"
+    write_jsonl(emails, str(src))
+
+    count = thread_jsonl(str(src), str(out))
+    streamed = json.loads(out.read_text(encoding="utf-8"))
+    in_memory = build_thread_map(copy.deepcopy(emails))
+
+    assert count == 2
+    assert _shape(streamed) == _shape(in_memory)
+    budget = next(t for t in streamed.values() if len(t) == 2)
+    assert [e["MessageID"] for e in budget] == ["<2@enron.com>", "<1@enron.com>"]
+    assert [e["ThreadPosition"] for e in budget] == [0, 1]
+    assert budget[0]["Body"] == "Looks good."
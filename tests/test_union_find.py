@@ -0,0 +1,21 @@
+from src.union_find import UnionFind
+
+
+def test_union_and_find():
+    uf = UnionFind()
+    uf.union("a", "b")
+    uf.union("c", "d")
+    uf.union("b", "d")
+    uf.add("e")
+
+    assert uf.find("a") == uf.find("c")
+    assert uf.find("e") == "e"
+    assert sorted(sorted(g) for g in uf.groups().values()) == [["a", "b", "c", "d"], ["e"]]
+
+
+def test_path_compression_flattens_long_chains():
+    uf = UnionFind()
+    for i in range(1000):
+        uf.union(i, i + 1)
+    root = uf.find(0)
+    assert all(uf.parent[i] == root for i in range(1001))
@@ -0,0 +1,66 @@
+import csv
+import pytest
+from src import writers
+from src.writers import write_jsonl, iter_jsonl, write_columnar, flatten_threads
+
+
+def test_write_jsonl_round_trip(tmp_path):
+    records = [{"Subject": "Lunch", "Body": "line one\nline two"}, {"Subject": "Café", "Body": ""}]
+    path = tmp_path / "emails.jsonl"
+
+    count = write_jsonl(iter(records), str(path))
+
+    assert count == 2
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+    assert list(iter_jsonl(str(path))) == records
+
+
+def test_write_jsonl_consumes_generator_lazily(tmp_path):
+    seen = []
+
+    def gen():
+        for i in range(3):
+            seen.append(i)
+            yield {"n": i}
+
+    write_jsonl(gen(), str(tmp_path / "out.jsonl"))
+    assert seen == [0, 1, 2]
+
+emails = [
+    {"MessageID": "<1>", "Subject": "Budget", "Body": "a", "Mailbox": "allen-p",
+     "Timestamp": 978372000, "ThreadID": "thread-a", "ThreadPosition": 0},
+    {"MessageID": "<2>", "Subject": "Re: Budget", "Body": "b", "Mailbox": "allen-p",
+     "Timestamp": 1009843200, "ThreadID": "thread-a", "ThreadPosition": 1},
+    {"MessageID": "<3>", "Subject": "Gas", "Body": "c", "Mailbox": "arora-h", "Timestamp": None},
+]
+
+
+def test_write_columnar_parquet_partitions(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    assert write_columnar(emails, str(tmp_path), compression="zstd") == "parquet"
+
+    assert sorted(p.relative_to(tmp_path).parent.as_posix() for p in tmp_path.rglob("*.parquet")) == [
+        "Mailbox=allen-p/Year=2001",
+        "Mailbox=allen-p/Year=2002",
+        "Mailbox=arora-h/Year=unknown",
+    ]
+    table = pq.read_table(str(tmp_path / "Mailbox=allen-p"), columns=["MessageID", "ThreadPosition"])
+    assert sorted(table.column("MessageID").to_pylist()) == ["<1>", "<2>"]
+
+
+def test_write_columnar_falls_back_to_csv(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(writers, "pa", None)
+
+    assert write_columnar(emails, str(tmp_path), partition_by=("Mailbox",)) == "csv"
+
+    assert "pyarrow is not installed" in capsys.readouterr().out
+    with open(tmp_path / "Mailbox=allen-p" / "part-00000.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["ThreadID"] for row in rows] == ["thread-a", "thread-a"]
+    assert [row["Year"] for row in rows] == ["2001", "2002"]
+
+
+def test_flatten_threads_tags_thread_ids():
+    thread_map = {"thread-x": [{"MessageID": "<1>"}], "thread-y": [{"MessageID": "<2>", "ThreadID": "thread-y"}]}
+    assert [e["ThreadID"] for e in flatten_threads(thread_map)] == ["thread-x", "thread-y"]